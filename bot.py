@@ -3,57 +3,221 @@
 """
 import asyncio
 import logging
+from datetime import timedelta
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import Config
-from handlers import basic, tasks, admin, quotes
-from middleware.logging import LoggingMiddleware
+from config import get_config, setup_reload_signal
+from handlers import basic, tasks, admin, quotes, buttons
+from middleware.logging import LoggingMiddleware, CommandLoggerMiddleware
 from middleware.auth import AuthMiddleware
+from middleware.scheduler import UpdateScheduler
+from middleware.throttling import ThrottlingMiddleware
+from middleware.outbound import OutboundGovernor
+from middleware.time_budget import TimeBudgetMiddleware
 from storage.database import Database
+from cluster.reshard import prepare_database_files
+from storage.fsm_storage import DatabaseStorage
+from storage.archive import ArchiveJob
+from storage.timeseries import metrics
+from services.webhook import WebhookServer
+from services.reminders import ReminderService
+from services.bot_session import BotSession
+from services.loop_monitor import LoopMonitor
+from utils.keyboards import prebuild_keyboards
+from utils.edits import get_edit_stats
+from localization.messages import prime_language_cache
 
 
-async def main():
-    """Main функция"""
-    config = Config()
-    #Логирование
+async def run_webhook(dp: Dispatcher, bot: Bot, config):
+    """Запуск в режиме вебхука"""
+    logger = logging.getLogger(__name__)
+    server = WebhookServer(
+        dp,
+        bot,
+        path=config.WEBHOOK_PATH,
+        secret=config.WEBHOOK_SECRET or None,
+        workers=config.WEBHOOK_WORKERS,
+        queue_size=config.WEBHOOK_QUEUE_SIZE
+    )
+    
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+    await dp.emit_startup(bot=bot, **workflow_data)
+    await server.start(config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+    
+    #Без WEBHOOK_URL сервер работает локально (обновления можно отправлять POST запросами)
+    if config.WEBHOOK_URL:
+        await bot.set_webhook(
+            config.WEBHOOK_URL,
+            secret_token=config.WEBHOOK_SECRET or None,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        logger.info(f"Webhook registered at {config.WEBHOOK_URL}")
+    
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        await dp.emit_shutdown(bot=bot, **workflow_data)
+
+
+def setup_logging(config, process_name: str = ""):
+    """Настраиваем логирование (в режиме воркеров в формат добавляется имя процесса)"""
+    prefix = f"[{process_name}] " if process_name else ""
     logging.basicConfig(
         level=getattr(logging, config.LOG_LEVEL),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        format=f'%(asctime)s - {prefix}%(name)s - %(levelname)s - %(message)s',
         handlers=[
             logging.FileHandler(config.LOG_FILE, encoding='utf-8'),
             logging.StreamHandler()
         ]
     )
-    
-    logger = logging.getLogger(__name__)
-    logger.info("Starting Task Management Bot...")
-    
+
+
+def create_bot(config, shards: int = 1) -> Bot:
+    """Создаем бота с ограничением исходящих запросов (в режиме воркеров общий лимит делится между ними)"""
+    session = BotSession(
+        api_url=config.BOT_API_URL,
+        is_local=config.BOT_API_LOCAL,
+        pool_size=config.BOT_API_POOL_SIZE,
+        keepalive=config.BOT_API_KEEPALIVE,
+        dns_ttl=config.BOT_API_DNS_TTL,
+        timeout=config.BOT_API_TIMEOUT,
+        fast_timeout=config.BOT_API_FAST_TIMEOUT,
+        upload_timeout=config.BOT_API_UPLOAD_TIMEOUT
+    )
+    metrics.register_gauge("bot_api", session.get_info)
+    bot = Bot(token=config.BOT_TOKEN, session=session)
+    governor = OutboundGovernor(
+        global_rate=config.OUTBOUND_GLOBAL_RATE / shards,
+        chat_rate=config.OUTBOUND_CHAT_RATE,
+        group_rate=config.OUTBOUND_GROUP_RATE,
+        chat_burst=config.OUTBOUND_CHAT_BURST,
+        max_retries=config.OUTBOUND_MAX_RETRIES
+    )
+    bot.session.middleware(governor)
+    metrics.register_gauge("outbound", governor.get_info)
+    return bot
+
+
+async def create_dispatcher(config, database_file: str) -> Dispatcher:
+    """Создаем базу данных, FSM хранилище и диспетчер со всеми мидлварями и роутерами"""
     #База данных
-    db = Database(config.DATABASE_FILE)
+    db = Database(database_file)
     await db.initialize()
     
-    #Бот и диспетсчер
-    bot = Bot(token=config.BOT_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    #Языки пользователей берем из базы, чтобы после перезапуска они сохранялись
+    prime_language_cache(config.LANGUAGE_CACHE_SIZE)
+    
+    #Клавиатуры строим заранее, чтобы не собирать их на каждом сообщении
+    prebuild_keyboards()
+    
+    #Диспетчер
+    storage = DatabaseStorage(
+        db,
+        ttl=config.FSM_STATE_TTL,
+        hot_size=config.FSM_HOT_SIZE,
+        flush_interval=config.FSM_FLUSH_INTERVAL
+    )
+    await storage.start()
+    
+    #Обновления одного пользователя выполняются по порядку, разных - параллельно
+    scheduler = UpdateScheduler(max_concurrency=config.MAX_CONCURRENT_UPDATES)
+    dp = Dispatcher(storage=storage, events_isolation=scheduler, update_scheduler=scheduler)
+    metrics.register_gauge("scheduler", scheduler.get_metrics)
+    metrics.register_gauge("edits", get_edit_stats)
+    metrics.register_gauge("task_list_cache", tasks.task_list_cache.stats)
+    
+    #Мидлвари. Антифлуд ставим перед FSM мидлварью диспетчера (она берет очередь пользователя
+    #в UpdateScheduler и читает состояние из базы): лишнее обновление отбрасывается раньше всего этого
+    throttling = ThrottlingMiddleware()
+    dp.update.outer_middleware.unregister(dp.fsm)
+    dp.update.outer_middleware(throttling)
+    dp.update.outer_middleware(dp.fsm)
+    metrics.register_gauge("throttling", throttling.get_info)
+    
+    #Блокировки цикла событий пишутся в лог вместе с обрабатываемым обновлением
+    loop_monitor = LoopMonitor(interval=config.LOOP_MONITOR_INTERVAL, threshold=config.LOOP_STALL_THRESHOLD)
+    dp.update.outer_middleware(loop_monitor.context_middleware)
+    dp.startup.register(loop_monitor.start)
+    dp.shutdown.register(loop_monitor.stop)
+    metrics.register_gauge("loop", loop_monitor.get_info)
     
-    #Мидлвари
     dp.message.middleware(LoggingMiddleware())
     dp.callback_query.middleware(LoggingMiddleware())
-    dp.message.middleware(AuthMiddleware(config.ADMIN_IDS))
-    dp.callback_query.middleware(AuthMiddleware(config.ADMIN_IDS))
+    dp.message.middleware(AuthMiddleware())
+    dp.callback_query.middleware(AuthMiddleware())
+    dp.message.middleware(CommandLoggerMiddleware())
+    
+    #Бюджет времени на хэндлер - последней внутренней мидлварью, чтобы в него входил только сам хэндлер
+    time_budget = TimeBudgetMiddleware()
+    dp.message.middleware(time_budget)
+    dp.callback_query.middleware(time_budget)
+    metrics.register_gauge("time_budget", time_budget.get_info)
+    
+    #Фоновый перенос старых выполненных задач в архив
+    archive_job = ArchiveJob(
+        db,
+        archive_after=timedelta(days=config.ARCHIVE_AFTER_DAYS),
+        interval=config.ARCHIVE_INTERVAL
+    )
+    dp.startup.register(archive_job.start)
+    dp.shutdown.register(archive_job.stop)
+    
+    #Напоминания по задачам (расписание восстанавливается из базы при инициализации)
+    reminder_service = ReminderService(db, rate=config.REMINDER_SEND_RATE)
+    dp.startup.register(reminder_service.start)
+    dp.shutdown.register(reminder_service.stop)
     
-    #Роутеры
+    #Роутеры (кнопки первыми: одно совпадение по словарю вместо перебора фильтров)
+    dp.include_router(buttons.router)
     dp.include_router(basic.router)
     dp.include_router(tasks.router)
     dp.include_router(quotes.router)
     dp.include_router(admin.router)
+    
+    return dp
+
+
+async def run_ingestion(dp: Dispatcher, bot: Bot, config):
+    """Получаем обновления через вебхук или long polling"""
+    if config.UPDATE_MODE == "webhook":
+        await run_webhook(dp, bot, config)
+    else:
+        #Если раньше был установлен вебхук, getUpdates с ним не работает
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
+
+
+async def main():
+    """Main функция"""
+    config = get_config()
+    #Логирование
+    setup_logging(config)
+    
+    logger = logging.getLogger(__name__)
+    logger.info("Starting Task Management Bot...")
+    
+    #Режим нескольких процессов: этот процесс только принимает обновления и раздает их воркерам
+    if config.WORKERS > 1:
+        from cluster.supervisor import run_supervisor
+        await run_supervisor(config)
+        return
+    
+    #Если раньше бот работал с воркерами, их файлы сливаются обратно в один
+    await asyncio.to_thread(prepare_database_files, config.DATABASE_FILE, 1)
+    
+    dp = await create_dispatcher(config, config.DATABASE_FILE)
+    
+    #Бот
+    bot = create_bot(config)
+
+    #Перезагрузка настроек по SIGHUP
+    setup_reload_signal(asyncio.get_running_loop())
 
     #Запуск бота
     try:
-        logger.info("Bot started successfully!")
-        await dp.start_polling(bot)
+        logger.info(f"Bot started successfully in {config.UPDATE_MODE} mode!")
+        await run_ingestion(dp, bot, config)
     except Exception as e:
         logger.error(f"Error starting bot: {e}")
     finally:
@@ -0,0 +1,24 @@
+"""
+Режим нескольких процессов: пользователи делятся между воркерами по user_id
+"""
+from .shard_ops import (
+    shard_for,
+    shard_database_file,
+    scatter_gather,
+    call_on_user_shard,
+    call_on_users_shards,
+    merge_pages,
+    merge_statistics
+)
+from .reshard import prepare_database_files
+
+__all__ = [
+    'shard_for',
+    'shard_database_file',
+    'scatter_gather',
+    'call_on_user_shard',
+    'call_on_users_shards',
+    'merge_pages',
+    'merge_statistics',
+    'prepare_database_files'
+]
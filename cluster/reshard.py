@@ -0,0 +1,190 @@
+"""
+Раскладка базы данных по шардам
+
+Каждый воркер работает со своим файлом (data/database.shardN.json), пользователь
+принадлежит шарду user_id % WORKERS. Число шардов записывается в data/database.layout.json.
+При запуске раскладка сверяется с WORKERS: если бот раньше работал одним процессом,
+с другим числом воркеров или раскладка неизвестна, все файлы базы и архива сливаются и
+заново делятся по user_id. При возврате к одному процессу шарды сливаются обратно в один файл.
+Исходные файлы сохраняются рядом с суффиксом .reshard.bak
+"""
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+from typing import Any, Dict, List, Optional
+
+from storage.database import archive_file_for
+from .shard_ops import shard_database_file, shard_for
+
+logger = logging.getLogger(__name__)
+
+BACKUP_SUFFIX = ".reshard.bak"
+
+
+def layout_file_for(database_file: str) -> str:
+    """Файл раскладки: data/database.json -> data/database.layout.json"""
+    root, _ = os.path.splitext(database_file)
+    return f"{root}.layout.json"
+
+
+def _existing_shards(database_file: str) -> Dict[int, str]:
+    """Номер шарда -> файл для всех файлов шардов, которые есть на диске"""
+    root, ext = os.path.splitext(database_file)
+    directory = os.path.dirname(database_file) or "."
+    pattern = re.compile(re.escape(os.path.basename(root)) + r"\.shard(\d+)" + re.escape(ext) + "$")
+    shards = {}
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match:
+                shards[int(match.group(1))] = os.path.join(os.path.dirname(database_file), name)
+    return shards
+
+
+def _read_layout(database_file: str) -> Optional[int]:
+    try:
+        with open(layout_file_for(database_file), "r", encoding="utf-8") as f:
+            return int(json.load(f)["shards"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_layout(database_file: str, shards: int):
+    path = layout_file_for(database_file)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"shards": shards}, f)
+    os.replace(path + ".tmp", path)
+
+
+def _fsm_user_id(key: str) -> Optional[int]:
+    """user_id из ключа FSM хранилища (fsm:bot_id:chat_id:user_id[:...])"""
+    parts = key.split(":")
+    if len(parts) >= 4 and parts[3].lstrip("-").isdigit():
+        return int(parts[3])
+    return None
+
+
+def _empty_data() -> Dict[str, Any]:
+    return {"users": {}, "tasks": {}, "banned_users": [], "fsm_states": {}, "statistics": {}}
+
+
+def _merge(sources: List[str]) -> Dict[str, Any]:
+    """Сливаем файлы базы в один набор данных (счетчики статистики складываются)"""
+    merged = _empty_data()
+    banned = set()
+    for path in sources:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for key, value in data.items():
+            if key in ("users", "tasks", "fsm_states"):
+                merged[key].update(value)
+            elif key == "banned_users":
+                banned.update(value)
+            elif key == "statistics":
+                for name, count in value.items():
+                    merged["statistics"][name] = merged["statistics"].get(name, 0) + count
+            else:
+                merged.setdefault(key, value)
+    merged["banned_users"] = sorted(banned)
+    return merged
+
+
+def _split(data: Dict[str, Any], shards: int) -> List[Dict[str, Any]]:
+    """Делим данные по шардам пользователей; статистика и прочие поля - нулевому шарду"""
+    parts = [_empty_data() for _ in range(shards)]
+    for key, user in data["users"].items():
+        parts[shard_for(int(key), shards)]["users"][key] = user
+    for key, task in data["tasks"].items():
+        parts[shard_for(int(task["user_id"]), shards)]["tasks"][key] = task
+    for user_id in data["banned_users"]:
+        parts[shard_for(int(user_id), shards)]["banned_users"].append(user_id)
+    for key, record in data["fsm_states"].items():
+        user_id = _fsm_user_id(key)
+        parts[shard_for(user_id, shards) if user_id is not None else 0]["fsm_states"][key] = record
+    for key, value in data.items():
+        if key not in ("users", "tasks", "banned_users", "fsm_states"):
+            parts[0][key] = value
+    return parts
+
+
+def _split_archives(sources: List[str], targets: List[str]):
+    """Потоково переписываем архивы задач в архивы целевых файлов (во временные файлы .tmp)"""
+    outputs = [gzip.open(archive_file_for(target) + ".tmp", "wt", encoding="utf-8") for target in targets]
+    try:
+        for source in sources:
+            try:
+                with gzip.open(archive_file_for(source), "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            task = json.loads(line)
+                            outputs[shard_for(int(task["user_id"]), len(targets))].write(line)
+            except FileNotFoundError:
+                continue
+    finally:
+        for output in outputs:
+            output.close()
+
+
+def prepare_database_files(database_file: str, shards: int) -> bool:
+    """
+    Приводим файлы базы к раскладке на shards шардов (1 - один файл database_file).
+    Вызывается до запуска воркеров. Возвращаем True, если данные были переразложены
+    """
+    existing = _existing_shards(database_file)
+    has_single = os.path.exists(database_file)
+
+    if shards == 1:
+        if not existing:
+            return False
+        sources = ([database_file] if has_single else []) + [existing[index] for index in sorted(existing)]
+        targets = [database_file]
+    else:
+        layout = _read_layout(database_file)
+        if not has_single and (
+                (layout == shards and all(index < shards for index in existing))
+                or (layout is None and not existing)):
+            _write_layout(database_file, shards)
+            return False
+        sources = ([database_file] if has_single else []) + [existing[index] for index in sorted(existing)]
+        targets = [shard_database_file(database_file, shard) for shard in range(shards)]
+
+    logger.warning(f"Resharding database {database_file}: {len(sources)} file(s) -> {shards} shard(s)")
+    parts = _split(_merge(sources), len(targets))
+
+    #Сначала пишем все новые файлы во временные, исходные файлы до этого не трогаем
+    for target, part in zip(targets, parts):
+        with open(target + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(part, f, ensure_ascii=False, indent=2)
+    _split_archives(sources, targets)
+
+    #Копии исходных файлов (база и архив)
+    for source in sources:
+        for path in (source, archive_file_for(source)):
+            if os.path.exists(path):
+                shutil.copy2(path, path + BACKUP_SUFFIX)
+
+    for target in targets:
+        os.replace(target + ".tmp", target)
+        os.replace(archive_file_for(target) + ".tmp", archive_file_for(target))
+    for source in sources:
+        if source not in targets:
+            for path in (source, archive_file_for(source)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    if shards == 1:
+        try:
+            os.remove(layout_file_for(database_file))
+        except FileNotFoundError:
+            pass
+    else:
+        _write_layout(database_file, shards)
+
+    users = sum(len(part["users"]) for part in parts)
+    tasks = sum(len(part["tasks"]) for part in parts)
+    logger.warning(f"Resharding done: {users} users and {tasks} tasks in {len(targets)} file(s), "
+                   f"backups saved with suffix {BACKUP_SUFFIX}")
+    return True
@@ -0,0 +1,182 @@
+"""
+Операции над данными, которые могут выполняться на всех шардах
+
+В режиме одного процесса операция выполняется локально. В режиме воркеров запрос уходит
+в главный процесс, который рассылает его нужным воркерам и собирает ответы (scatter-gather)
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from aiogram import Bot
+
+from config import reload_config
+from storage.database import Database
+from services.export import export_data
+from storage.timeseries import metrics
+from middleware.outbound import background_lane
+
+logger = logging.getLogger(__name__)
+
+#Операции, которые воркер умеет выполнять по запросу: имя -> корутина (bot, **kwargs)
+SHARD_OPERATIONS: Dict[str, Callable[..., Awaitable[Any]]] = {}
+
+#Связь с главным процессом (устанавливается только в процессе-воркере)
+_worker_link = None
+
+
+def shard_for(user_id: int, shards: int) -> int:
+    """Номер шарда, которому принадлежит пользователь"""
+    return user_id % shards
+
+
+def shard_database_file(database_file: str, shard: int) -> str:
+    """Файл базы данных шарда: data/database.json -> data/database.shard0.json"""
+    root, ext = os.path.splitext(database_file)
+    return f"{root}.shard{shard}{ext}"
+
+
+def set_worker_link(link):
+    """Подключаем воркер к главному процессу"""
+    global _worker_link
+    _worker_link = link
+
+
+def shard_operation(name: str):
+    """Регистрируем операцию, доступную для вызова на шардах"""
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        SHARD_OPERATIONS[name] = func
+        return func
+    return decorator
+
+
+async def run_local(name: str, bot: Bot, **kwargs) -> Any:
+    """Выполняем операцию на данных текущего процесса"""
+    operation = SHARD_OPERATIONS.get(name)
+    if operation is None:
+        raise ValueError(f"Unknown shard operation '{name}'")
+    return await operation(bot, **kwargs)
+
+
+async def scatter_gather(bot: Bot, name: str, **kwargs) -> List[Any]:
+    """Выполняем операцию на всех шардах и возвращаем список результатов"""
+    if _worker_link is None:
+        return [await run_local(name, bot, **kwargs)]
+    return await _worker_link.request(name, kwargs)
+
+
+async def call_on_user_shard(bot: Bot, user_id: int, name: str, **kwargs) -> Any:
+    """Выполняем операцию на шарде, которому принадлежит пользователь"""
+    if _worker_link is None:
+        return await run_local(name, bot, **kwargs)
+    results = await _worker_link.request(name, kwargs, shard=shard_for(user_id, _worker_link.shards))
+    return results[0]
+
+
+async def call_on_users_shards(bot: Bot, user_ids: List[int], name: str, **kwargs) -> List[Any]:
+    """Выполняем операцию над списком пользователей: каждый шард получает только своих"""
+    if _worker_link is None:
+        return [await run_local(name, bot, user_ids=list(user_ids), **kwargs)]
+
+    groups: Dict[int, List[int]] = {}
+    for user_id in user_ids:
+        groups.setdefault(shard_for(user_id, _worker_link.shards), []).append(user_id)
+
+    replies = await asyncio.gather(*[
+        _worker_link.request(name, {**kwargs, "user_ids": shard_user_ids}, shard=shard)
+        for shard, shard_user_ids in groups.items()
+    ])
+    return [reply[0] for reply in replies]
+
+
+def merge_pages(results: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    """Сливаем страницы шардов: курсор общий, поэтому достаточно взять limit наибольших ключей"""
+    entries = sorted((entry for result in results for entry in result["entries"]),
+                     key=lambda entry: (entry[0], entry[1]), reverse=True)
+    return {"entries": entries[:limit], "total": sum(result["total"] for result in results)}
+
+
+def merge_statistics(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Складываем статистику шардов"""
+    merged: Dict[str, Any] = {}
+    for stats in results:
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+@shard_operation("reload_config")
+async def _reload_config(bot: Bot) -> None:
+    """Перечитываем настройки в процессе шарда (SIGHUP получает только главный процесс)"""
+    reload_config()
+
+
+@shard_operation("statistics")
+async def _statistics(bot: Bot) -> Dict[str, Any]:
+    return await Database().get_statistics()
+
+
+@shard_operation("detailed_stats")
+async def _detailed_stats(bot: Bot, window: str) -> Dict[str, Any]:
+    return metrics.summary(window)
+
+
+@shard_operation("browse")
+async def _browse(bot: Bot, index: str, after: Optional[tuple], limit: int) -> Dict[str, Any]:
+    return await Database().browse(index, after, limit)
+
+
+@shard_operation("broadcast")
+async def _broadcast(bot: Bot, text: str) -> Dict[str, int]:
+    """Отправляем сообщение всем пользователям шарда"""
+    users = await Database().get_all_users()
+
+    successful = 0
+    failed = 0
+    #Рассылка идет в фоновой очереди и не задерживает ответы пользователям
+    with background_lane():
+        for user in users:
+            try:
+                await bot.send_message(user["id"], text)
+                successful += 1
+            except Exception as e:
+                failed += 1
+                logger.warning(f"Failed to send broadcast to user {user['id']}: {e}")
+
+    return {"successful": successful, "failed": failed, "total": len(users)}
+
+
+@shard_operation("ban_user")
+async def _ban_user(bot: Bot, user_id: int) -> Optional[Dict[str, Any]]:
+    """Блокируем пользователя, возвращаем его запись (None - не найден)"""
+    db = Database()
+    user = await db.get_user(user_id)
+    if user is None:
+        return None
+    await db.ban_user(user_id)
+    return user
+
+
+@shard_operation("ban_many")
+async def _ban_many(bot: Bot, user_ids: List[int]) -> List[Dict[str, Any]]:
+    """Блокируем пользователей шарда одной записью, возвращаем записи найденных"""
+    return await Database().ban_many(user_ids)
+
+
+@shard_operation("unban_user")
+async def _unban_user(bot: Bot, user_id: int) -> Optional[Dict[str, Any]]:
+    """Разблокируем пользователя, возвращаем его запись (None - не найден)"""
+    db = Database()
+    user = await db.get_user(user_id)
+    if user is None:
+        return None
+    await db.unban_user(user_id)
+    return user
+
+
+@shard_operation("export")
+async def _export(bot: Bot, directory: str, fmt: str, compress: bool) -> List[str]:
+    """Выгружаем данные шарда в directory, возвращаем пути к файлам"""
+    name = "export" if _worker_link is None else f"export_shard{_worker_link.shard}"
+    return await export_data(Database(), directory, fmt, compress, name=name)
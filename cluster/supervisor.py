@@ -0,0 +1,211 @@
+"""
+Главный процесс режима воркеров
+
+Запускает WORKERS процессов, принимает обновления (polling или webhook) и пересылает
+каждое воркеру, которому принадлежит пользователь. Также координирует scatter-gather
+запросы воркеров (статистика, рассылка и т.д.)
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Awaitable, Dict, List, Optional
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from .reshard import prepare_database_files
+from .shard_ops import shard_for
+from .worker import worker_process
+
+logger = logging.getLogger(__name__)
+
+
+class _Gather:
+    """Сбор ответов шардов на один запрос воркера"""
+
+    __slots__ = ("origin", "request_id", "waiting", "results", "error")
+
+    def __init__(self, origin: Optional[int], request_id: int, shards: List[int]):
+        self.origin = origin
+        self.request_id = request_id
+        self.waiting = set(shards)
+        self.results: Dict[int, Any] = {}
+        self.error = None
+
+
+class Supervisor:
+    """Управление процессами-воркерами и пересылка сообщений между ними"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[multiprocessing.Process] = []
+        self._conns: List[Connection] = []
+        self._alive: List[bool] = []
+        self._gathers: Dict[int, _Gather] = {}
+        self._gather_ids = itertools.count(1)
+
+    def start(self):
+        """Запускаем воркеры"""
+        loop = asyncio.get_running_loop()
+        for shard in range(self.workers):
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(
+                target=worker_process,
+                args=(shard, self.workers, child_conn),
+                name=f"worker-{shard}"
+            )
+            process.start()
+            child_conn.close()
+
+            self._processes.append(process)
+            self._conns.append(parent_conn)
+            self._alive.append(True)
+            loop.add_reader(parent_conn.fileno(), self._on_readable, shard)
+
+        logger.info(f"Supervisor started {self.workers} workers")
+
+    def forward(self, user_id: int, payload: Dict[str, Any]):
+        """Пересылаем обновление воркеру пользователя"""
+        shard = shard_for(user_id, self.workers)
+        if not self._alive[shard]:
+            logger.error(f"Worker {shard} is down, update from user {user_id} dropped")
+            return
+        self._conns[shard].send(("update", payload))
+
+    def _on_readable(self, shard: int):
+        conn = self._conns[shard]
+        try:
+            while conn.poll():
+                self._dispatch(shard, conn.recv())
+        except (EOFError, OSError):
+            self._on_worker_lost(shard)
+
+    def _dispatch(self, shard: int, message: tuple):
+        kind = message[0]
+        if kind == "ready":
+            logger.info(f"Worker {shard} is ready")
+        elif kind == "gather":
+            _, request_id, name, kwargs, target = message
+            self._start_gather(shard, request_id, name, kwargs, target)
+        elif kind == "result":
+            _, gather_id, result_shard, value, error = message
+            self._collect(gather_id, result_shard, value, error)
+
+    def call_all(self, name: str, **kwargs):
+        """Выполняем операцию на всех воркерах по инициативе главного процесса (без ответа)"""
+        self._start_gather(None, 0, name, kwargs, None)
+
+    def _start_gather(self, origin: Optional[int], request_id: int, name: str, kwargs: Dict[str, Any], target):
+        shards = list(range(self.workers)) if target is None else [target]
+        gather_id = next(self._gather_ids)
+        gather = self._gathers[gather_id] = _Gather(origin, request_id, shards)
+
+        for shard in shards:
+            if self._alive[shard]:
+                self._conns[shard].send(("call", gather_id, name, kwargs))
+            else:
+                self._collect(gather_id, shard, None, f"worker {shard} is down")
+        if gather_id in self._gathers and not gather.waiting:
+            self._finish(gather_id)
+
+    def _collect(self, gather_id: int, shard: int, value: Any, error):
+        gather = self._gathers.get(gather_id)
+        if gather is None:
+            return
+        gather.waiting.discard(shard)
+        gather.results[shard] = value
+        if error and gather.error is None:
+            gather.error = error
+        if not gather.waiting:
+            self._finish(gather_id)
+
+    def _finish(self, gather_id: int):
+        gather = self._gathers.pop(gather_id)
+        results = [gather.results[shard] for shard in sorted(gather.results)]
+        if gather.origin is None:
+            if gather.error:
+                logger.error(f"Supervisor request failed: {gather.error}")
+            return
+        if self._alive[gather.origin]:
+            self._conns[gather.origin].send(("reply", gather.request_id, results, gather.error))
+
+    def _on_worker_lost(self, shard: int):
+        if not self._alive[shard]:
+            return
+        self._alive[shard] = False
+        asyncio.get_running_loop().remove_reader(self._conns[shard].fileno())
+        logger.error(f"Worker {shard} exited unexpectedly")
+
+        #Запросы, которые ждали ответа от этого воркера, завершаем с ошибкой
+        for gather_id, gather in list(self._gathers.items()):
+            if shard in gather.waiting:
+                self._collect(gather_id, shard, None, f"worker {shard} is down")
+
+    async def stop(self, timeout: float = 15.0):
+        """Просим воркеры завершиться и дожидаемся их"""
+        loop = asyncio.get_running_loop()
+        for shard, conn in enumerate(self._conns):
+            if self._alive[shard]:
+                loop.remove_reader(conn.fileno())
+                try:
+                    conn.send(("stop",))
+                except OSError:
+                    pass
+                self._alive[shard] = False
+
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop in time, terminating")
+                process.terminate()
+
+        for conn in self._conns:
+            conn.close()
+        logger.info("Supervisor stopped all workers")
+
+
+class ForwardingMiddleware(BaseMiddleware):
+    """Мидлвари главного процесса: вместо обработки пересылает обновление воркеру"""
+
+    def __init__(self, supervisor: Supervisor):
+        super().__init__()
+        self.supervisor = supervisor
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        payload = event.model_dump(mode="json", exclude_unset=True, by_alias=True)
+        #Обновления без пользователя обрабатывает нулевой воркер
+        self.supervisor.forward(user.id if user else 0, payload)
+        return None
+
+
+async def run_supervisor(config):
+    """Запуск главного процесса в режиме воркеров"""
+    from bot import run_ingestion, create_bot
+    from config import setup_reload_signal
+
+    #Данные раскладываются по шардам до запуска воркеров (первый запуск или новое число воркеров)
+    await asyncio.to_thread(prepare_database_files, config.DATABASE_FILE, config.WORKERS)
+
+    supervisor = Supervisor(config.WORKERS)
+    supervisor.start()
+
+    bot = create_bot(config)
+    dp = Dispatcher(disable_fsm=True)
+    dp.update.outer_middleware(ForwardingMiddleware(supervisor))
+
+    #SIGHUP получает главный процесс: перечитывает свои настройки и передает перезагрузку воркерам
+    setup_reload_signal(asyncio.get_running_loop(), on_reload=lambda: supervisor.call_all("reload_config"))
+
+    try:
+        await run_ingestion(dp, bot, config)
+    finally:
+        await supervisor.stop()
+        await bot.session.close()
@@ -0,0 +1,141 @@
+"""
+Процесс-воркер: обрабатывает обновления пользователей своего шарда
+
+Сообщения по каналу с главным процессом (кортежи):
+    главный -> воркер: ("update", payload), ("call", gather_id, name, kwargs),
+                       ("reply", request_id, results, error), ("stop",)
+    воркер -> главный: ("ready", shard), ("gather", request_id, name, kwargs, shard),
+                       ("result", gather_id, shard, value, error)
+"""
+import asyncio
+import logging
+import signal
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Set
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from config import get_config
+from .shard_ops import run_local, set_worker_link, shard_database_file
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerLink:
+    """Канал связи воркера с главным процессом"""
+
+    def __init__(self, conn: Connection, shard: int, shards: int, dp: Dispatcher, bot: Bot):
+        self.conn = conn
+        self.shard = shard
+        self.shards = shards
+        self.dp = dp
+        self.bot = bot
+        self.stopped = asyncio.Event()
+
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_request_id = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    def start(self):
+        asyncio.get_running_loop().add_reader(self.conn.fileno(), self._on_readable)
+
+    def close(self):
+        asyncio.get_running_loop().remove_reader(self.conn.fileno())
+
+    def _on_readable(self):
+        try:
+            while self.conn.poll():
+                self._dispatch(self.conn.recv())
+        except (EOFError, OSError):
+            logger.error(f"Worker {self.shard} lost connection to supervisor")
+            self.close()
+            self.stopped.set()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _dispatch(self, message: tuple):
+        kind = message[0]
+        if kind == "update":
+            self._spawn(self._process_update(message[1]))
+        elif kind == "call":
+            _, gather_id, name, kwargs = message
+            self._spawn(self._process_call(gather_id, name, kwargs))
+        elif kind == "reply":
+            _, request_id, results, error = message
+            future = self._pending.pop(request_id, None)
+            if future is not None and not future.done():
+                if error:
+                    future.set_exception(RuntimeError(error))
+                else:
+                    future.set_result(results)
+        elif kind == "stop":
+            self.stopped.set()
+
+    async def _process_update(self, payload: Dict[str, Any]):
+        try:
+            update = Update.model_validate(payload, context={"bot": self.bot})
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logger.error(f"Worker {self.shard} failed to process update: {e}")
+
+    async def _process_call(self, gather_id: int, name: str, kwargs: Dict[str, Any]):
+        value, error = None, None
+        try:
+            value = await run_local(name, self.bot, **kwargs)
+        except Exception as e:
+            error = f"{name} failed on shard {self.shard}: {e}"
+            logger.error(error)
+        self.conn.send(("result", gather_id, self.shard, value, error))
+
+    async def request(self, name: str, kwargs: Dict[str, Any], shard: Optional[int] = None) -> List[Any]:
+        """Выполняем операцию на всех шардах (или на одном) через главный процесс"""
+        self._next_request_id += 1
+        request_id = self._next_request_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self.conn.send(("gather", request_id, name, kwargs, shard))
+        return await future
+
+    async def drain(self, timeout: float = 10.0):
+        """Дожидаемся обработки уже полученных обновлений"""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+
+
+def worker_process(shard: int, shards: int, conn: Connection):
+    """Точка входа процесса-воркера"""
+    #Остановкой воркеров и перезагрузкой их настроек управляет главный процесс
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    asyncio.run(_worker_main(shard, shards, conn))
+
+
+async def _worker_main(shard: int, shards: int, conn: Connection):
+    from bot import setup_logging, create_dispatcher, create_bot
+
+    config = get_config()
+    setup_logging(config, f"worker-{shard}")
+
+    dp = await create_dispatcher(config, shard_database_file(config.DATABASE_FILE, shard))
+    bot = create_bot(config, shards)
+
+    link = WorkerLink(conn, shard, shards, dp, bot)
+    set_worker_link(link)
+
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+    await dp.emit_startup(bot=bot, **workflow_data)
+    link.start()
+    conn.send(("ready", shard))
+    logger.info(f"Worker {shard}/{shards} started")
+
+    try:
+        await link.stopped.wait()
+    finally:
+        await link.drain()
+        await dp.emit_shutdown(bot=bot, **workflow_data)
+        await bot.session.close()
+        logger.info(f"Worker {shard} stopped")
@@ -1,43 +1,343 @@
 """
 Конфиг для управления ботом
 """
+import logging
 import os
-from dotenv import load_dotenv
+import re
+import signal
+from threading import Lock
+from types import MappingProxyType
+from typing import Callable, Dict, FrozenSet, Optional
+from dotenv import dotenv_values, load_dotenv
+
+#Переменные, заданные окружением процесса (systemd, контейнер), важнее .env
+_process_env_keys = frozenset(os.environ)
 
 #Загружаем данные из .env файла(есть образец по заполнению .env.example)
 load_dotenv()
 
+#Переменные, которые взяты из .env (обновляются при перезагрузке)
+_dotenv_keys = set(os.environ) - _process_env_keys
+
+#Настройки, которые применяются только при запуске: при перезагрузке остаются прежними
+RESTART_ONLY_SETTINGS = (
+    "BOT_TOKEN",
+    "DATABASE_FILE",
+    "WORKERS",
+    "UPDATE_MODE",
+    "WEBHOOK_URL",
+    "WEBHOOK_PATH",
+    "WEBHOOK_HOST",
+    "WEBHOOK_PORT",
+    "WEBHOOK_SECRET",
+    "WEBHOOK_INSECURE_LOCAL",
+    "WEBHOOK_WORKERS",
+    "WEBHOOK_QUEUE_SIZE",
+)
+
+logger = logging.getLogger(__name__)
+
 
 class Config:
-    """Управление настройками бота"""
-    
+    """Управление настройками бота (неизменяемый снимок, загружается один раз)"""
+
+    __slots__ = (
+        "BOT_TOKEN",
+        "ADMIN_IDS",
+        "ZENQUOTES_API_URL",
+        "CACHE_DURATION",
+        "LOG_LEVEL",
+        "LOG_FILE",
+        "DATABASE_FILE",
+        "LANGUAGE_CACHE_SIZE",
+        "FSM_STATE_TTL",
+        "FSM_HOT_SIZE",
+        "FSM_FLUSH_INTERVAL",
+        "ARCHIVE_AFTER_DAYS",
+        "ARCHIVE_INTERVAL",
+        "REMINDER_SEND_RATE",
+        "THROTTLE_MESSAGE_RATE",
+        "THROTTLE_MESSAGE_BURST",
+        "THROTTLE_CALLBACK_RATE",
+        "THROTTLE_CALLBACK_BURST",
+        "THROTTLE_NOTICE_INTERVAL",
+        "THROTTLE_CACHE_SIZE",
+        "OUTBOUND_GLOBAL_RATE",
+        "OUTBOUND_CHAT_RATE",
+        "OUTBOUND_GROUP_RATE",
+        "OUTBOUND_CHAT_BURST",
+        "OUTBOUND_MAX_RETRIES",
+        "BOT_API_URL",
+        "BOT_API_LOCAL",
+        "BOT_API_POOL_SIZE",
+        "BOT_API_KEEPALIVE",
+        "BOT_API_DNS_TTL",
+        "BOT_API_TIMEOUT",
+        "BOT_API_FAST_TIMEOUT",
+        "BOT_API_UPLOAD_TIMEOUT",
+        "LOOP_MONITOR_INTERVAL",
+        "LOOP_STALL_THRESHOLD",
+        "HANDLER_TIME_BUDGET",
+        "HANDLER_TIME_BUDGETS",
+        "MAX_CONCURRENT_UPDATES",
+        "WORKERS",
+        "UPDATE_MODE",
+        "WEBHOOK_URL",
+        "WEBHOOK_PATH",
+        "WEBHOOK_HOST",
+        "WEBHOOK_PORT",
+        "WEBHOOK_SECRET",
+        "WEBHOOK_INSECURE_LOCAL",
+        "WEBHOOK_WORKERS",
+        "WEBHOOK_QUEUE_SIZE",
+        "RELOAD_ON_SIGHUP",
+    )
+
     def __init__(self):
         #Токен
-        self.BOT_TOKEN = os.getenv("BOT_TOKEN")
-        if not self.BOT_TOKEN:
+        bot_token = os.getenv("BOT_TOKEN")
+        if not bot_token:
             raise ValueError("BOT_TOKEN is required in environment variables")
-        
+        self._set("BOT_TOKEN", bot_token)
+
         #Админ ID
         admin_ids_str = os.getenv("ADMIN_IDS", "")
-        self.ADMIN_IDS = [int(id.strip()) for id in admin_ids_str.split(",") if id.strip().isdigit()]
-        
+        self._set("ADMIN_IDS", frozenset(
+            int(id.strip()) for id in admin_ids_str.split(",") if id.strip().isdigit()
+        ))
+
         #API
-        self.ZENQUOTES_API_URL = os.getenv("ZENQUOTES_API_URL", "https://zenquotes.io/api/random")
-        
+        self._set("ZENQUOTES_API_URL", os.getenv("ZENQUOTES_API_URL", "https://zenquotes.io/api/random"))
+
         #Кэш
-        self.CACHE_DURATION = int(os.getenv("CACHE_DURATION", "3600"))
-        
+        self._set("CACHE_DURATION", int(os.getenv("CACHE_DURATION", "3600")))
+
         #Логирование
-        self.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-        self.LOG_FILE = os.getenv("LOG_FILE", "bot.log")
-        
+        self._set("LOG_LEVEL", os.getenv("LOG_LEVEL", "INFO"))
+        self._set("LOG_FILE", os.getenv("LOG_FILE", "bot.log"))
+
         #База данных
-        self.DATABASE_FILE = os.getenv("DATABASE_FILE", "data/database.json")
-        
-        #Проверяем директорию
-        os.makedirs(os.path.dirname(self.DATABASE_FILE), exist_ok=True)
-        os.makedirs("logs", exist_ok=True)
-    
+        self._set("DATABASE_FILE", os.getenv("DATABASE_FILE", "data/database.json"))
+
+        #Размер кэша языков пользователей
+        self._set("LANGUAGE_CACHE_SIZE", int(os.getenv("LANGUAGE_CACHE_SIZE", "10000")))
+
+        #FSM хранилище: время жизни брошенных сценариев, размер кэша в памяти, период сохранения
+        self._set("FSM_STATE_TTL", int(os.getenv("FSM_STATE_TTL", "3600")))
+        self._set("FSM_HOT_SIZE", int(os.getenv("FSM_HOT_SIZE", "10000")))
+        self._set("FSM_FLUSH_INTERVAL", float(os.getenv("FSM_FLUSH_INTERVAL", "5")))
+
+        #Архив: выполненные задачи старше ARCHIVE_AFTER_DAYS дней переносятся раз в ARCHIVE_INTERVAL секунд
+        self._set("ARCHIVE_AFTER_DAYS", int(os.getenv("ARCHIVE_AFTER_DAYS", "30")))
+        self._set("ARCHIVE_INTERVAL", int(os.getenv("ARCHIVE_INTERVAL", "3600")))
+
+        #Сколько напоминаний в секунду отправляется, чтобы не упираться в лимиты Telegram
+        self._set("REMINDER_SEND_RATE", max(1.0, float(os.getenv("REMINDER_SEND_RATE", "20"))))
+
+        #Антифлуд: на пользователя RATE обновлений в секунду с запасом BURST (отдельно для сообщений и кнопок)
+        self._set("THROTTLE_MESSAGE_RATE", float(os.getenv("THROTTLE_MESSAGE_RATE", "1")))
+        self._set("THROTTLE_MESSAGE_BURST", int(os.getenv("THROTTLE_MESSAGE_BURST", "5")))
+        self._set("THROTTLE_CALLBACK_RATE", float(os.getenv("THROTTLE_CALLBACK_RATE", "2")))
+        self._set("THROTTLE_CALLBACK_BURST", int(os.getenv("THROTTLE_CALLBACK_BURST", "10")))
+        #Не чаще одного предупреждения пользователю за столько секунд
+        self._set("THROTTLE_NOTICE_INTERVAL", int(os.getenv("THROTTLE_NOTICE_INTERVAL", "10")))
+        self._set("THROTTLE_CACHE_SIZE", int(os.getenv("THROTTLE_CACHE_SIZE", "10000")))
+
+        #Исходящие запросы к Bot API: сообщений в секунду на весь бот, на личный чат и на группу
+        self._set("OUTBOUND_GLOBAL_RATE", max(1.0, float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))))
+        self._set("OUTBOUND_CHAT_RATE", max(0.01, float(os.getenv("OUTBOUND_CHAT_RATE", "1"))))
+        self._set("OUTBOUND_GROUP_RATE", max(0.01, float(os.getenv("OUTBOUND_GROUP_RATE", "0.33"))))
+        self._set("OUTBOUND_CHAT_BURST", max(1, int(os.getenv("OUTBOUND_CHAT_BURST", "3"))))
+        #Сколько раз запрос повторяется после 429, прежде чем ошибка дойдет до обработчика
+        self._set("OUTBOUND_MAX_RETRIES", int(os.getenv("OUTBOUND_MAX_RETRIES", "3")))
+
+        #HTTP сессия Bot API: свой сервер (пусто - api.telegram.org), пул соединений, keep-alive и кэш DNS в секундах
+        self._set("BOT_API_URL", os.getenv("BOT_API_URL", "").strip().rstrip("/"))
+        self._set("BOT_API_LOCAL", _env_flag("BOT_API_LOCAL", False))
+        self._set("BOT_API_POOL_SIZE", max(1, int(os.getenv("BOT_API_POOL_SIZE", "100"))))
+        self._set("BOT_API_KEEPALIVE", float(os.getenv("BOT_API_KEEPALIVE", "60")))
+        self._set("BOT_API_DNS_TTL", int(os.getenv("BOT_API_DNS_TTL", "3600")))
+        #Тайм-ауты запросов: обычный, для быстрых методов (ответ на кнопку) и для загрузки файлов
+        self._set("BOT_API_TIMEOUT", float(os.getenv("BOT_API_TIMEOUT", "30")))
+        self._set("BOT_API_FAST_TIMEOUT", float(os.getenv("BOT_API_FAST_TIMEOUT", "10")))
+        self._set("BOT_API_UPLOAD_TIMEOUT", float(os.getenv("BOT_API_UPLOAD_TIMEOUT", "120")))
+
+        #Контроль цикла событий: период heartbeat и порог, после которого блокировка пишется в лог (0 - выключен)
+        self._set("LOOP_MONITOR_INTERVAL", max(0.01, float(os.getenv("LOOP_MONITOR_INTERVAL", "0.05"))))
+        self._set("LOOP_STALL_THRESHOLD", float(os.getenv("LOOP_STALL_THRESHOLD", "0.25")))
+
+        #Бюджет времени до ответа пользователю, секунд (0 - без ограничения) и перекрытия по хэндлерам
+        self._set("HANDLER_TIME_BUDGET", float(os.getenv("HANDLER_TIME_BUDGET", "5")))
+        self._set("HANDLER_TIME_BUDGETS", MappingProxyType(
+            _parse_budgets(os.getenv("HANDLER_TIME_BUDGETS", ""))
+        ))
+
+        #Сколько обновлений разных пользователей обрабатывается одновременно
+        self._set("MAX_CONCURRENT_UPDATES", int(os.getenv("MAX_CONCURRENT_UPDATES", "64")))
+
+        #Число процессов-воркеров (пользователи делятся между ними по user_id), 1 - один процесс
+        self._set("WORKERS", max(1, int(os.getenv("WORKERS", "1"))))
+
+        #Получение обновлений: polling или webhook
+        update_mode = os.getenv("UPDATE_MODE", "polling").strip().lower()
+        if update_mode not in ("polling", "webhook"):
+            raise ValueError(f"UPDATE_MODE must be 'polling' or 'webhook', got '{update_mode}'")
+        self._set("UPDATE_MODE", update_mode)
+
+        #Вебхук (WEBHOOK_URL - публичный адрес; если пусто, вебхук в Telegram не регистрируется)
+        self._set("WEBHOOK_URL", os.getenv("WEBHOOK_URL", ""))
+        self._set("WEBHOOK_PATH", os.getenv("WEBHOOK_PATH", "/webhook"))
+        self._set("WEBHOOK_PORT", int(os.getenv("WEBHOOK_PORT", "8080")))
+        webhook_secret = os.getenv("WEBHOOK_SECRET", "").strip()
+        self._set("WEBHOOK_SECRET", webhook_secret)
+
+        #Без секрета любой, кто достучится до порта, может подделать обновление (в том числе от админа),
+        #поэтому вебхук без секрета - только явно (WEBHOOK_INSECURE_LOCAL) и только на localhost
+        insecure_local = _env_flag("WEBHOOK_INSECURE_LOCAL", False)
+        self._set("WEBHOOK_INSECURE_LOCAL", insecure_local)
+        webhook_host = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+        if update_mode == "webhook" and webhook_secret in ("", "change_me"):
+            if not insecure_local:
+                raise ValueError("WEBHOOK_SECRET is required in webhook mode "
+                                 "(set WEBHOOK_INSECURE_LOCAL=true for a local server without authentication)")
+            if self.WEBHOOK_URL:
+                raise ValueError("WEBHOOK_INSECURE_LOCAL can not be used together with WEBHOOK_URL")
+            self._set("WEBHOOK_SECRET", "")
+            webhook_host = "127.0.0.1"
+        elif webhook_secret and not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", webhook_secret):
+            raise ValueError("WEBHOOK_SECRET may contain only A-Z, a-z, 0-9, _ and - (1-256 characters)")
+        self._set("WEBHOOK_HOST", webhook_host)
+        self._set("WEBHOOK_WORKERS", int(os.getenv("WEBHOOK_WORKERS", "16")))
+        self._set("WEBHOOK_QUEUE_SIZE", int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000")))
+
+        #Перезагрузка настроек по сигналу SIGHUP
+        self._set("RELOAD_ON_SIGHUP", _env_flag("RELOAD_ON_SIGHUP", True))
+
+    def _set(self, name: str, value):
+        object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Config is immutable, use reload_config() instead")
+
+    def __delattr__(self, name):
+        raise AttributeError("Config is immutable, use reload_config() instead")
+
     def is_admin(self, user_id: int) -> bool:
         """Проверяем, является ли пользователь админом"""
         return user_id in self.ADMIN_IDS
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    """Читаем булев флаг из переменных окружения"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_budgets(value: str) -> Dict[str, float]:
+    """Разбираем перекрытия бюджетов вида "quote_handler=3,process_task_reminder=2" """
+    budgets = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, seconds = item.partition("=")
+        if not name.strip() or not seconds.strip():
+            raise ValueError(f"HANDLER_TIME_BUDGETS entries must look like 'handler=seconds', got '{item.strip()}'")
+        budgets[name.strip()] = float(seconds)
+    return budgets
+
+
+#Общий для всего процесса снимок настроек
+_config: Optional[Config] = None
+_config_lock = Lock()
+
+
+def _ensure_directories(config: Config):
+    """Проверяем директории (один раз при загрузке, а не на каждом запросе)"""
+    db_dir = os.path.dirname(config.DATABASE_FILE)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    os.makedirs("logs", exist_ok=True)
+
+
+def get_config() -> Config:
+    """Получаем общий снимок настроек (загружается при первом обращении)"""
+    config = _config
+    if config is None:
+        with _config_lock:
+            if _config is None:
+                _load()
+            config = _config
+    return config
+
+
+def _load():
+    global _config
+    config = Config()
+    _ensure_directories(config)
+    _config = config
+
+
+def _reload_dotenv():
+    """
+    Перечитываем .env с тем же приоритетом, что и при запуске: переменные окружения
+    процесса не перекрываются, значения из .env (в том числе удаленные из него) обновляются
+    """
+    values = {key: value for key, value in dotenv_values().items()
+              if value is not None and key not in _process_env_keys}
+    for key in _dotenv_keys - set(values):
+        os.environ.pop(key, None)
+    os.environ.update(values)
+    _dotenv_keys.clear()
+    _dotenv_keys.update(values)
+
+
+def reload_config() -> Config:
+    """
+    Перечитываем .env и переменные окружения и атомарно подменяем снимок настроек.
+    При ошибке остается действующим предыдущий снимок. Настройки из RESTART_ONLY_SETTINGS
+    сохраняют прежние значения до перезапуска
+    """
+    global _config
+    with _config_lock:
+        _reload_dotenv()
+        try:
+            config = Config()
+        except Exception as e:
+            logger.error(f"Config reload failed, keeping previous settings: {e}")
+            return _config
+        if _config is not None:
+            for name in RESTART_ONLY_SETTINGS:
+                if getattr(config, name) != getattr(_config, name):
+                    logger.warning(f"{name} changed, restart the bot to apply it")
+                    config._set(name, getattr(_config, name))
+        _ensure_directories(config)
+        _config = config
+
+    logger.info(f"Config reloaded: {len(config.ADMIN_IDS)} admin(s), "
+                f"cache duration {config.CACHE_DURATION}s")
+    return config
+
+
+def setup_reload_signal(loop, on_reload: Optional[Callable[[], None]] = None) -> bool:
+    """
+    Подключаем перезагрузку настроек по SIGHUP (если включено и поддерживается ОС).
+    on_reload вызывается после перезагрузки (в режиме воркеров - передает ее воркерам)
+    """
+    if not get_config().RELOAD_ON_SIGHUP or not hasattr(signal, "SIGHUP"):
+        return False
+
+    def _on_sighup():
+        reload_config()
+        if on_reload is not None:
+            on_reload()
+
+    try:
+        loop.add_signal_handler(signal.SIGHUP, _on_sighup)
+    except (NotImplementedError, RuntimeError) as e:
+        logger.warning(f"SIGHUP config reload is not available: {e}")
+        return False
+
+    logger.info("Config reload on SIGHUP enabled")
+    return True
@@ -2,6 +2,6 @@
 Пакет для инициализации фильтров
 """
 from .admin import AdminFilter
-from .text import TextFilter, CommandFilter
+from .text import TextFilter, CommandFilter, ButtonFilter
 
-__all__ = ['AdminFilter', 'TextFilter', 'CommandFilter']
+__all__ = ['AdminFilter', 'TextFilter', 'CommandFilter', 'ButtonFilter']
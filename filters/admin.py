@@ -6,7 +6,7 @@ from typing import Union
 from aiogram.filters import BaseFilter
 from aiogram.types import Message, CallbackQuery
 
-from config import Config
+from config import get_config
 
 logger = logging.getLogger(__name__)
 
@@ -14,14 +14,10 @@ logger = logging.getLogger(__name__)
 class AdminFilter(BaseFilter):
     """Фильтр, который разрешает админ-команды только админам"""
     
-    def __init__(self):
-        self.config = Config()
-        self.admin_ids = self.config.ADMIN_IDS
-    
     async def __call__(self, event: Union[Message, CallbackQuery]) -> bool:
         """Проверяем, является ли пользователь админом"""
         user_id = event.from_user.id
-        is_admin = user_id in self.admin_ids
+        is_admin = user_id in get_config().ADMIN_IDS
         
         if not is_admin:
             logger.warning(f"Non-admin user {user_id} tried to access admin function")
@@ -3,10 +3,12 @@
 """
 
 import logging
-from typing import Union, List
+from typing import Union, List, Dict, Any, Iterable
 from aiogram.filters import BaseFilter
 from aiogram.types import Message
 
+from localization.messages import get_button_key
+
 logger = logging.getLogger(__name__)
 
 
@@ -77,4 +79,23 @@ class CommandFilter(BaseFilter):
             return command in self.commands
 
 
-
+class ButtonFilter(BaseFilter):
+    """
+    Фильтр для кнопок реплай-клавиатуры.
+    Текст ищется в индексе кнопок каталога сообщений, ключ кнопки передается в хэндлер как button_key
+    """
+    
+    def __init__(self, button_keys: Iterable[str]):
+        """
+        Аргументы:
+            ключи кнопок(button_keys): ключи btn_* из каталога сообщений, которые обрабатывает хэндлер
+        """
+        self.button_keys = frozenset(button_keys)
+    
+    async def __call__(self, message: Message) -> Union[bool, Dict[str, Any]]:
+        """Проверяем, является ли сообщение нажатием кнопки"""
+        button_key = get_button_key(message.text)
+        if button_key is None or button_key not in self.button_keys:
+            return False
+        
+        return {"button_key": button_key}
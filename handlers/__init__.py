@@ -1,6 +1,6 @@
 """
 Инициализация для хэндлеров
 """
-from . import basic, tasks, admin, quotes
+from . import basic, tasks, admin, quotes, buttons
 
-__all__ = ['basic', 'tasks', 'admin', 'quotes']
+__all__ = ['basic', 'tasks', 'admin', 'quotes', 'buttons']
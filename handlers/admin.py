@@ -1,17 +1,68 @@
 """
 Обработчик(хэндлер) для админской панели
 """
+import asyncio
 import logging
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 
 from localization.messages import get_message, get_user_language
-from utils.keyboards import get_admin_keyboard
-from storage.database import Database
+from utils.keyboards import get_admin_keyboard, get_detailed_stats_keyboard, get_browse_keyboard
+from utils.edits import edit_message
 from states.task_states import AdminStates
 from filters.admin import AdminFilter
+from middleware.time_budget import time_budget
+from cluster.shard_ops import (
+    scatter_gather, call_on_user_shard, call_on_users_shards, merge_statistics, merge_pages
+)
+from services.export import parse_export_options
+from services.bot_session import method_latencies
+from services.loop_monitor import lag_percentile
+from services import profiler
+from services.memstats import measure, process_memory, allocations, format_size
+from storage.timeseries import merge_summaries, metrics
+from storage.database import Database
+from storage.fsm_storage import DatabaseStorage
+from localization.messages import user_languages
+from handlers.tasks import task_list_cache
+
+#Символы мини-графика запросов по корзинам
+CHART_LEVELS = "▁▂▃▄▅▆▇█"
+
+#Сколько самых частых команд показываем в подробной статистике
+TOP_COMMANDS = 10
+
+#Сколько самых частых методов Bot API показываем там же
+TOP_METHODS = 5
+
+#Постраничный просмотр: код в callback_data -> (индекс базы, типы полей ключа, тип id, подпись)
+BROWSERS = {
+    "ul": ("users_last_active", (int,), int, "sort_last_active"),
+    "uc": ("users_task_count", (int,), int, "sort_task_count"),
+    "tc": ("tasks_created_at", (int,), str, "sort_created_at"),
+    "tp": ("tasks_priority", (int, int), str, "sort_priority"),
+}
+USER_BROWSERS = ("ul", "uc")
+TASK_BROWSERS = ("tc", "tp")
+BROWSE_PAGE_SIZE = 10
+
+#Ограничение Telegram на длину callback_data
+CALLBACK_DATA_LIMIT = 64
+
+#Отчет /memstats: сколько мест выделения памяти показываем и ширина их подписи
+MEMSTATS_TOP = 10
+MEMSTATS_LOCATION_WIDTH = 48
+
+#Ограничение Telegram на длину сообщения
+MESSAGE_LIMIT = 4096
+
+#Фоновые задачи обработчиков (ссылки нужны, чтобы задачи не собрал сборщик мусора)
+_background_tasks = set()
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -27,8 +78,8 @@ async def stats_handler(message: Message):
     user_id = message.from_user.id
     lang = get_user_language(user_id)
     
-    db = Database()
-    stats = await db.get_statistics()
+    #В режиме воркеров статистика собирается со всех шардов
+    stats = merge_statistics(await scatter_gather(message.bot, "statistics"))
     
     stats_text = get_message("bot_statistics", lang).format(
         total_users=stats["total_users"],
@@ -41,6 +92,196 @@ async def stats_handler(message: Message):
     logger.info(f"Admin {user_id} viewed bot statistics")
 
 
+def _render_chart(series: List[int]) -> str:
+    """Мини-график числа запросов по корзинам, от старых к новым"""
+    peak = max(series, default=0)
+    if not peak:
+        return CHART_LEVELS[0] * len(series)
+    return "".join(CHART_LEVELS[value * (len(CHART_LEVELS) - 1) // peak] for value in series)
+
+
+def _render_detailed_stats(summary: Dict[str, Any], window: str, lang: str) -> str:
+    requests = summary["requests"]
+    text = get_message("detailed_stats", lang).format(
+        window=get_message(f"stats_window_{window}", lang),
+        requests=requests,
+        errors=summary["errors"],
+        avg_ms=round(summary["latency_sum"] / requests * 1000) if requests else 0,
+        max_ms=round(summary["latency_max"] * 1000),
+        chart=_render_chart(summary["series"])
+    )
+    
+    commands = sorted(summary["commands"].items(), key=lambda item: item[1], reverse=True)[:TOP_COMMANDS]
+    if commands:
+        text += "\n\n" + get_message("detailed_stats_commands", lang).format(
+            commands="\n".join(f"/{command} - {count}" for command, count in commands)
+        )
+    
+    queue = summary["gauges"].get("scheduler")
+    if queue:
+        text += "\n\n" + get_message("detailed_stats_queue", lang).format(
+            active=queue["active_updates"],
+            pending=queue["pending_updates"],
+            avg_wait=round(queue["avg_wait"] * 1000)
+        )
+    
+    loop = summary["gauges"].get("loop")
+    if loop and lag_percentile(loop, 0.5) is not None:
+        text += "\n\n" + get_message("detailed_stats_loop", lang).format(
+            p50=lag_percentile(loop, 0.5),
+            p99=lag_percentile(loop, 0.99),
+            max_ms=loop["max_lag_ms"],
+            stalls=loop["stalls"]
+        )
+    
+    bot_api = summary["gauges"].get("bot_api")
+    if bot_api:
+        methods = "\n".join(
+            get_message("detailed_stats_bot_api_method", lang).format(
+                method=item["method"],
+                calls=item["calls"],
+                avg_ms=round(item["avg"] * 1000),
+                max_ms=round(item["max"] * 1000),
+                errors=item["errors"]
+            )
+            for item in method_latencies(bot_api)[:TOP_METHODS]
+        )
+        text += "\n\n" + get_message("detailed_stats_bot_api", lang).format(
+            in_flight=bot_api["in_flight"],
+            max_in_flight=bot_api["max_in_flight"],
+            new=bot_api["connections_new"],
+            reused=bot_api["connections_reused"],
+            methods=methods
+        )
+    return text
+
+
+async def show_detailed_stats(callback: CallbackQuery, state: FSMContext, window: str):
+    """Показываем подробную статистику за окно minute/hour/day"""
+    user_id = callback.from_user.id
+    lang = get_user_language(user_id)
+    
+    #В режиме воркеров ряды собираются со всех шардов
+    summary = merge_summaries(await scatter_gather(callback.bot, "detailed_stats", window=window))
+    
+    await state.set_state(AdminStates.viewing_detailed_stats)
+    #Повторное нажатие того же окна без новых данных не дойдет до Telegram
+    await edit_message(
+        callback.message,
+        _render_detailed_stats(summary, window, lang),
+        reply_markup=get_detailed_stats_keyboard(lang)
+    )
+    await callback.answer()
+    
+    logger.info(f"Admin {user_id} viewed detailed statistics ({window})")
+
+
+@router.callback_query(F.data == "admin_stats")
+async def detailed_stats_callback(callback: CallbackQuery, state: FSMContext):
+    """Открываем подробную статистику из админ-панели"""
+    await show_detailed_stats(callback, state, "hour")
+
+
+@router.callback_query(F.data.in_({"stats_window_minute", "stats_window_hour", "stats_window_day"}))
+async def detailed_stats_window_callback(callback: CallbackQuery, state: FSMContext):
+    """Переключаем окно подробной статистики"""
+    await show_detailed_stats(callback, state, callback.data.rsplit("_", 1)[1])
+
+
+@router.callback_query(F.data == "stats_close")
+async def detailed_stats_close_callback(callback: CallbackQuery, state: FSMContext):
+    """Закрываем подробную статистику и возвращаемся в админ-панель"""
+    lang = get_user_language(callback.from_user.id)
+    await state.clear()
+    await edit_message(callback.message, get_message("admin_panel", lang), reply_markup=get_admin_keyboard(lang))
+    await callback.answer()
+
+
+def _encode_cursor(code: str, key: tuple, record_id) -> str:
+    """Курсор страницы: ключ и id последней показанной записи"""
+    return f"browse_{code}_" + "|".join(str(value) for value in (*key, record_id))
+
+
+def _decode_cursor(code: str, cursor: str) -> Optional[Tuple[tuple, Any]]:
+    _, key_types, id_type, _ = BROWSERS[code]
+    parts = cursor.split("|")
+    if len(parts) != len(key_types) + 1:
+        raise ValueError(f"Malformed cursor '{cursor}'")
+    key = tuple(key_type(part) for key_type, part in zip(key_types, parts))
+    return key, id_type(parts[-1])
+
+
+def _format_time(value: str) -> str:
+    return value[:16].replace("T", " ") if value else "-"
+
+
+def _render_user(user: Dict[str, Any]) -> str:
+    username = f"@{user['username']}" if user.get("username") else "-"
+    return (f"• {user['id']} {username} — 📋 {user.get('task_count', 0)}, "
+            f"🕒 {_format_time(user.get('last_active'))}")
+
+
+def _render_task(task: Dict[str, Any]) -> str:
+    status = "✅" if task["completed"] else "⭕"
+    priority_emoji = {"high": "🔴", "medium": "🟡", "low": "🟢"}.get(task.get("priority", "medium"), "🟡")
+    title = task["title"][:40] + "..." if len(task["title"]) > 40 else task["title"]
+    return f"• {status} {priority_emoji} {title} — 👤 {task['user_id']}, 📅 {_format_time(task['created_at'])}"
+
+
+@router.callback_query(F.data.in_({"admin_users", "admin_tasks"}) | F.data.startswith("browse_"))
+async def browse_callback(callback: CallbackQuery):
+    """Постраничный просмотр пользователей и задач (keyset курсор в callback_data)"""
+    user_id = callback.from_user.id
+    lang = get_user_language(user_id)
+    
+    if callback.data == "admin_users":
+        code, cursor = "ul", None
+    elif callback.data == "admin_tasks":
+        code, cursor = "tc", None
+    else:
+        _, code, *rest = callback.data.split("_", 2)
+        cursor = rest[0] if rest else None
+    
+    if code not in BROWSERS:
+        await callback.answer()
+        return
+    try:
+        after = _decode_cursor(code, cursor) if cursor else None
+    except ValueError:
+        after = None
+    
+    index, _, _, sort_label = BROWSERS[code]
+    #В режиме воркеров каждый шард отдает свою страницу, общий курсор позволяет просто слить их
+    page = merge_pages(
+        await scatter_gather(callback.bot, "browse", index=index, after=after, limit=BROWSE_PAGE_SIZE),
+        BROWSE_PAGE_SIZE
+    )
+    
+    is_users = code in USER_BROWSERS
+    render = _render_user if is_users else _render_task
+    text = get_message("browse_users" if is_users else "browse_tasks", lang).format(
+        total=page["total"], sort=get_message(sort_label, lang)
+    ) + "\n\n"
+    if page["entries"]:
+        text += "\n".join(render(record) for _, _, record in page["entries"])
+    else:
+        text += get_message("browse_empty", lang)
+    
+    next_callback = None
+    if len(page["entries"]) == BROWSE_PAGE_SIZE:
+        key, record_id, _ = page["entries"][-1]
+        next_callback = _encode_cursor(code, key, record_id)
+        if len(next_callback.encode()) > CALLBACK_DATA_LIMIT:
+            logger.warning(f"Cursor {next_callback} does not fit into callback_data")
+            next_callback = None
+    
+    sort_options = [(option, BROWSERS[option][3]) for option in (USER_BROWSERS if is_users else TASK_BROWSERS)]
+    await edit_message(callback.message, text, reply_markup=get_browse_keyboard(sort_options, next_callback, lang))
+    await callback.answer()
+    
+    logger.info(f"Admin {user_id} browsed {index} page")
+
+
 @router.message(Command("broadcast"))
 async def broadcast_handler(message: Message, state: FSMContext):
     """Обрабатываем команду /broadcast, которая отправляет сообщение всем пользователям"""
@@ -54,27 +295,20 @@ async def broadcast_handler(message: Message, state: FSMContext):
     logger.info(f"Admin {user_id} started broadcast")
 
 
+#Рассылка и выгрузка долгие по природе и сами сообщают о ходе работы, бюджет к ним не применяется
 @router.message(AdminStates.waiting_for_broadcast)
+@time_budget(0)
 async def process_broadcast_message(message: Message, state: FSMContext):
     """Обрабатываем сообщение, которое транслируется пользователям"""
     user_id = message.from_user.id
     lang = get_user_language(user_id)
     broadcast_text = message.text
     
-    db = Database()
-    users = await db.get_all_users()
-    
-    successful = 0
-    failed = 0
-    
-    #Отправляем сообщение всем пользователям
-    for user in users:
-        try:
-            await message.bot.send_message(user["id"], broadcast_text)
-            successful += 1
-        except Exception as e:
-            failed += 1
-            logger.warning(f"Failed to send broadcast to user {user['id']}: {e}")
+    #Каждый шард рассылает сообщение своим пользователям
+    results = await scatter_gather(message.bot, "broadcast", text=broadcast_text)
+    successful = sum(result["successful"] for result in results)
+    failed = sum(result["failed"] for result in results)
+    total = sum(result["total"] for result in results)
 
     await state.clear()
     
@@ -82,11 +316,11 @@ async def process_broadcast_message(message: Message, state: FSMContext):
     result_text = get_message("broadcast_results", lang).format(
         successful=successful,
         failed=failed,
-        total=len(users)
+        total=total
     )
     await message.answer(result_text)
     
-    logger.info(f"Admin {user_id} sent broadcast to {successful}/{len(users)} users")
+    logger.info(f"Admin {user_id} sent broadcast to {successful}/{total} users")
 
 
 @router.message(Command("ban"))
@@ -95,13 +329,16 @@ async def ban_handler(message: Message, state: FSMContext):
     user_id = message.from_user.id
     lang = get_user_language(user_id)
     
-    #Проверяем наличие ID
+    #Проверяем наличие ID (можно несколько: /ban 1 2 3, повторы убираем)
     args = message.text.split()[1:] if len(message.text.split()) > 1 else []
+    target_user_ids = list(dict.fromkeys(int(arg) for arg in args if arg.isdigit()))
     
-    if args and args[0].isdigit():
+    if len(target_user_ids) > 1:
+        #Блокируем всех пользователей одной записью в базу
+        await process_ban_many(message, target_user_ids)
+    elif target_user_ids:
         #Блокируем пользователя напрямую
-        target_user_id = int(args[0])
-        await process_ban_user(message, target_user_id)
+        await process_ban_user(message, target_user_ids[0])
     else:
         #Запрос на ID пользователя
         text = get_message("enter_user_id_to_ban", lang)
@@ -113,16 +350,20 @@ async def ban_handler(message: Message, state: FSMContext):
 
 @router.message(AdminStates.waiting_for_ban_user_id)
 async def process_ban_user_id(message: Message, state: FSMContext):
-    """Обрабатываем ID пользователя для дальнейшей блокировки"""
-    if not message.text.isdigit():
+    """Обрабатываем ID пользователя (или нескольких через пробел) для дальнейшей блокировки"""
+    args = message.text.split() if message.text else []
+    if not args or not all(arg.isdigit() for arg in args):
         user_id = message.from_user.id
         lang = get_user_language(user_id)
         text = get_message("invalid_user_id", lang)
         await message.answer(text)
         return
     
-    target_user_id = int(message.text)
-    await process_ban_user(message, target_user_id)
+    target_user_ids = list(dict.fromkeys(int(arg) for arg in args))
+    if len(target_user_ids) > 1:
+        await process_ban_many(message, target_user_ids)
+    else:
+        await process_ban_user(message, target_user_ids[0])
     await state.clear()
 
 
@@ -131,18 +372,13 @@ async def process_ban_user(message: Message, target_user_id: int):
     user_id = message.from_user.id
     lang = get_user_language(user_id)
     
-    db = Database()
-    
-    #Проверяем, существует ли пользователь
-    user = await db.get_user(target_user_id)
+    #Блокировка выполняется на шарде пользователя (None - пользователь не найден)
+    user = await call_on_user_shard(message.bot, target_user_id, "ban_user", user_id=target_user_id)
     if not user:
         text = get_message("user_not_found", lang)
         await message.answer(text)
         return
     
-    #Блокировка
-    await db.ban_user(target_user_id)
-    
     text = get_message("user_banned", lang).format(
         user_id=target_user_id,
         username=user.get("username", "Unknown")
@@ -152,6 +388,29 @@ async def process_ban_user(message: Message, target_user_id: int):
     logger.info(f"Admin {user_id} banned user {target_user_id}")
 
 
+async def process_ban_many(message: Message, target_user_ids: List[int]):
+    """Блокируем нескольких пользователей (одна запись в базу на шард)"""
+    user_id = message.from_user.id
+    lang = get_user_language(user_id)
+    
+    results = await call_on_users_shards(message.bot, target_user_ids, "ban_many")
+    banned = [user for shard_users in results for user in shard_users]
+    banned_ids = {user["id"] for user in banned}
+    not_found = [target for target in target_user_ids if target not in banned_ids]
+    
+    text = get_message("users_banned", lang).format(
+        count=len(banned),
+        user_ids="\n".join(f"{user['id']} ({user.get('username') or 'Unknown'})" for user in banned)
+    )
+    if not_found:
+        text += "\n\n" + get_message("users_not_found", lang).format(
+            user_ids=", ".join(str(target) for target in not_found)
+        )
+    await message.answer(text)
+    
+    logger.info(f"Admin {user_id} banned users {sorted(banned_ids)}")
+
+
 @router.message(Command("unban"))
 async def unban_handler(message: Message, state: FSMContext):
     """Обрабатываем команду /unban - разблокировку пользователя"""
@@ -194,18 +453,13 @@ async def process_unban_user(message: Message, target_user_id: int):
     user_id = message.from_user.id
     lang = get_user_language(user_id)
     
-    db = Database()
-    
-    #Проверяем, существует ли пользователь
-    user = await db.get_user(target_user_id)
+    #Разблокировка выполняется на шарде пользователя (None - пользователь не найден)
+    user = await call_on_user_shard(message.bot, target_user_id, "unban_user", user_id=target_user_id)
     if not user:
         text = get_message("user_not_found", lang)
         await message.answer(text)
         return
     
-    #Разблокируем пользователя
-    await db.unban_user(target_user_id)
-    
     text = get_message("user_unbanned", lang).format(
         user_id=target_user_id,
         username=user.get("username", "Unknown")
@@ -215,7 +469,186 @@ async def process_unban_user(message: Message, target_user_id: int):
     logger.info(f"Admin {user_id} unbanned user {target_user_id}")
 
 
-@router.message(F.text.in_(["🔧 Админ панель", "🔧 Admin Panel"]))
+@router.message(Command("export"))
+@time_budget(0)
+async def export_handler(message: Message, command: CommandObject, state: FSMContext):
+    """Обрабатываем команду /export (/export csv gz), которая выгружает пользователей и задачи"""
+    user_id = message.from_user.id
+    lang = get_user_language(user_id)
+    
+    args = (command.args or "").split()
+    if not args:
+        #Запрашиваем формат
+        await message.answer(get_message("export_choose_format", lang))
+        await state.set_state(AdminStates.exporting_data)
+        return
+    
+    try:
+        fmt, compress = parse_export_options(args)
+    except ValueError:
+        await message.answer(get_message("export_invalid_format", lang))
+        return
+    await process_export(message, fmt, compress)
+
+
+@router.message(AdminStates.exporting_data)
+@time_budget(0)
+async def process_export_format(message: Message, state: FSMContext):
+    """Обрабатываем выбранный формат выгрузки"""
+    try:
+        fmt, compress = parse_export_options((message.text or "").split())
+    except ValueError:
+        lang = get_user_language(message.from_user.id)
+        await message.answer(get_message("export_invalid_format", lang))
+        return
+    
+    await state.clear()
+    await process_export(message, fmt, compress)
+
+
+async def process_export(message: Message, fmt: str, compress: bool):
+    """Выгружаем данные во временную папку и отправляем файлы документами"""
+    user_id = message.from_user.id
+    lang = get_user_language(user_id)
+    
+    await message.answer(get_message("export_started", lang))
+    directory = await asyncio.to_thread(tempfile.mkdtemp, prefix="bot_export_")
+    try:
+        #В режиме воркеров каждый шард выгружает свои данные в отдельный файл
+        results = await scatter_gather(message.bot, "export", directory=directory, fmt=fmt, compress=compress)
+        for path in (path for paths in results for path in paths):
+            await message.answer_document(FSInputFile(path))
+        logger.info(f"Admin {user_id} exported data as {fmt}{' (gzip)' if compress else ''}")
+    except Exception as e:
+        logger.error(f"Export failed: {e}")
+        await message.answer(get_message("export_failed", lang))
+    finally:
+        await asyncio.to_thread(shutil.rmtree, directory, True)
+
+
+@router.message(Command("profile"))
+async def profile_handler(message: Message, command: CommandObject):
+    """Обрабатываем команду /profile <секунды>, которая снимает профиль процесса и отправляет отчет"""
+    user_id = message.from_user.id
+    lang = get_user_language(user_id)
+    
+    try:
+        seconds = int((command.args or "").strip())
+    except ValueError:
+        seconds = 0
+    if not 1 <= seconds <= profiler.MAX_SECONDS:
+        await message.answer(get_message("profile_usage", lang).format(max=profiler.MAX_SECONDS))
+        return
+    if profiler.is_running():
+        await message.answer(get_message("profile_busy", lang))
+        return
+    
+    await message.answer(get_message("profile_started", lang).format(seconds=seconds))
+    #Профиль снимается в фоне, чтобы не держать очередь обновлений админа
+    task = asyncio.create_task(send_profile(message, seconds, lang))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def send_profile(message: Message, seconds: int, lang: str):
+    """Снимаем профиль в отдельном потоке и отправляем отчет и collapsed stacks документами"""
+    user_id = message.from_user.id
+    directory = await asyncio.to_thread(tempfile.mkdtemp, prefix="bot_profile_")
+    try:
+        #Семплирующий поток работает, пока цикл событий продолжает обрабатывать обновления
+        profile = await asyncio.to_thread(profiler.run_profile, seconds)
+        report_path, collapsed_path = await asyncio.to_thread(profiler.write_profile, profile, directory)
+        await message.answer_document(
+            FSInputFile(report_path),
+            caption=get_message("profile_done", lang).format(seconds=seconds, samples=profile.samples)
+        )
+        await message.answer_document(FSInputFile(collapsed_path))
+        logger.info(f"Admin {user_id} took a {seconds}s profile ({profile.samples} samples)")
+    except profiler.ProfilerBusy:
+        await message.answer(get_message("profile_busy", lang))
+    except Exception as e:
+        logger.error(f"Profiling failed: {e}")
+        await message.answer(get_message("profile_failed", lang))
+    finally:
+        await asyncio.to_thread(shutil.rmtree, directory, True)
+
+
+def _memory_structures(storage) -> Dict[str, Any]:
+    """Структуры, размер которых показывает /memstats (общие объекты считаются у первой)"""
+    db = Database()
+    tables = ("users", "tasks", "fsm_states")
+    structures = {f"db.{table}": db.data[table] for table in tables}
+    structures["db.other"] = [value for key, value in db.data.items() if key not in tables]
+    structures.update({
+        "db.search_index": db.search_index,
+        "db.reminders": db.reminders,
+        "db.browse_indexes": db.browse_indexes,
+        "db.task_versions": db.task_versions,
+    })
+    if isinstance(storage, DatabaseStorage):
+        structures.update(storage.memory_structures())
+    else:
+        structures["fsm.storage"] = storage
+    structures.update({
+        "user_languages": user_languages,
+        "task_list_cache": task_list_cache,
+        "metrics": metrics,
+        "loggers": logging.Logger.manager.loggerDict,
+    })
+    return structures
+
+
+def _render_allocations(lines: List[Tuple[str, int, int]], signed: bool = False) -> str:
+    sign = "+" if signed else ""
+    return "\n".join(
+        f"{(sign if size > 0 else '')}{format_size(size)} ({sign if count > 0 else ''}{count}) "
+        f"{location[-MEMSTATS_LOCATION_WIDTH:]}"
+        for location, size, count in lines
+    )
+
+
+@router.message(Command("memstats"))
+async def memstats_handler(message: Message, command: CommandObject, state: FSMContext):
+    """Обрабатываем команду /memstats ([stop]), которая показывает, на что уходит память процесса"""
+    user_id = message.from_user.id
+    lang = get_user_language(user_id)
+    
+    if (command.args or "").strip().lower() == "stop":
+        await asyncio.to_thread(allocations.stop)
+        await message.answer(get_message("memstats_stopped", lang))
+        return
+    
+    await message.answer(get_message("memstats_collecting", lang))
+    
+    #Обход структур и снимок tracemalloc - в отдельном потоке, чтобы не блокировать цикл событий
+    sizes = await asyncio.to_thread(measure, _memory_structures(state.storage))
+    trace = await asyncio.to_thread(allocations.snapshot, MEMSTATS_TOP)
+    memory = process_memory()
+    
+    text = get_message("memstats_process", lang).format(
+        rss=format_size(memory["rss"]) if "rss" in memory else "?",
+        max_rss=format_size(memory["max_rss"]) if "max_rss" in memory else "?"
+    )
+    text += "\n\n" + get_message("memstats_sizes", lang) + "\n" + "\n".join(
+        f"{name}: {format_size(size)} ({count} obj)" for name, size, count in sizes
+    )
+    
+    if trace["started"]:
+        text += "\n\n" + get_message("memstats_tracing_started", lang)
+    else:
+        traced, peak = trace["traced"]
+        text += "\n\n" + get_message("memstats_top", lang).format(
+            traced=format_size(traced), peak=format_size(peak)) + "\n" + _render_allocations(trace["top"])
+        if trace["diff"] is None:
+            text += "\n\n" + get_message("memstats_no_diff", lang)
+        else:
+            text += "\n\n" + get_message("memstats_diff", lang) + "\n" + (
+                _render_allocations(trace["diff"], signed=True) or "-")
+    
+    await message.answer(text[:MESSAGE_LIMIT])
+    logger.info(f"Admin {user_id} requested memory statistics")
+
+
 async def admin_panel_button(message: Message):
     """Обработка админ-панели"""
     user_id = message.from_user.id
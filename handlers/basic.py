@@ -8,6 +8,7 @@ from aiogram.filters import CommandStart, Command
 
 from localization.messages import get_message, set_user_language, get_user_language
 from utils.keyboards import get_language_keyboard, get_main_keyboard
+from utils.edits import edit_message
 from storage.database import Database
 
 router = Router()
@@ -68,11 +69,11 @@ async def language_callback(callback: CallbackQuery):
     selected_lang = callback.data.split("_")[1]
     
     #Установленный язык пользователя
-    set_user_language(user_id, selected_lang)
+    await set_user_language(user_id, selected_lang)
     
     #Подтверждение
     text = get_message("language_changed", selected_lang)
-    await callback.message.edit_text(text)
+    await edit_message(callback.message, text)
     
     #Новое приветственное сообщение с клавиатурой, но на другом языке
     await callback.message.answer(
@@ -84,23 +85,3 @@ async def language_callback(callback: CallbackQuery):
     
     await callback.answer()
     logger.info(f"User {user_id} changed language to {selected_lang}")
-
-
-@router.message(F.text.in_(["📋 Мои задачи", "📋 My Tasks"]))
-async def tasks_button_handler(message: Message):
-    """Обработка кнопок клавиатуры для установки задач"""
-    from handlers.tasks import view_tasks_handler
-    await view_tasks_handler(message)
-
-
-@router.message(F.text.in_(["💡 Получить цитату", "💡 Get Quote"]))
-async def quote_button_handler(message: Message):
-    """Обработка кнопок клавиатуры для получения цитаты"""
-    from handlers.quotes import quote_handler
-    await quote_handler(message)
-
-
-@router.message(F.text.in_(["🌐 Язык", "🌐 Language"]))
-async def language_button_handler(message: Message):
-    """Обработка кнопок клавиатуры,которые отвечают за смену языка"""
-    await language_handler(message)
@@ -0,0 +1,71 @@
+"""
+Обработчик кнопок реплай-клавиатуры
+
+Тексты кнопок всех языков собраны в один индекс (см. localization.messages.get_button_key),
+поэтому нажатие кнопки определяется одним поиском в словаре, а не перебором фильтров по роутерам.
+Текст, которого нет в индексе, сразу передается дальше остальным роутерам
+"""
+import logging
+from typing import Awaitable, Callable, Dict
+from aiogram import Router
+from aiogram.types import Message
+from aiogram.fsm.context import FSMContext
+
+from filters.admin import AdminFilter
+from filters.text import ButtonFilter
+from middleware.time_budget import time_budget_from
+from handlers import admin, basic, quotes, tasks
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+_admin_filter = AdminFilter()
+
+
+async def _my_tasks(message: Message, state: FSMContext):
+    await tasks.view_tasks_handler(message)
+
+
+async def _add_task(message: Message, state: FSMContext):
+    await tasks.add_task_command(message, state)
+
+
+async def _manage_tasks(message: Message, state: FSMContext):
+    await tasks.manage_tasks_button(message)
+
+
+async def _get_quote(message: Message, state: FSMContext):
+    await quotes.quote_handler(message)
+
+#Кнопка цитаты укладывается в тот же бюджет, что и /quote
+_get_quote.time_budget = quotes.quote_handler.time_budget
+
+
+async def _language(message: Message, state: FSMContext):
+    await basic.language_handler(message)
+
+
+async def _admin_panel(message: Message, state: FSMContext):
+    #Админ-роутер защищен AdminFilter, здесь проверяем так же
+    if await _admin_filter(message):
+        await admin.admin_panel_button(message)
+
+
+#Ключ кнопки из каталога сообщений -> действие
+BUTTON_ACTIONS: Dict[str, Callable[[Message, FSMContext], Awaitable[None]]] = {
+    "btn_my_tasks": _my_tasks,
+    "btn_add_task": _add_task,
+    "btn_manage_tasks": _manage_tasks,
+    "btn_get_quote": _get_quote,
+    "btn_new_quote": _get_quote,
+    "btn_language": _language,
+    "btn_admin_panel": _admin_panel,
+}
+
+
+@router.message(ButtonFilter(BUTTON_ACTIONS))
+@time_budget_from(lambda data: BUTTON_ACTIONS.get(data.get("button_key")))
+async def button_handler(message: Message, state: FSMContext, button_key: str):
+    """Выполняем действие, привязанное к нажатой кнопке"""
+    logger.debug(f"User {message.from_user.id} pressed button {button_key}")
+    await BUTTON_ACTIONS[button_key](message, state)
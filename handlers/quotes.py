@@ -1,21 +1,40 @@
 """
 Хэндлер для цитат
 """
+import asyncio
 import logging
-from aiogram import Router, F
+from typing import Dict, Optional
+from aiogram import Router
 from aiogram.types import Message
 from aiogram.filters import Command
 
 from localization.messages import get_message, get_user_language
+from middleware.time_budget import time_budget
 from services.quotes_api import QuotesAPI
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+#Последняя успешно полученная цитата - запасной ответ, если API не уложился в бюджет
+_last_quote: Optional[Dict[str, str]] = None
+
+
+def _format_quote(quote_data: Dict[str, str]) -> str:
+    return f"💭 \"{quote_data['text']}\"\n\n— {quote_data['author']}"
+
+
+def quote_fallback(message: Message, lang: str) -> str:
+    """Запасной ответ при превышении бюджета: последняя цитата или сообщение о задержке"""
+    if _last_quote is None:
+        return get_message("quote_timeout", lang)
+    return _format_quote(_last_quote)
+
 
 @router.message(Command("quote"))
+@time_budget(seconds=3, cancel=True, fallback=quote_fallback)
 async def quote_handler(message: Message):
     """Обработка команды /quote, которая отвечает за получение мотивирующей цитаты"""
+    global _last_quote
     user_id = message.from_user.id
     lang = get_user_language(user_id)
     
@@ -28,8 +47,10 @@ async def quote_handler(message: Message):
         quote_data = await quotes_api.get_random_quote()
         
         if quote_data:
+            _last_quote = quote_data
+            
             #Форматирование сообщения
-            quote_text = f"💭 \"{quote_data['text']}\"\n\n— {quote_data['author']}"
+            quote_text = _format_quote(quote_data)
             
             #Меняем сообщение о загрузке на сообщение с цитатой
             await loading_msg.edit_text(quote_text)
@@ -41,19 +62,15 @@ async def quote_handler(message: Message):
             await loading_msg.edit_text(error_text)
             logger.warning(f"No quote data received for user {user_id}")
             
+    except asyncio.CancelledError:
+        #Бюджет исчерпан, запасной ответ отправит мидлварь - убираем сообщение о загрузке
+        try:
+            await loading_msg.delete()
+        except Exception as e:
+            logger.debug(f"Failed to delete loading message for user {user_id}: {e}")
+        raise
+            
     except Exception as e:
         error_text = get_message("quote_fetch_error", lang)
         await loading_msg.edit_text(error_text)
         logger.error(f"Error fetching quote for user {user_id}: {e}")
-
-
-@router.message(F.text.in_(["💡 Получить цитату", "💡 Get Quote"]))
-async def quote_button_handler(message: Message):
-    """Обработка кнопок клавиатуры для получения цитаты"""
-    await quote_handler(message)
-
-
-@router.message(F.text.in_(["🔄 Новая цитата", "🔄 New Quote"]))
-async def new_quote_handler(message: Message):
-    """Обработка команды для получения новой цитаты"""
-    await quote_handler(message)
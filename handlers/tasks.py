@@ -2,33 +2,66 @@
 Обработка команд для создания задач и управления ими
 """
 import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 
-from localization.messages import get_message, get_user_language
-from utils.keyboards import get_tasks_keyboard, get_task_actions_keyboard
+from localization.messages import get_message, get_user_language, get_catalog_version
+from utils.keyboards import get_tasks_keyboard, get_task_actions_keyboard, get_search_pagination_keyboard
+from utils.edits import edit_message
+from middleware.time_budget import time_budget
 from storage.database import Database
+from storage.lru import LRUCache
 from states.task_states import TaskStates
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+#Сколько последних задач из архива показываем
+ARCHIVE_PAGE_SIZE = 20
 
-@router.message(Command("tasks"))
-async def view_tasks_handler(message: Message):
-    """Обработка команды /tasks, которая показывает все задачи пользователя"""
-    user_id = message.from_user.id
-    lang = get_user_language(user_id)
-    
-    db = Database()
-    tasks = await db.get_user_tasks(user_id)
-    
+#Сколько готовых списков задач помним (по одному на пользователя и версию его задач)
+TASK_LIST_CACHE_SIZE = 1000
+
+#Готовые списки: (user_id, версия задач, язык, версия каталога сообщений) -> (текст, клавиатура, число задач)
+task_list_cache = LRUCache(maxsize=TASK_LIST_CACHE_SIZE)
+
+#Сколько результатов поиска на одной странице
+SEARCH_PAGE_SIZE = 10
+
+#Ответы, которыми пользователь пропускает необязательный шаг
+SKIP_ANSWERS = {"/skip", "-"}
+
+#Форматы срока и напоминания (без времени - на 9:00)
+DATE_FORMATS = ("%d.%m.%Y %H:%M", "%Y-%m-%d %H:%M", "%d.%m.%Y", "%Y-%m-%d")
+DEFAULT_HOUR = 9
+
+
+def _parse_datetime(text: str) -> Optional[datetime]:
+    """Разбираем дату из сообщения пользователя"""
+    for date_format in DATE_FORMATS:
+        try:
+            moment = datetime.strptime(text, date_format)
+        except ValueError:
+            continue
+        if "%H" not in date_format:
+            moment = moment.replace(hour=DEFAULT_HOUR)
+        return moment
+    return None
+
+
+def _format_datetime(value: str) -> str:
+    """ISO дата -> ДД.ММ.ГГГГ ЧЧ:ММ"""
+    return datetime.fromisoformat(value).strftime("%d.%m.%Y %H:%M")
+
+
+def _render_task_list(tasks: List[Dict[str, Any]], lang: str) -> Tuple[str, InlineKeyboardMarkup]:
+    """Текст и клавиатура списка задач"""
     if not tasks:
-        text = get_message("no_tasks", lang)
-        await message.answer(text, reply_markup=get_tasks_keyboard(lang))
-        return
+        return get_message("no_tasks", lang), get_tasks_keyboard(lang)
     
     #Форматируем
     tasks_text = get_message("your_tasks", lang) + "\n\n"
@@ -38,14 +71,36 @@ async def view_tasks_handler(message: Message):
         tasks_text += f"{i}. {status} {priority_emoji} {task['title']}\n"
         if task["description"]:
             tasks_text += f"   📝 {task['description']}\n"
+        if task.get("due_at"):
+            tasks_text += f"   ⏳ {_format_datetime(task['due_at'])}\n"
         tasks_text += f"   📅 {task['created_at']}\n\n"
     
-    await message.answer(
-        tasks_text,
-        reply_markup=get_tasks_keyboard(lang, len(tasks) > 0)
-    )
+    return tasks_text, get_tasks_keyboard(lang, True)
+
+
+async def _task_list_view(user_id: int, lang: str) -> Tuple[str, InlineKeyboardMarkup, int]:
+    """Список задач из кэша; пересобираем, только если задачи пользователя изменились"""
+    db = Database()
+    key = (user_id, db.get_tasks_version(user_id), lang, get_catalog_version())
+    view = task_list_cache.get(key)
+    if view is None:
+        tasks = await db.get_user_tasks(user_id)
+        text, keyboard = _render_task_list(tasks, lang)
+        view = (text, keyboard, len(tasks))
+        task_list_cache.set(key, view)
+    return view
+
+
+@router.message(Command("tasks"))
+async def view_tasks_handler(message: Message):
+    """Обработка команды /tasks, которая показывает все задачи пользователя"""
+    user_id = message.from_user.id
+    lang = get_user_language(user_id)
+    
+    text, keyboard, count = await _task_list_view(user_id, lang)
+    await message.answer(text, reply_markup=keyboard)
     
-    logger.info(f"User {user_id} viewed {len(tasks)} tasks")
+    logger.info(f"User {user_id} viewed {count} tasks")
 
 
 @router.message(Command("addtask"))
@@ -61,12 +116,6 @@ async def add_task_command(message: Message, state: FSMContext):
     logger.info(f"User {user_id} started adding new task")
 
 
-@router.message(F.text.in_(["➕ Добавить задачу", "➕ Add Task"]))
-async def add_task_button(message: Message, state: FSMContext):
-    """Обработка кнопок клавиатуры, которая отвечает за добавление задачи"""
-    await add_task_command(message, state)
-
-
 @router.message(TaskStates.waiting_for_title)
 async def process_task_title(message: Message, state: FSMContext):
     """Название задачи"""
@@ -97,6 +146,8 @@ async def process_task_description(message: Message, state: FSMContext):
     lang = get_user_language(user_id)
     
     description = message.text.strip()
+    if description in SKIP_ANSWERS:
+        description = ""
     
     #Сохраняем описание
     await state.update_data(description=description)
@@ -125,15 +176,69 @@ async def process_task_priority(message: Message, state: FSMContext):
     }
     
     priority = priority_map.get(priority_text, "medium")
+    await state.update_data(priority=priority)
+    
+    #Запрашиваем срок задачи
+    text = get_message("enter_task_due_date", lang)
+    await message.answer(text)
+    await state.set_state(TaskStates.waiting_for_due_date)
+    
+    logger.info(f"User {user_id} entered task priority: {priority}")
+
+
+@router.message(TaskStates.waiting_for_due_date)
+async def process_task_due_date(message: Message, state: FSMContext):
+    """Срок задачи (необязательно)"""
+    user_id = message.from_user.id
+    lang = get_user_language(user_id)
+    
+    answer = (message.text or "").strip()
+    due_at = None
+    if answer not in SKIP_ANSWERS:
+        due_at = _parse_datetime(answer)
+        if due_at is None:
+            await message.answer(get_message("invalid_task_date", lang))
+            return
+    
+    await state.update_data(due_at=due_at.isoformat() if due_at else None)
+    
+    #Запрашиваем время напоминания
+    text = get_message("enter_task_reminder", lang)
+    await message.answer(text)
+    await state.set_state(TaskStates.waiting_for_reminder)
+
+
+@router.message(TaskStates.waiting_for_reminder)
+@time_budget(fallback="task_save_pending")
+async def process_task_reminder(message: Message, state: FSMContext):
+    """Время напоминания (необязательно), после него создаем задачу"""
+    user_id = message.from_user.id
+    lang = get_user_language(user_id)
+    
+    answer = (message.text or "").strip()
+    remind_at = None
+    if answer not in SKIP_ANSWERS:
+        remind_at = _parse_datetime(answer)
+        if remind_at is None:
+            await message.answer(get_message("invalid_task_date", lang))
+            return
+        if remind_at <= datetime.now():
+            await message.answer(get_message("reminder_in_past", lang))
+            return
     
     #Получаем данные
     data = await state.get_data()
     title = data.get("title")
     description = data.get("description", "")
+    priority = data.get("priority", "medium")
     
     #Создаем задачу целиком
     db = Database()
-    task_id = await db.add_task(user_id, title, description, priority)
+    task_id = await db.add_task(
+        user_id, title, description, priority,
+        due_at=data.get("due_at"),
+        remind_at=remind_at.isoformat() if remind_at else None
+    )
 
     await state.clear()
     
@@ -146,12 +251,107 @@ async def process_task_priority(message: Message, state: FSMContext):
 
 @router.callback_query(F.data == "view_tasks")
 async def view_tasks_callback(callback: CallbackQuery):
-    """Обрабатываем callback"""
-    await view_tasks_handler(callback.message)
+    """Обновляем список задач в том же сообщении"""
+    user_id = callback.from_user.id
+    lang = get_user_language(user_id)
+    
+    text, keyboard, _ = await _task_list_view(user_id, lang)
+    await edit_message(callback.message, text, reply_markup=keyboard)
+    await callback.answer()
+
+
+@router.callback_query(F.data == "view_archive")
+async def view_archive_callback(callback: CallbackQuery):
+    """Показываем последние задачи пользователя из архива"""
+    user_id = callback.from_user.id
+    lang = get_user_language(user_id)
+    
+    db = Database()
+    tasks = await db.get_archived_tasks(user_id, limit=ARCHIVE_PAGE_SIZE)
+    
+    if not tasks:
+        await callback.message.answer(get_message("archive_empty", lang))
+        await callback.answer()
+        return
+    
+    archive_text = get_message("archive_title", lang) + "\n\n"
+    for i, task in enumerate(tasks, 1):
+        archive_text += f"{i}. ✅ {task['title']}\n"
+        archive_text += f"   📅 {task['updated_at']}\n"
+    
+    await callback.message.answer(archive_text)
+    await callback.answer()
+    
+    logger.info(f"User {user_id} viewed {len(tasks)} archived tasks")
+
+
+async def _render_search_page(user_id: int, query: str, page: int, lang: str):
+    """Текст и клавиатура страницы результатов поиска (None, если ничего не найдено)"""
+    db = Database()
+    tasks = await db.search_tasks(user_id, query)
+    if not tasks:
+        return None, None
+    
+    pages = (len(tasks) + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+    page = min(max(page, 1), pages)
+    start = (page - 1) * SEARCH_PAGE_SIZE
+    
+    text = get_message("search_results", lang).format(
+        query=query, total=len(tasks), page=page, pages=pages) + "\n\n"
+    for i, task in enumerate(tasks[start:start + SEARCH_PAGE_SIZE], start + 1):
+        status = "✅" if task["completed"] else "⭕"
+        text += f"{i}. {status} {task['title']}\n"
+        if task["description"]:
+            text += f"   📝 {task['description']}\n"
+    
+    return text, get_search_pagination_keyboard(page, pages)
+
+
+@router.message(Command("search"))
+async def search_tasks_handler(message: Message, command: CommandObject, state: FSMContext):
+    """Обработка команды /search, которая ищет по названиям и описаниям задач"""
+    user_id = message.from_user.id
+    lang = get_user_language(user_id)
+    
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer(get_message("search_usage", lang))
+        return
+    
+    text, keyboard = await _render_search_page(user_id, query, 1, lang)
+    if text is None:
+        await message.answer(get_message("search_no_results", lang).format(query=query))
+        return
+    
+    #Запрос запоминаем для переключения страниц
+    await state.update_data(search_query=query)
+    await message.answer(text, reply_markup=keyboard)
+    
+    logger.info(f"User {user_id} searched tasks: {query}")
+
+
+@router.callback_query(F.data.startswith("search_page_"))
+async def search_page_callback(callback: CallbackQuery, state: FSMContext):
+    """Переключение страницы результатов поиска"""
+    user_id = callback.from_user.id
+    lang = get_user_language(user_id)
+    
+    query = (await state.get_data()).get("search_query")
+    try:
+        page = int(callback.data.rsplit("_", 1)[1])
+    except ValueError:
+        page = 1
+    
+    text, keyboard = (None, None) if not query else await _render_search_page(user_id, query, page, lang)
+    if text is None:
+        await edit_message(callback.message, get_message("search_expired", lang))
+    else:
+        await edit_message(callback.message, text, reply_markup=keyboard)
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("task_"))
+@time_budget(fallback="task_action_pending")
 async def task_action_callback(callback: CallbackQuery):
     """Обрабатываем callback, связанный с обработкой задач"""
     user_id = callback.from_user.id
@@ -171,13 +371,13 @@ async def task_action_callback(callback: CallbackQuery):
         #Показываем список задач
         if not tasks:
             text = get_message("no_tasks", lang)
-            await callback.message.edit_text(text)
+            await edit_message(callback.message, text)
             await callback.answer()
             return
         
         text = get_message("select_task_action", lang)
         keyboard = get_task_actions_keyboard(tasks, lang)
-        await callback.message.edit_text(text, reply_markup=keyboard)
+        await edit_message(callback.message, text, reply_markup=keyboard)
     
     elif action == "complete" and len(data_parts) >= 3:
         #Пользователь выполняет задачу
@@ -187,7 +387,7 @@ async def task_action_callback(callback: CallbackQuery):
                 task = tasks[task_index]
                 await db.update_task_status(task["id"], True)
                 text = get_message("task_completed", lang).format(title=task["title"])
-                await callback.message.edit_text(text)
+                await edit_message(callback.message, text)
                 logger.info(f"User {user_id} completed task {task['id']}")
             else:
                 await callback.answer("Task not found")
@@ -202,17 +402,31 @@ async def task_action_callback(callback: CallbackQuery):
                 task = tasks[task_index]
                 await db.delete_task(task["id"])
                 text = get_message("task_deleted", lang).format(title=task["title"])
-                await callback.message.edit_text(text)
+                await edit_message(callback.message, text)
                 logger.info(f"User {user_id} deleted task {task['id']}")
             else:
                 await callback.answer("Task not found")
         except (ValueError, IndexError):
             await callback.answer("Invalid task number")
     
+    elif action == "completeall":
+        #Пользователь выполняет все задачи сразу
+        task_ids = [task["id"] for task in tasks if not task["completed"]]
+        count = await db.complete_many(task_ids)
+        text = get_message("tasks_completed_many", lang).format(count=count)
+        await edit_message(callback.message, text)
+        logger.info(f"User {user_id} completed {count} tasks")
+    
+    elif action == "clearcompleted":
+        #Пользователь удаляет все выполненные задачи
+        count = await db.delete_completed(user_id)
+        text = get_message("tasks_cleared", lang).format(count=count)
+        await edit_message(callback.message, text)
+        logger.info(f"User {user_id} cleared {count} completed tasks")
+    
     await callback.answer()
 
 
-@router.message(F.text.in_(["📝 Управление задачами", "📝 Manage Tasks"]))
 async def manage_tasks_button(message: Message):
     """Обработка кнопок клавиатуры, связанных с управлениеми задачами"""
     user_id = message.from_user.id
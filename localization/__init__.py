@@ -1,6 +1,22 @@
 """
 Инициализация пакета с обработкой языков бота
 """
-from .messages import get_message, set_user_language, get_user_language
+from .messages import (
+    get_message,
+    set_user_language,
+    get_user_language,
+    get_catalog_version,
+    update_messages,
+    get_button_key,
+    prime_language_cache
+)
 
-__all__ = ['get_message', 'set_user_language', 'get_user_language']
+__all__ = [
+    'get_message',
+    'set_user_language',
+    'get_user_language',
+    'get_catalog_version',
+    'update_messages',
+    'get_button_key',
+    'prime_language_cache'
+]
@@ -2,12 +2,24 @@
 Поддержка сообщений на двух языках
 """
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from storage.database import Database
+from storage.lru import LRUCache
 
 logger = logging.getLogger(__name__)
 
-#Предпочтения языка от пользователя(сохраняем для базы данных)
-user_languages = {}
+DEFAULT_LANGUAGE = "ru"
+
+#Предпочтения языка от пользователя: ограниченный кэш поверх базы данных
+user_languages = LRUCache(maxsize=10000)
+
+#Версия каталога сообщений (меняется при каждом изменении MESSAGES, по ней сбрасываются кэши)
+_catalog_version = 0
+
+#Обратный индекс: текст кнопки на любом языке -> ключ btn_*
+_button_index: Dict[str, str] = {}
+_button_index_version = None
 
 MESSAGES = {
     "ru": {
@@ -16,12 +28,16 @@ MESSAGES = {
         "help": "🤖 Доступные команды:\n\n"
                 "📋 /tasks - Просмотр ваших задач\n"
                 "➕ /addtask - Добавить новую задачу\n"
+                "🔎 /search - Поиск по задачам\n"
                 "💡 /quote - Получить мотивирующую цитату\n"
                 "🌐 /language - Изменить язык\n\n"
                 "🔧 Команды администратора:\n"
                 "📊 /stats - Статистика бота\n"
                 "📢 /broadcast - Рассылка сообщений\n"
-                "🚫 /ban - Заблокировать пользователя",
+                "🚫 /ban - Заблокировать пользователя\n"
+                "📦 /export - Выгрузка данных (csv/jsonl, gz)\n"
+                "🔬 /profile <секунды> - Профилирование бота\n"
+                "🧠 /memstats - Память по подсистемам",
         "choose_language": "🌐 Выберите язык / Choose language:",
         "language_changed": "✅ Язык изменен на русский!",
         
@@ -37,11 +53,26 @@ MESSAGES = {
         "task_deleted": "🗑️ Задача '{title}' удалена!",
         "select_task_action": "📝 Выберите действие с задачей:",
         "task_management": "📝 Управление задачами",
+        "tasks_completed_many": "✅ Отмечено выполненными задач: {count}",
+        "tasks_cleared": "🧹 Удалено выполненных задач: {count}",
+        "archive_title": "🗄 Архив выполненных задач:",
+        "archive_empty": "🗄 Архив пуст.",
+        "enter_task_due_date": "📅 Введите срок задачи (ДД.ММ.ГГГГ ЧЧ:ММ или ДД.ММ.ГГГГ) или отправьте /skip:",
+        "enter_task_reminder": "⏰ Когда напомнить? Введите дату и время (ДД.ММ.ГГГГ ЧЧ:ММ) или отправьте /skip:",
+        "invalid_task_date": "❌ Не удалось распознать дату. Пример: 31.12.2025 18:00. Попробуйте еще раз:",
+        "reminder_in_past": "❌ Время напоминания уже прошло. Введите время в будущем или /skip:",
+        "task_reminder": "⏰ Напоминание о задаче: {title}",
+        "task_due": "📅 Срок: {due}",
+        "search_usage": "🔎 Использование: /search <запрос>",
+        "search_results": "🔎 Найдено по запросу «{query}»: {total} (стр. {page}/{pages})",
+        "search_no_results": "🔎 По запросу «{query}» ничего не найдено.",
+        "search_expired": "🔎 Результаты поиска устарели, повторите /search.",
         
         #Сообщения по получению цитат
         "loading_quote": "💭 Загружаю цитату...",
         "quote_api_error": "😞 Не удалось получить цитату. API недоступен.",
         "quote_fetch_error": "❌ Ошибка при получении цитаты. Попробуйте позже.",
+        "quote_timeout": "⏳ Сервис цитат отвечает слишком долго. Попробуйте чуть позже.",
         
         #Сообщения для админа
         "bot_statistics": "📊 Статистика бота:\n\n"
@@ -60,7 +91,57 @@ MESSAGES = {
         "user_not_found": "❌ Пользователь не найден.",
         "user_banned": "🚫 Пользователь {user_id} ({username}) заблокирован.",
         "user_unbanned": "✅ Пользователь {user_id} ({username}) разблокирован.",
+        "users_banned": "🚫 Заблокировано пользователей: {count}\n{user_ids}",
+        "users_not_found": "❌ Не найдены: {user_ids}",
         "admin_panel": "🔧 Панель администратора",
+        "detailed_stats": "📈 Подробная статистика за {window}:\n\n"
+                          "📨 Запросов: {requests}\n"
+                          "❌ Ошибок: {errors}\n"
+                          "⏱ Время обработки: ср. {avg_ms} мс, макс. {max_ms} мс\n"
+                          "📉 {chart}",
+        "detailed_stats_commands": "🔝 Команды:\n{commands}",
+        "detailed_stats_queue": "🧵 Очередь обновлений: в работе {active}, ожидают {pending}, "
+                                "ср. ожидание {avg_wait} мс",
+        "detailed_stats_loop": "🔁 Цикл событий: задержка p50 ≤ {p50} мс, p99 ≤ {p99} мс, "
+                               "макс. {max_ms} мс, блокировок {stalls}",
+        "detailed_stats_bot_api": "🌐 Bot API: в полете {in_flight} (макс. {max_in_flight}), "
+                                  "соединений открыто {new}, переиспользовано {reused}\n{methods}",
+        "detailed_stats_bot_api_method": "{method}: {calls} × {avg_ms} мс (макс. {max_ms} мс, ошибок {errors})",
+        "browse_users": "👥 Пользователи (всего {total}), сортировка: {sort}",
+        "browse_tasks": "📋 Все задачи (всего {total}), сортировка: {sort}",
+        "browse_empty": "📭 Больше записей нет.",
+        "sort_last_active": "🕒 активность",
+        "sort_task_count": "📋 число задач",
+        "sort_created_at": "📅 дата создания",
+        "sort_priority": "🎯 приоритет",
+        "btn_next_page": "▶️ Далее",
+        "stats_window_minute": "60 минут",
+        "stats_window_hour": "24 часа",
+        "stats_window_day": "30 дней",
+        "export_choose_format": "📦 Выберите формат выгрузки: csv или jsonl (добавьте gz для сжатия, например: csv gz):",
+        "export_invalid_format": "❌ Неизвестный формат. Укажите csv или jsonl, при необходимости с gz:",
+        "export_started": "📦 Готовлю выгрузку...",
+        "export_failed": "❌ Не удалось выгрузить данные.",
+        "profile_usage": "🔬 Укажите длительность в секундах (1-{max}), например: /profile 30",
+        "profile_busy": "⏳ Профиль уже снимается, дождитесь результата.",
+        "profile_started": "🔬 Снимаю профиль {seconds} с...",
+        "profile_done": "🔬 Профиль за {seconds} с: {samples} отсчетов. Отчет по функциям и collapsed stacks для flame graph.",
+        "profile_failed": "❌ Не удалось снять профиль.",
+        "memstats_collecting": "🧠 Считаю память...",
+        "memstats_process": "🧠 Память процесса: RSS {rss}, пик {max_rss}",
+        "memstats_sizes": "📦 Структуры (приблизительно):",
+        "memstats_tracing_started": "🔍 Отслеживание выделений памяти включено. Повторите /memstats позже, "
+                                    "чтобы увидеть места выделения и их рост (/memstats stop - выключить).",
+        "memstats_top": "📍 Места выделения (tracemalloc: {traced}, пик {peak}):",
+        "memstats_diff": "📈 Рост с прошлого снимка:",
+        "memstats_no_diff": "📈 Рост будет показан при следующем /memstats.",
+        "memstats_stopped": "⏹ Отслеживание выделений памяти выключено.",
+        
+        #Антифлуд
+        "throttled": "⏳ Слишком много запросов. Подождите немного.",
+        "handler_slow": "⏳ Запрос обрабатывается дольше обычного, ответ придет чуть позже.",
+        "task_save_pending": "✅ Задача принята и сохраняется, список обновится через несколько секунд.",
+        "task_action_pending": "⏳ Изменение сохраняется, список скоро обновится.",
         
         #Кнопки
         "btn_my_tasks": "📋 Мои задачи",
@@ -69,10 +150,15 @@ MESSAGES = {
         "btn_language": "🌐 Язык",
         "btn_manage_tasks": "📝 Управление задачами",
         "btn_admin_panel": "🔧 Админ панель",
+        "btn_close": "✖️ Закрыть",
         "btn_complete_task": "✅ Выполнить",
         "btn_delete_task": "🗑️ Удалить",
         "btn_back": "🔙 Назад",
         "btn_view_tasks": "👁️ Просмотр задач",
+        "btn_new_quote": "🔄 Новая цитата",
+        "btn_complete_all": "✅ Выполнить все",
+        "btn_clear_completed": "🧹 Удалить выполненные",
+        "btn_archive": "🗄 Архив",
     },
     
     "en": {
@@ -81,12 +167,16 @@ MESSAGES = {
         "help": "🤖 Available commands:\n\n"
                 "📋 /tasks - View your tasks\n"
                 "➕ /addtask - Add new task\n"
+                "🔎 /search - Search your tasks\n"
                 "💡 /quote - Get motivational quote\n"
                 "🌐 /language - Change language\n\n"
                 "🔧 Admin commands:\n"
                 "📊 /stats - Bot statistics\n"
                 "📢 /broadcast - Broadcast messages\n"
-                "🚫 /ban - Ban user",
+                "🚫 /ban - Ban user\n"
+                "📦 /export - Export data (csv/jsonl, gz)\n"
+                "🔬 /profile <seconds> - Profile the bot\n"
+                "🧠 /memstats - Memory by subsystem",
         "choose_language": "🌐 Choose language / Выберите язык:",
         "language_changed": "✅ Language changed to English!",
         
@@ -102,11 +192,26 @@ MESSAGES = {
         "task_deleted": "🗑️ Task '{title}' deleted!",
         "select_task_action": "📝 Select task action:",
         "task_management": "📝 Task Management",
+        "tasks_completed_many": "✅ Tasks marked as completed: {count}",
+        "tasks_cleared": "🧹 Completed tasks removed: {count}",
+        "archive_title": "🗄 Archived completed tasks:",
+        "archive_empty": "🗄 The archive is empty.",
+        "enter_task_due_date": "📅 Enter the due date (DD.MM.YYYY HH:MM or DD.MM.YYYY) or send /skip:",
+        "enter_task_reminder": "⏰ When should I remind you? Enter date and time (DD.MM.YYYY HH:MM) or send /skip:",
+        "invalid_task_date": "❌ Could not parse the date. Example: 31.12.2025 18:00. Try again:",
+        "reminder_in_past": "❌ The reminder time has already passed. Enter a future time or /skip:",
+        "task_reminder": "⏰ Task reminder: {title}",
+        "task_due": "📅 Due: {due}",
+        "search_usage": "🔎 Usage: /search <query>",
+        "search_results": "🔎 Results for «{query}»: {total} (page {page}/{pages})",
+        "search_no_results": "🔎 Nothing found for «{query}».",
+        "search_expired": "🔎 Search results expired, run /search again.",
         
         #Сообщения по получению цитат
         "loading_quote": "💭 Loading quote...",
         "quote_api_error": "😞 Failed to get quote. API is unavailable.",
         "quote_fetch_error": "❌ Error fetching quote. Please try again later.",
+        "quote_timeout": "⏳ The quote service is taking too long. Please try again shortly.",
         
         #Сообщения для адимина
         "bot_statistics": "📊 Bot Statistics:\n\n"
@@ -125,7 +230,57 @@ MESSAGES = {
         "user_not_found": "❌ User not found.",
         "user_banned": "🚫 User {user_id} ({username}) has been banned.",
         "user_unbanned": "✅ User {user_id} ({username}) has been unbanned.",
+        "users_banned": "🚫 Users banned: {count}\n{user_ids}",
+        "users_not_found": "❌ Not found: {user_ids}",
         "admin_panel": "🔧 Admin Panel",
+        "detailed_stats": "📈 Detailed statistics for the last {window}:\n\n"
+                          "📨 Requests: {requests}\n"
+                          "❌ Errors: {errors}\n"
+                          "⏱ Processing time: avg {avg_ms} ms, max {max_ms} ms\n"
+                          "📉 {chart}",
+        "detailed_stats_commands": "🔝 Commands:\n{commands}",
+        "detailed_stats_queue": "🧵 Update queue: {active} running, {pending} waiting, "
+                                "avg wait {avg_wait} ms",
+        "detailed_stats_loop": "🔁 Event loop: lag p50 ≤ {p50} ms, p99 ≤ {p99} ms, "
+                               "max {max_ms} ms, {stalls} stalls",
+        "detailed_stats_bot_api": "🌐 Bot API: {in_flight} in flight (max {max_in_flight}), "
+                                  "{new} connections opened, {reused} reused\n{methods}",
+        "detailed_stats_bot_api_method": "{method}: {calls} × {avg_ms} ms (max {max_ms} ms, {errors} errors)",
+        "browse_users": "👥 Users ({total} total), sorted by: {sort}",
+        "browse_tasks": "📋 All tasks ({total} total), sorted by: {sort}",
+        "browse_empty": "📭 No more records.",
+        "sort_last_active": "🕒 last active",
+        "sort_task_count": "📋 task count",
+        "sort_created_at": "📅 created",
+        "sort_priority": "🎯 priority",
+        "btn_next_page": "▶️ Next",
+        "stats_window_minute": "60 minutes",
+        "stats_window_hour": "24 hours",
+        "stats_window_day": "30 days",
+        "export_choose_format": "📦 Choose export format: csv or jsonl (add gz to compress, e.g. csv gz):",
+        "export_invalid_format": "❌ Unknown format. Specify csv or jsonl, optionally with gz:",
+        "export_started": "📦 Preparing export...",
+        "export_failed": "❌ Failed to export data.",
+        "profile_usage": "🔬 Specify the duration in seconds (1-{max}), e.g. /profile 30",
+        "profile_busy": "⏳ A profile is already running, wait for its result.",
+        "profile_started": "🔬 Profiling for {seconds}s...",
+        "profile_done": "🔬 Profile for {seconds}s: {samples} samples. Hot function report and collapsed stacks for a flame graph.",
+        "profile_failed": "❌ Failed to take a profile.",
+        "memstats_collecting": "🧠 Measuring memory...",
+        "memstats_process": "🧠 Process memory: RSS {rss}, peak {max_rss}",
+        "memstats_sizes": "📦 Structures (approximate):",
+        "memstats_tracing_started": "🔍 Allocation tracing is on. Run /memstats again later "
+                                    "to see allocation sites and their growth (/memstats stop - turn it off).",
+        "memstats_top": "📍 Allocation sites (tracemalloc: {traced}, peak {peak}):",
+        "memstats_diff": "📈 Growth since the previous snapshot:",
+        "memstats_no_diff": "📈 Growth will be shown on the next /memstats.",
+        "memstats_stopped": "⏹ Allocation tracing is off.",
+        
+        #Антифлуд
+        "throttled": "⏳ Too many requests. Please slow down.",
+        "handler_slow": "⏳ This is taking longer than usual, the reply will follow shortly.",
+        "task_save_pending": "✅ Task accepted and being saved, the list will update in a few seconds.",
+        "task_action_pending": "⏳ Saving the change, the list will update shortly.",
         
         #Кнопки
         "btn_my_tasks": "📋 My Tasks",
@@ -134,10 +289,15 @@ MESSAGES = {
         "btn_language": "🌐 Language",
         "btn_manage_tasks": "📝 Manage Tasks",
         "btn_admin_panel": "🔧 Admin Panel",
+        "btn_close": "✖️ Close",
         "btn_complete_task": "✅ Complete",
         "btn_delete_task": "🗑️ Delete",
         "btn_back": "🔙 Back",
         "btn_view_tasks": "👁️ View Tasks",
+        "btn_new_quote": "🔄 New Quote",
+        "btn_complete_all": "✅ Complete All",
+        "btn_clear_completed": "🧹 Clear Completed",
+        "btn_archive": "🗄 Archive",
     }
 }
 
@@ -154,18 +314,71 @@ def get_message(key: str, language: str = "ru") -> str:
     return MESSAGES[language][key]
 
 
-def set_user_language(user_id: int, language: str):
-    """Устанавливаем язык для пользователя"""
+def get_catalog_version() -> int:
+    """Текущая версия каталога сообщений"""
+    return _catalog_version
+
+
+def update_messages(language: str, messages: Dict[str, str]):
+    """Добавляем или заменяем сообщения в каталоге и сбрасываем зависимые кэши"""
+    global _catalog_version
+    MESSAGES.setdefault(language, {}).update(messages)
+    _catalog_version += 1
+    logger.info(f"Message catalog updated for '{language}' ({len(messages)} keys)")
+
+
+def _rebuild_button_index():
+    """Строим индекс текстов кнопок по всем языкам каталога"""
+    global _button_index, _button_index_version
+
+    index = {}
+    for language, messages in MESSAGES.items():
+        for key, text in messages.items():
+            if key.startswith("btn_"):
+                if text in index and index[text] != key:
+                    logger.warning(f"Button text '{text}' ({language}) is shared by "
+                                   f"'{index[text]}' and '{key}'")
+                    continue
+                index[text] = key
+
+    _button_index = index
+    _button_index_version = _catalog_version
+
+
+def get_button_key(text: Optional[str]) -> Optional[str]:
+    """Определяем ключ кнопки по ее тексту (один поиск в словаре)"""
+    if _button_index_version != _catalog_version:
+        _rebuild_button_index()
+    if not text:
+        return None
+    return _button_index.get(text)
+
+
+async def set_user_language(user_id: int, language: str):
+    """Устанавливаем язык для пользователя и сохраняем его в базе данных"""
     if language in MESSAGES:
-        user_languages[user_id] = language
+        await Database().set_user_language(user_id, language)
+        user_languages.set(user_id, language)
         logger.info(f"User {user_id} language set to {language}")
     else:
         logger.warning(f"Attempted to set invalid language '{language}' for user {user_id}")
 
 
 def get_user_language(user_id: int) -> str:
-    """Получаем язык пользователя"""
-    return user_languages.get(user_id, "ru")  #язык по умолчанию русский
-
+    """Получаем язык пользователя (из кэша, при промахе из базы данных)"""
+    language = user_languages.get(user_id)
+    if language is None:
+        language = Database().get_user_language(user_id)
+        if language not in MESSAGES:
+            language = DEFAULT_LANGUAGE  #язык по умолчанию русский
+        user_languages.set(user_id, language)
+    return language
 
 
+def prime_language_cache(cache_size: int):
+    """Задаем размер кэша и заполняем его языками недавно активных пользователей"""
+    user_languages.resize(cache_size)
+    for user_id, language in Database().get_recent_user_languages(cache_size):
+        if language in MESSAGES:
+            user_languages.set(user_id, language)
+    logger.info(f"Language cache primed with {len(user_languages)} users")
@@ -2,6 +2,11 @@
 Инициализация для мидлвари (middleware)
 """
 from .auth import AuthMiddleware
-from .logging import LoggingMiddleware
+from .logging import LoggingMiddleware, CommandLoggerMiddleware
+from .scheduler import UpdateScheduler
+from .throttling import ThrottlingMiddleware
+from .outbound import OutboundGovernor, background_lane
+from .time_budget import TimeBudgetMiddleware, time_budget
 
-__all__ = ['AuthMiddleware', 'LoggingMiddleware']
+__all__ = ['AuthMiddleware', 'LoggingMiddleware', 'CommandLoggerMiddleware', 'UpdateScheduler', 'ThrottlingMiddleware',
+           'OutboundGovernor', 'background_lane', 'TimeBudgetMiddleware', 'time_budget']
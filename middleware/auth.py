@@ -2,10 +2,11 @@
 Авторизация и аутентификация
 """
 import logging
-from typing import Callable, Dict, Any, Awaitable, List
+from typing import Callable, Dict, Any, Awaitable, Iterable, Optional
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 
+from config import get_config
 from storage.database import Database
 
 logger = logging.getLogger(__name__)
@@ -14,9 +15,16 @@ logger = logging.getLogger(__name__)
 class AuthMiddleware(BaseMiddleware):
     """пользовательская авторизация и аутентификация"""
     
-    def __init__(self, admin_ids: List[int]):
+    def __init__(self, admin_ids: Optional[Iterable[int]] = None):
         super().__init__()
-        self.admin_ids = admin_ids
+        #Если список не передан явно, берем актуальный из настроек (с учетом перезагрузки)
+        self._admin_ids = frozenset(admin_ids) if admin_ids is not None else None
+    
+    @property
+    def admin_ids(self) -> frozenset:
+        if self._admin_ids is not None:
+            return self._admin_ids
+        return get_config().ADMIN_IDS
     
     async def __call__(
         self,
@@ -61,9 +69,16 @@ class AuthMiddleware(BaseMiddleware):
 class AdminOnlyMiddleware(BaseMiddleware):
     """Мидлвари для админов"""
     
-    def __init__(self, admin_ids: List[int]):
+    def __init__(self, admin_ids: Optional[Iterable[int]] = None):
         super().__init__()
-        self.admin_ids = admin_ids
+        #Если список не передан явно, берем актуальный из настроек (с учетом перезагрузки)
+        self._admin_ids = frozenset(admin_ids) if admin_ids is not None else None
+    
+    @property
+    def admin_ids(self) -> frozenset:
+        if self._admin_ids is not None:
+            return self._admin_ids
+        return get_config().ADMIN_IDS
     
     async def __call__(
         self,
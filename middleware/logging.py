@@ -2,12 +2,14 @@
 Отслеживаем активность бота
 """
 import logging
+import time
 from typing import Callable, Dict, Any, Awaitable
 from datetime import datetime
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 
 from storage.database import Database
+from storage.timeseries import metrics, normalize_command
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +26,7 @@ class LoggingMiddleware(BaseMiddleware):
         """Время работы и детали выполнения"""
         
         start_time = datetime.now()
+        started = time.perf_counter()
         user_id = event.from_user.id
         username = event.from_user.username or "Unknown"
 
@@ -58,6 +61,7 @@ class LoggingMiddleware(BaseMiddleware):
             
             logger.info(f"[SUCCESS] Processed {event_type} from user {user_id} "
                        f"in {processing_time:.3f}s")
+            metrics.record_request(time.perf_counter() - started)
             
             return result
             
@@ -68,6 +72,7 @@ class LoggingMiddleware(BaseMiddleware):
             
             logger.error(f"[ERROR] Failed to process {event_type} from user {user_id} "
                         f"after {processing_time:.3f}s: {e}")
+            metrics.record_request(time.perf_counter() - started, error=True)
             
             #Сообщение об оишбке для пользователя
             error_message = ("😞 К сожалению, произошла ошибка при попытке обработать ваш запрос.\n"
@@ -98,14 +103,12 @@ class CommandLoggerMiddleware(BaseMiddleware):
         if not event.text or not event.text.startswith('/'):
             return await handler(event, data)
         
-        command = event.text.split()[0].lower()
+        command = normalize_command(event.text)
         user_id = event.from_user.id
 
-        logger.info(f"Command usage: {command} by user {user_id}")
+        logger.info(f"Command usage: /{command} by user {user_id}")
         
-        #Статистика
-        db = Database()
-        stat_name = f"command_{command.replace('/', '')}_usage"
-        await db.update_statistics(stat_name)
+        #Статистика: ограниченные ряды вместо отдельного счетчика на каждую строку команды
+        metrics.record_command(command)
         
         return await handler(event, data)
@@ -0,0 +1,236 @@
+"""
+Ограничение исходящих запросов к Bot API
+
+Мидлварь сессии бота (bot.session.middleware), поэтому обработчики по-прежнему вызывают
+message.answer/edit_text напрямую. Каждый запрос с chat_id (отправка, редактирование,
+удаление сообщений) ждет своей очереди: общее ведро токенов на весь бот и ведро на чат
+(для групп скорость ниже). Ожидающие запросы стоят в двух очередях: ответы пользователям
+(interactive) всегда идут раньше фоновых рассылок и напоминаний (background).
+Очередь определяется переменной контекста, фоновые задачи оборачиваются в background_lane().
+При 429 (TelegramRetryAfter) отправка всей очереди приостанавливается на retry_after секунд,
+а запрос повторяется первым в своей очереди
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Hashable, Optional, Tuple
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from storage.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+LANE_INTERACTIVE = 0
+LANE_BACKGROUND = 1
+LANE_NAMES = ("interactive", "background")
+
+#Очередь запросов текущей задачи (по умолчанию - ответы пользователям)
+outbound_lane: contextvars.ContextVar[int] = contextvars.ContextVar("outbound_lane", default=LANE_INTERACTIVE)
+
+#Сколько ожидающих запросов просматривается за раз в поиске чата с доступным токеном
+SCAN_LIMIT = 256
+
+
+@contextmanager
+def background_lane():
+    """Запросы внутри блока идут в фоновую очередь"""
+    token = outbound_lane.set(LANE_BACKGROUND)
+    try:
+        yield
+    finally:
+        outbound_lane.reset(token)
+
+
+class _Bucket:
+    """Ведро токенов"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+
+    def refill(self, rate: float, burst: float, now: float):
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+
+class _Waiter:
+    """Запрос, ожидающий отправки"""
+
+    __slots__ = ("chat_id", "future")
+
+    def __init__(self, chat_id: Hashable, future: asyncio.Future):
+        self.chat_id = chat_id
+        self.future = future
+
+
+class OutboundGovernor(BaseRequestMiddleware):
+    """Общий и поштучный по чатам лимит исходящих запросов с очередями приоритета"""
+
+    def __init__(self, global_rate: float = 30.0, chat_rate: float = 1.0, group_rate: float = 0.33,
+                 chat_burst: int = 3, max_retries: int = 3, cache_size: int = 10000):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+
+        self._global = _Bucket(global_rate, time.monotonic())
+        self._chats = LRUCache(maxsize=cache_size)
+        self._lanes: Tuple[Deque[_Waiter], ...] = (deque(), deque())
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump: Optional[asyncio.Task] = None
+
+        #Счетчики для мониторинга
+        self.sent = 0
+        self.retries = 0
+        self.max_wait = 0.0
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            #getUpdates, answerCallbackQuery и т.д. не ограничиваются
+            return await make_request(bot, method)
+
+        lane = outbound_lane.get()
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, lane, retry=attempt > 0)
+            try:
+                response = await make_request(bot, method)
+                self.sent += 1
+                return response
+            except TelegramRetryAfter as e:
+                attempt += 1
+                self.retries += 1
+                self._pause(e.retry_after)
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(f"Flood control on {type(method).__name__} in chat {chat_id}, "
+                               f"outbound queue paused for {e.retry_after}s")
+
+    def _pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _acquire(self, chat_id: Hashable, lane: int, retry: bool = False):
+        """Ждем разрешения на отправку (повтор после 429 встает в начало очереди)"""
+        started = time.monotonic()
+        waiter = _Waiter(chat_id, asyncio.get_running_loop().create_future())
+        if retry:
+            self._lanes[lane].appendleft(waiter)
+        else:
+            self._lanes[lane].append(waiter)
+
+        if self._pump is None:
+            self._wakeup = asyncio.Event()
+            self._pump = asyncio.create_task(self._run())
+        else:
+            self._wakeup.set()
+
+        #Если запрос отменят, насос сам уберет его из очереди
+        await waiter.future
+        self.max_wait = max(self.max_wait, time.monotonic() - started)
+
+    def _chat_wait(self, chat_id: Hashable, now: float) -> float:
+        """Через сколько секунд у чата появится токен (0 - уже есть)"""
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            return 0.0
+        rate = self._chat_rate(chat_id)
+        bucket.refill(rate, self.chat_burst, now)
+        return 0.0 if bucket.tokens >= 1 else (1 - bucket.tokens) / rate
+
+    def _chat_rate(self, chat_id: Hashable) -> float:
+        #Отрицательные id и @username - группы и каналы
+        return self.group_rate if not isinstance(chat_id, int) or chat_id < 0 else self.chat_rate
+
+    def _take_chat(self, chat_id: Hashable, now: float):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = _Bucket(self.chat_burst, now)
+            self._chats.set(chat_id, bucket)
+        bucket.tokens -= 1
+
+    def _next_ready(self, now: float) -> Tuple[Optional[_Waiter], float]:
+        """Первый запрос (по приоритету очередей), чей чат может отправлять, или время до ближайшего"""
+        soonest = float("inf")
+        for lane in self._lanes:
+            blocked = set()
+            for index, waiter in enumerate(lane):
+                if index >= SCAN_LIMIT:
+                    break
+                if waiter.future.done() or waiter.chat_id in blocked:
+                    continue
+                wait = self._chat_wait(waiter.chat_id, now)
+                if wait == 0:
+                    lane.remove(waiter)
+                    return waiter, 0.0
+                blocked.add(waiter.chat_id)
+                soonest = min(soonest, wait)
+            #Убираем отмененные запросы из начала очереди
+            while lane and lane[0].future.done():
+                lane.popleft()
+        return None, soonest
+
+    async def _run(self):
+        """Насос: выдает разрешения по одному, пока очереди не опустеют"""
+        try:
+            while any(self._lanes):
+                self._wakeup.clear()
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._global.refill(self.global_rate, self.global_rate, now)
+                if self._global.tokens < 1:
+                    await asyncio.sleep((1 - self._global.tokens) / self.global_rate)
+                    continue
+
+                waiter, soonest = self._next_ready(now)
+                if waiter is None:
+                    if not any(self._lanes):
+                        break
+                    #Ждем токена чата или нового запроса (может быть из другого чата)
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), min(soonest, 1.0))
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                self._global.tokens -= 1
+                self._take_chat(waiter.chat_id, now)
+                waiter.future.set_result(None)
+        finally:
+            self._pump = None
+            #Если насос отменили, ожидающие не должны зависнуть навсегда
+            for lane in self._lanes:
+                while lane:
+                    waiter = lane.popleft()
+                    if not waiter.future.done():
+                        waiter.future.cancel()
+
+    def get_info(self) -> Dict[str, Any]:
+        """Состояние для мониторинга"""
+        info = {f"{name}_queued": len(lane) for name, lane in zip(LANE_NAMES, self._lanes)}
+        info.update({
+            "sent": self.sent,
+            "retries": self.retries,
+            "paused": max(0.0, round(self._paused_until - time.monotonic(), 1)),
+            "max_wait": round(self.max_wait, 3)
+        })
+        return info
@@ -0,0 +1,99 @@
+"""
+Планировщик обновлений: по порядку для одного пользователя, параллельно для разных
+
+Подключается к диспетчеру как events_isolation, поэтому FSM состояние читается уже
+после получения очереди пользователя. У каждого пользователя своя FIFO очередь
+(asyncio.Lock отдает захват в порядке ожидания), общее число одновременно работающих
+обработчиков ограничено семафором. Очередь удаляется, как только у пользователя
+не остается ожидающих обновлений
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Dict, Hashable
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+
+logger = logging.getLogger(__name__)
+
+
+class _UserQueue:
+    """Очередь обновлений одного пользователя"""
+
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class UpdateScheduler(BaseEventIsolation):
+    """Упорядочивает обновления одного пользователя и ограничивает общую параллельность"""
+
+    def __init__(self, max_concurrency: int = 64, slow_wait_threshold: float = 1.0):
+        self.max_concurrency = max_concurrency
+        self.slow_wait_threshold = slow_wait_threshold
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._queues: Dict[Hashable, _UserQueue] = {}
+
+        #Метрики
+        self.pending = 0
+        self.active = 0
+        self.processed = 0
+        self.max_user_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        user_key = (key.bot_id, key.user_id)
+        queue = self._queues.get(user_key)
+        if queue is None:
+            queue = self._queues[user_key] = _UserQueue()
+
+        queue.pending += 1
+        self.pending += 1
+        if queue.pending > self.max_user_depth:
+            self.max_user_depth = queue.pending
+        enqueued_at = time.monotonic()
+
+        try:
+            async with queue.lock:
+                async with self._semaphore:
+                    self._record_wait(key.user_id, time.monotonic() - enqueued_at)
+                    self.active += 1
+                    try:
+                        yield
+                    finally:
+                        self.active -= 1
+                        self.processed += 1
+        finally:
+            queue.pending -= 1
+            self.pending -= 1
+            #Освобождаем очередь пользователя, если в ней больше никого нет
+            if queue.pending == 0 and self._queues.get(user_key) is queue:
+                del self._queues[user_key]
+
+    def _record_wait(self, user_id: int, wait: float):
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+        if wait > self.slow_wait_threshold:
+            logger.warning(f"Update from user {user_id} waited {wait:.3f}s in scheduler queue")
+
+    async def close(self) -> None:
+        self._queues.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Глубина очередей и время ожидания"""
+        started = self.processed + self.active
+        return {
+            "users_queued": len(self._queues),
+            "pending_updates": self.pending,
+            "active_updates": self.active,
+            "max_concurrency": self.max_concurrency,
+            "max_user_depth": self.max_user_depth,
+            "processed": self.processed,
+            "avg_wait": self.total_wait / started if started else 0.0,
+            "max_wait": self.max_wait,
+        }
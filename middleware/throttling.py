@@ -0,0 +1,115 @@
+"""
+Антифлуд: ограничение частоты обновлений от одного пользователя
+
+Мидлварь стоит outer на уровне update перед FSM мидлварью диспетчера, то есть до очереди
+пользователя и семафора UpdateScheduler, чтения FSM состояния, регистрации пользователя
+и обработчиков: лишние обновления отбрасываются, не занимая место в очереди и не обращаясь к базе.
+На каждого пользователя и тип события - ведро токенов: RATE токенов в секунду,
+не больше BURST. Ведра хранятся в ограниченном LRU кэше. Обновление без токена
+отбрасывается сразу (ожидание держало бы воркер вебхука).
+Предупреждение отправляется не чаще одного раза за THROTTLE_NOTICE_INTERVAL секунд.
+Админы не ограничиваются
+"""
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject, Update
+
+from config import get_config
+from localization.messages import get_message, get_user_language
+from storage.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class _Bucket:
+    """Ведро токенов одного пользователя для одного типа событий"""
+
+    __slots__ = ("tokens", "updated", "notice_until")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.notice_until = 0.0
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничение частоты обновлений на пользователя"""
+
+    def __init__(self, cache_size: Optional[int] = None):
+        super().__init__()
+        self._buckets = LRUCache(maxsize=cache_size or get_config().THROTTLE_CACHE_SIZE)
+
+        #Счетчики для мониторинга
+        self.dropped = 0
+
+    @staticmethod
+    def _limits(event_type: str) -> Optional[Tuple[float, int]]:
+        """(токенов в секунду, размер ведра) для типа события, None - без ограничений"""
+        config = get_config()
+        if event_type == "message":
+            return config.THROTTLE_MESSAGE_RATE, config.THROTTLE_MESSAGE_BURST
+        if event_type == "callback_query":
+            return config.THROTTLE_CALLBACK_RATE, config.THROTTLE_CALLBACK_BURST
+        return None
+
+    def _take(self, key: Tuple[int, str], rate: float, burst: int, now: float) -> Tuple[float, _Bucket]:
+        """Берем токен; возвращаем, через сколько секунд он появится (0 - токен взят)"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _Bucket(burst, now)
+            self._buckets.set(key, bucket)
+        else:
+            bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+            bucket.updated = now
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0, bucket
+        return (1 - bucket.tokens) / rate, bucket
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        limits = self._limits(event.event_type)
+        if user is None or limits is None or user.id in get_config().ADMIN_IDS:
+            return await handler(event, data)
+
+        rate, burst = limits
+        if rate <= 0:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        wait, bucket = self._take((user.id, event.event_type), rate, burst, now)
+        if wait == 0:
+            return await handler(event, data)
+
+        self.dropped += 1
+        logger.info(f"Throttled {event.event_type} from user {user.id}")
+        if now >= bucket.notice_until:
+            bucket.notice_until = now + get_config().THROTTLE_NOTICE_INTERVAL
+            await self._notify(event.event, user.id)
+        return None
+
+    @staticmethod
+    async def _notify(event: TelegramObject, user_id: int):
+        text = get_message("throttled", get_user_language(user_id))
+        try:
+            if isinstance(event, Message):
+                await event.answer(text)
+            elif isinstance(event, CallbackQuery):
+                await event.answer(text, show_alert=False)
+        except Exception as e:
+            logger.warning(f"Failed to send throttling notice to user {user_id}: {e}")
+
+    def get_info(self) -> Dict[str, Any]:
+        """Состояние для мониторинга"""
+        return {
+            "tracked_users": len(self._buckets),
+            "dropped": self.dropped
+        }
@@ -0,0 +1,215 @@
+"""
+Бюджет времени на хэндлер
+
+Хэндлер запускается отдельной задачей. Если он не ответил за отведенное время,
+пользователь сразу получает запасной ответ, а медленная работа либо отменяется
+(чтение без побочных эффектов, например загрузка цитаты), либо доводится до конца
+(сохранение задачи не должно потеряться). Так время до видимого ответа
+ограничено бюджетом, даже если внешний API или запись в базу тормозят.
+
+Доводимая работа не отсоединяется от обновления: мидлварь возвращается только после нее,
+поэтому очередь пользователя в UpdateScheduler и его FSM состояние остаются за этим
+обновлением, и следующее обновление того же пользователя (например, повторный ответ
+после "сохраняется...") не начнется раньше и не создаст дубликат.
+
+Бюджет хэндлера задается декоратором time_budget, перекрывается в конфиге
+(HANDLER_TIME_BUDGETS=quote_handler=3,...) по имени бюджета, для остальных
+хэндлеров действует HANDLER_TIME_BUDGET. 0 - без ограничения
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Union
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from config import get_config
+from localization.messages import DEFAULT_LANGUAGE, get_message, get_user_language
+from services.loop_monitor import track_task
+
+logger = logging.getLogger(__name__)
+
+#Сколько ждем завершения отмененного хэндлера (его очистки) перед запасным ответом
+CANCEL_GRACE = 1.0
+
+#Ответ Telegram на повторный answerCallbackQuery (кнопке уже ответили запасным уведомлением)
+QUERY_ANSWERED_ERROR = "query is too old and response timeout expired or query id is invalid"
+
+#Запасной ответ: ключ каталога сообщений или функция (событие, язык) -> текст (None - не отвечать)
+Fallback = Union[str, Callable[[TelegramObject, str], Optional[str]]]
+
+
+class TimeBudget:
+    """Бюджет хэндлера: сколько секунд ждем, что делаем с медленной работой и что отвечаем"""
+
+    __slots__ = ("name", "seconds", "cancel", "fallback")
+
+    def __init__(self, name: str, seconds: Optional[float] = None, cancel: bool = False,
+                 fallback: Fallback = "handler_slow"):
+        self.name = name
+        self.seconds = seconds
+        self.cancel = cancel
+        self.fallback = fallback
+
+
+def time_budget(seconds: Optional[float] = None, cancel: bool = False, fallback: Fallback = "handler_slow",
+                name: Optional[str] = None):
+    """
+    Декоратор бюджета для хэндлера (ставится под декоратором роутера)
+
+    Аргументы:
+        секунды(seconds): бюджет, None - HANDLER_TIME_BUDGET, 0 - без ограничения
+        отмена(cancel): True - медленная работа отменяется, иначе доводится до конца после запасного ответа
+        запасной ответ(fallback): ключ сообщения или функция (событие, язык) -> текст
+        имя(name): имя для HANDLER_TIME_BUDGETS и метрик, по умолчанию - имя функции
+    """
+    def decorator(func):
+        func.time_budget = TimeBudget(name or func.__name__, seconds, cancel, fallback)
+        return func
+    return decorator
+
+
+def time_budget_from(resolver: Callable[[Dict[str, Any]], Any]):
+    """Для хэндлеров-диспетчеров: бюджет берется у функции, которую вернет resolver(data)"""
+    def decorator(func):
+        func.time_budget_target = resolver
+        return func
+    return decorator
+
+
+class TimeBudgetMiddleware(BaseMiddleware):
+    """Ограничение времени до ответа пользователю"""
+
+    def __init__(self):
+        super().__init__()
+        #Хэндлеры, которые доводят работу после запасного ответа
+        self._finishing: Set[asyncio.Task] = set()
+
+        #Счетчики для мониторинга
+        self.overruns = 0
+        self.cancelled = 0
+        self.max_overrun = 0.0
+        self.by_handler: Dict[str, int] = {}
+
+    @staticmethod
+    def _policy(data: Dict[str, Any]) -> Optional[TimeBudget]:
+        handler_object = data.get("handler")
+        target = getattr(handler_object, "callback", None)
+        resolver = getattr(target, "time_budget_target", None)
+        if resolver is not None:
+            target = resolver(data)
+        if target is None:
+            return None
+        return getattr(target, "time_budget", None) or TimeBudget(getattr(target, "__name__", "handler"))
+
+    @staticmethod
+    def _seconds(policy: TimeBudget) -> float:
+        config = get_config()
+        seconds = config.HANDLER_TIME_BUDGETS.get(policy.name, policy.seconds)
+        return config.HANDLER_TIME_BUDGET if seconds is None else seconds
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        policy = self._policy(data)
+        seconds = self._seconds(policy) if policy is not None else 0
+        if seconds <= 0:
+            return await handler(event, data)
+
+        started = time.monotonic()
+        task = asyncio.ensure_future(handler(event, data))
+        #Блокировки цикла внутри хэндлера должны приписываться этому обновлению
+        track_task(task)
+        try:
+            done, _ = await asyncio.wait({task}, timeout=seconds)
+        except asyncio.CancelledError:
+            #Обновление отменили (остановка бота): хэндлер не должен остаться работать без владельца
+            await self._abandon(task, policy)
+            raise
+        if done:
+            return task.result()
+
+        self.overruns += 1
+        self.by_handler[policy.name] = self.by_handler.get(policy.name, 0) + 1
+        user = data.get("event_from_user")
+        user_id = user.id if user else None
+
+        if policy.cancel:
+            self.cancelled += 1
+            await self._abandon(task, policy)
+            logger.warning(f"Handler {policy.name} exceeded its {seconds:g}s budget for user {user_id}, cancelled")
+            await self._send_fallback(event, policy, user_id)
+            return None
+
+        logger.warning(f"Handler {policy.name} exceeded its {seconds:g}s budget for user {user_id}, "
+                       f"replying with a fallback and finishing the work")
+        self._finishing.add(task)
+        try:
+            answered = await self._send_fallback(event, policy, user_id)
+            #shield: если обновление отменят (остановка бота), начатое сохранение все равно завершится
+            return await asyncio.shield(task)
+        except TelegramBadRequest as e:
+            #На кнопку уже ответили запасным уведомлением, повторный callback.answer() хэндлера отклоняется
+            if answered and self._is_repeated_answer(e, event):
+                logger.debug(f"Callback query of {policy.name} was already answered by the fallback: {e}")
+                return None
+            raise
+        finally:
+            self._finishing.discard(task)
+            elapsed = time.monotonic() - started
+            self.max_overrun = max(self.max_overrun, elapsed)
+            logger.info(f"Handler {policy.name} finished for user {user_id} after {elapsed:.1f}s")
+
+    @staticmethod
+    async def _abandon(task: asyncio.Task, policy: TimeBudget):
+        """
+        Хэндлер больше не ждем: отменяемый - отменяем, остальные доводим до конца
+        (asyncio.wait не отменяет задачу, как и shield). Результат забираем, чтобы ошибка попала в лог
+        """
+        if policy.cancel:
+            task.cancel()
+            await asyncio.wait({task}, timeout=CANCEL_GRACE)
+        else:
+            await asyncio.wait({task})
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            logger.error(f"Handler {policy.name} failed: {task.exception()!r}")
+
+    @staticmethod
+    def _is_repeated_answer(error: TelegramBadRequest, event: TelegramObject) -> bool:
+        """Ошибка - отказ на повторный ответ именно на эту кнопку"""
+        return (isinstance(event, CallbackQuery)
+                and isinstance(error.method, AnswerCallbackQuery)
+                and error.method.callback_query_id == event.id
+                and QUERY_ANSWERED_ERROR in error.message.lower())
+
+    async def _send_fallback(self, event: TelegramObject, policy: TimeBudget, user_id: Optional[int]) -> bool:
+        """Отправляем запасной ответ; True - отправлен"""
+        lang = get_user_language(user_id) if user_id else DEFAULT_LANGUAGE
+        try:
+            if callable(policy.fallback):
+                text = policy.fallback(event, lang)
+            else:
+                text = get_message(policy.fallback, lang)
+            if not text:
+                return False
+            #Для кнопки - всплывающее уведомление (заодно снимает "часики"), для сообщения - ответ
+            if isinstance(event, (Message, CallbackQuery)):
+                await event.answer(text)
+                return True
+        except Exception as e:
+            logger.error(f"Failed to send fallback for {policy.name} to user {user_id}: {e}")
+        return False
+
+    def get_info(self) -> Dict[str, Any]:
+        """Состояние для мониторинга (превышения по хэндлерам - плоскими ключами overruns_*)"""
+        info = {f"overruns_{name}": count for name, count in self.by_handler.items()}
+        info["overruns"] = self.overruns
+        info["cancelled"] = self.cancelled
+        info["finishing"] = len(self._finishing)
+        info["max_overrun_ms"] = round(self.max_overrun * 1000)
+        return info
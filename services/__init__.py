@@ -2,5 +2,11 @@
 Инициализация пакета, который обрабатывает цитаты
 """
 from .quotes_api import QuotesAPI
+from .webhook import WebhookServer
+from .reminders import ReminderService
+from .export import export_data
+from .bot_session import BotSession
+from .loop_monitor import LoopMonitor
+from .profiler import run_profile
 
-__all__ = ['QuotesAPI']
+__all__ = ['QuotesAPI', 'WebhookServer', 'ReminderService', 'export_data', 'BotSession', 'LoopMonitor', 'run_profile']
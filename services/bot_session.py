@@ -0,0 +1,165 @@
+"""
+HTTP сессия бота для Bot API с настройкой пула соединений и метриками
+
+Поверх стандартной aiohttp сессии aiogram: размер пула, keep-alive и кэш DNS задаются
+в настройках, тайм-аут выбирается по методу (ответ на кнопку - короткий, загрузка
+файлов - длинный), адрес сервера можно заменить на свой Bot API сервер или заглушку.
+Через trace хуки aiohttp считаются новые и переиспользованные соединения и попадания в
+кэш DNS, в make_request - запросы в полете и время ответа по каждому методу
+"""
+import logging
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from aiohttp import ClientSession, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+from aiogram import Bot, __version__
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+#Методы, которые должны отвечать быстро (Telegram ждет ответа на кнопку недолго)
+FAST_METHODS = ("answerCallbackQuery", "sendChatAction")
+
+#Методы с загрузкой файлов
+UPLOAD_METHODS = ("sendDocument", "sendPhoto", "sendAudio", "sendVideo", "sendVoice",
+                  "sendAnimation", "sendVideoNote", "sendMediaGroup", "sendSticker")
+
+
+class _MethodStats:
+    """Счетчики одного метода Bot API"""
+
+    __slots__ = ("calls", "errors", "time", "max")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.time = 0.0
+        self.max = 0.0
+
+
+class BotSession(AiohttpSession):
+    """aiohttp сессия с настраиваемым пулом соединений, тайм-аутами по методам и метриками"""
+
+    def __init__(self, api_url: str = "", is_local: bool = False, pool_size: int = 100,
+                 keepalive: float = 60.0, dns_ttl: int = 3600, timeout: float = 30.0,
+                 fast_timeout: float = 10.0, upload_timeout: float = 120.0):
+        kwargs = {}
+        if api_url:
+            kwargs["api"] = TelegramAPIServer.from_base(api_url, is_local=is_local)
+        super().__init__(limit=pool_size, timeout=timeout, **kwargs)
+        self._connector_init.update(ttl_dns_cache=dns_ttl, keepalive_timeout=keepalive)
+
+        self.method_timeouts: Dict[str, float] = {}
+        self.method_timeouts.update(dict.fromkeys(FAST_METHODS, fast_timeout))
+        self.method_timeouts.update(dict.fromkeys(UPLOAD_METHODS, upload_timeout))
+
+        self._trace_config = TraceConfig()
+        self._trace_config.on_connection_create_end.append(self._on_connection_created)
+        self._trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+        self._trace_config.on_dns_cache_hit.append(self._on_dns_hit)
+        self._trace_config.on_dns_cache_miss.append(self._on_dns_miss)
+
+        #Счетчики для мониторинга
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections_new = 0
+        self.connections_reused = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+        self.methods: Dict[str, _MethodStats] = {}
+
+    async def create_session(self) -> ClientSession:
+        #Как в AiohttpSession, но с trace хуками для метрик соединений
+        if self._should_reset_connector:
+            await self.close()
+
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{__version__}"},
+                trace_configs=[self._trace_config]
+            )
+            self._should_reset_connector = False
+
+        return self._session
+
+    async def _on_connection_created(self, session: ClientSession, context: SimpleNamespace, params: Any):
+        self.connections_new += 1
+
+    async def _on_connection_reused(self, session: ClientSession, context: SimpleNamespace, params: Any):
+        self.connections_reused += 1
+
+    async def _on_dns_hit(self, session: ClientSession, context: SimpleNamespace, params: Any):
+        self.dns_hits += 1
+
+    async def _on_dns_miss(self, session: ClientSession, context: SimpleNamespace, params: Any):
+        self.dns_misses += 1
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: Optional[int] = None
+    ) -> TelegramType:
+        name = method.__api_method__
+        if timeout is None:
+            timeout = self.method_timeouts.get(name)
+
+        stats = self.methods.get(name)
+        if stats is None:
+            stats = self.methods[name] = _MethodStats()
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        started = time.monotonic()
+        try:
+            return await super().make_request(bot, method, timeout)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            self.in_flight -= 1
+            stats.calls += 1
+            stats.time += elapsed
+            stats.max = max(stats.max, elapsed)
+
+    def get_info(self) -> Dict[str, Any]:
+        """
+        Состояние для мониторинга. По методам: calls_*, errors_*, time_* (сумма секунд)
+        и max_* - плоские ключи, чтобы итоги воркеров складывались как остальные показатели
+        """
+        info = {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "connections_new": self.connections_new,
+            "connections_reused": self.connections_reused,
+            "dns_hits": self.dns_hits,
+            "dns_misses": self.dns_misses
+        }
+        for name, stats in self.methods.items():
+            info[f"calls_{name}"] = stats.calls
+            info[f"errors_{name}"] = stats.errors
+            info[f"time_{name}"] = stats.time
+            info[f"max_{name}"] = stats.max
+        return info
+
+
+def method_latencies(info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Статистика по методам из get_info() (в том числе объединенного), по убыванию числа вызовов"""
+    result = []
+    for key, calls in info.items():
+        if not key.startswith("calls_") or not calls:
+            continue
+        name = key[len("calls_"):]
+        result.append({
+            "method": name,
+            "calls": calls,
+            "errors": info.get(f"errors_{name}", 0),
+            "avg": info.get(f"time_{name}", 0.0) / calls,
+            "max": info.get(f"max_{name}", 0.0)
+        })
+    result.sort(key=lambda item: item["calls"], reverse=True)
+    return result
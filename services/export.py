@@ -0,0 +1,105 @@
+"""
+Выгрузка пользователей и задач для администратора (CSV или JSONL, по желанию в gzip)
+
+Записи читаются из базы порциями через асинхронный генератор, каждая порция
+форматируется в строку и дописывается в файл в отдельном потоке. Поэтому память
+не растет с размером выгрузки, а цикл событий не блокируется на записи и сжатии
+"""
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+EXPORT_FORMATS = ("csv", "jsonl")
+
+#Колонки CSV (JSONL содержит записи целиком)
+USER_FIELDS = ("id", "username", "language", "task_count", "created_at", "last_active")
+TASK_FIELDS = ("id", "user_id", "title", "description", "priority", "completed",
+               "due_at", "remind_at", "created_at", "updated_at")
+
+#Сколько записей читается и пишется за раз
+CHUNK_SIZE = 500
+
+
+def parse_export_options(words: List[str]) -> Tuple[str, bool]:
+    """Разбираем параметры выгрузки ("csv gz", "jsonl") -> (формат, сжатие). ValueError - неверные"""
+    fmt, compress = None, False
+    for word in words:
+        word = word.lower()
+        if word in ("gz", "gzip"):
+            compress = True
+        elif word in ("json", "jsonl"):
+            fmt = "jsonl"
+        elif word == "csv":
+            fmt = "csv"
+        else:
+            raise ValueError(f"Unknown export option '{word}'")
+    if fmt is None:
+        raise ValueError("Export format is not specified")
+    return fmt, compress
+
+
+def _open(path: str, compress: bool):
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def _format_csv(chunk: List[Dict[str, Any]], fields: Tuple[str, ...]) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore", restval="")
+    writer.writerows(chunk)
+    return buffer.getvalue()
+
+
+def _csv_header(fields: Tuple[str, ...]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(fields)
+    return buffer.getvalue()
+
+
+async def _write_table(db, f, table: str, fmt: str, fields: Tuple[str, ...]):
+    """Дописываем таблицу в файл порциями"""
+    record_type = table[:-1]
+    async for chunk in db.iter_records(table, CHUNK_SIZE):
+        if fmt == "csv":
+            text = _format_csv(chunk, fields)
+        else:
+            text = "".join(json.dumps({"type": record_type, **record}, ensure_ascii=False) + "\n"
+                           for record in chunk)
+        await asyncio.to_thread(f.write, text)
+
+
+async def export_data(db, directory: str, fmt: str, compress: bool, name: str = "export") -> List[str]:
+    """
+    Выгружаем пользователей и задачи в directory и возвращаем пути к файлам:
+    для CSV - два файла (пользователи и задачи), для JSONL - один со всеми записями
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    suffix = f".{fmt}" + (".gz" if compress else "")
+    if fmt == "csv":
+        targets = [(f"{name}_users_{stamp}{suffix}", [("users", USER_FIELDS)]),
+                   (f"{name}_tasks_{stamp}{suffix}", [("tasks", TASK_FIELDS)])]
+    else:
+        targets = [(f"{name}_{stamp}{suffix}", [("users", USER_FIELDS), ("tasks", TASK_FIELDS)])]
+
+    paths = []
+    for filename, tables in targets:
+        path = os.path.join(directory, filename)
+        f = await asyncio.to_thread(_open, path, compress)
+        try:
+            for table, fields in tables:
+                if fmt == "csv":
+                    await asyncio.to_thread(f.write, _csv_header(fields))
+                await _write_table(db, f, table, fmt, fields)
+        finally:
+            await asyncio.to_thread(f.close)
+        paths.append(path)
+    return paths
@@ -0,0 +1,191 @@
+"""
+Обнаружение блокировок цикла событий
+
+Heartbeat задача просыпается каждые interval секунд и измеряет, насколько позже
+положенного она проснулась (задержка цикла), задержки попадают в гистограмму.
+Сторожевой поток следит за временем последнего heartbeat: если цикл не отвечает дольше
+threshold, поток снимает стек главного потока (sys._current_frames) в момент блокировки
+и пишет его в лог вместе с обновлением, которое сейчас обрабатывается
+(его описание кладет мидлварь context_middleware). Задачи, которые запускаются при обработке
+обновления (например, хэндлер под бюджетом времени), регистрируются через track_task и
+получают то же описание. Так видно, какой код держит цикл: синхронная запись JSON,
+логирование, работа с файлами и т.д.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger(__name__)
+
+#Границы корзин гистограммы задержек, мс (последняя корзина - все, что больше)
+LAG_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+#Сколько кадров стека выводим в лог
+STACK_LIMIT = 30
+
+#Описание обновления, которое обрабатывается в текущем контексте
+current_update: ContextVar[Optional[str]] = ContextVar("current_update", default=None)
+
+#Задача -> описание обновления, которое она обрабатывает (читает сторожевой поток)
+active_updates: Dict[asyncio.Task, str] = {}
+
+
+def track_task(task: asyncio.Task):
+    """Задача, запущенная при обработке обновления, получает его описание для отчетов о блокировках"""
+    description = current_update.get()
+    if description is not None:
+        active_updates[task] = description
+        task.add_done_callback(_untrack_task)
+
+
+def _untrack_task(task: asyncio.Task):
+    active_updates.pop(task, None)
+
+
+def _bucket_name(index: int) -> str:
+    if index < len(LAG_BUCKETS_MS):
+        return f"lag_le_{LAG_BUCKETS_MS[index]}ms"
+    return f"lag_gt_{LAG_BUCKETS_MS[-1]}ms"
+
+
+def lag_percentile(info: Dict[str, Any], fraction: float) -> Optional[int]:
+    """Оценка перцентиля задержки (верхняя граница корзины, мс) по гистограмме из get_info()"""
+    counts = [info.get(_bucket_name(index), 0) for index in range(len(LAG_BUCKETS_MS) + 1)]
+    total = sum(counts)
+    if not total:
+        return None
+    threshold = total * fraction
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= threshold:
+            return LAG_BUCKETS_MS[min(index, len(LAG_BUCKETS_MS) - 1)]
+    return LAG_BUCKETS_MS[-1]
+
+
+class _ContextMiddleware(BaseMiddleware):
+    """Запоминаем, какое обновление обрабатывается в текущем контексте"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        description = f"update {event.update_id} ({event.event_type}) from user {user.id if user else '-'}"
+        if event.message and event.message.text:
+            description += f": {event.message.text[:64]!r}"
+        elif event.callback_query and event.callback_query.data:
+            description += f": callback {event.callback_query.data!r}"
+
+        task = asyncio.current_task()
+        token = current_update.set(description)
+        active_updates[task] = description
+        try:
+            return await handler(event, data)
+        finally:
+            active_updates.pop(task, None)
+            current_update.reset(token)
+
+
+class LoopMonitor:
+    """Heartbeat задача, сторожевой поток и гистограмма задержек цикла событий"""
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.25):
+        self.interval = interval
+        self.threshold = threshold
+        self.context_middleware = _ContextMiddleware()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._last_beat = time.monotonic()
+
+        #Метрики
+        self.histogram: List[int] = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.stalls = 0
+        self.max_lag = 0.0
+
+    async def start(self, **kwargs):
+        if self._heartbeat is not None or self.threshold <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat = asyncio.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Event loop monitor started: heartbeat {self.interval}s, stall threshold {self.threshold}s")
+
+    async def stop(self, **kwargs):
+        if self._heartbeat is None:
+            return
+        self._stopped.set()
+        self._heartbeat.cancel()
+        try:
+            await self._heartbeat
+        except asyncio.CancelledError:
+            pass
+        self._heartbeat = None
+        await asyncio.to_thread(self._watchdog.join, self.interval * 4)
+        self._watchdog = None
+
+    async def _beat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            self._record(max(0.0, now - expected))
+
+    def _record(self, lag: float):
+        lag_ms = lag * 1000
+        index = len(LAG_BUCKETS_MS)
+        for position, bound in enumerate(LAG_BUCKETS_MS):
+            if lag_ms <= bound:
+                index = position
+                break
+        self.histogram[index] += 1
+        self.max_lag = max(self.max_lag, lag)
+
+    def _watch(self):
+        """Сторожевой поток: один отчет на каждую блокировку"""
+        reported_beat = None
+        while not self._stopped.wait(self.interval):
+            last_beat = self._last_beat
+            blocked_for = time.monotonic() - last_beat - self.interval
+            if blocked_for < self.threshold or last_beat == reported_beat:
+                continue
+            reported_beat = last_beat
+            self.stalls += 1
+            self._report(blocked_for)
+
+    def _report(self, blocked_for: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT)) if frame else "<no frame>\n"
+        #Текущая задача цикла и ее контекст читаются из другого потока только для лога, без изменения состояния
+        task = asyncio.current_task(self._loop)
+        context = active_updates.get(task) if task is not None else None
+        logger.warning(
+            f"Event loop blocked for {blocked_for * 1000:.0f} ms"
+            f" while handling {context or 'no update'}"
+            f" (task {task.get_name() if task else '-'}):\n{stack}"
+        )
+
+    def get_info(self) -> Dict[str, Any]:
+        """Состояние для мониторинга (гистограмма - плоскими ключами lag_le_*ms)"""
+        info = {_bucket_name(index): count for index, count in enumerate(self.histogram)}
+        info["stalls"] = self.stalls
+        info["max_lag_ms"] = round(self.max_lag * 1000)
+        return info
@@ -0,0 +1,162 @@
+"""
+Отчет о памяти для /memstats
+
+Глубокий размер структуры считается обходом всех достижимых из нее объектов
+(dict, list, tuple, set, __dict__ и __slots__) с учетом общих объектов один раз.
+Размер приблизительный: интернированные строки и маленькие числа, общие для всего
+процесса, тоже попадают в счет. Коллекции копируются перед обходом (одна операция
+под GIL), поэтому обход можно выполнять в отдельном потоке, пока цикл событий меняет данные.
+
+Места выделения памяти берутся из снимка tracemalloc. Отслеживание включается при первом
+запросе (или сразу при запуске с PYTHONTRACEMALLOC=1), каждый следующий снимок
+сравнивается с предыдущим, чтобы было видно, где память растет
+"""
+import linecache
+import os
+import sys
+import threading
+import tracemalloc
+import types
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  #Windows
+    resource = None
+
+#Глубина стека для мест выделения
+TRACE_FRAMES = 5
+
+#Больше этого числа объектов одна структура не обходится (размер будет заниженным)
+MAX_OBJECTS = 5_000_000
+
+#Типы, внутри которых нечего обходить (функции и модули не обходим, чтобы не уйти во весь процесс)
+_ATOMIC = (str, bytes, bytearray, int, float, bool, complex, type(None), type,
+           types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType)
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> Tuple[int, int]:
+    """(байт, объектов), достижимых из obj; seen - id уже посчитанных объектов"""
+    seen = set() if seen is None else seen
+    size = 0
+    objects = 0
+    stack = [obj]
+    while stack and objects < MAX_OBJECTS:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current, 0)
+        objects += 1
+        if isinstance(current, _ATOMIC):
+            continue
+
+        if isinstance(current, dict):
+            for key, value in list(current.items()):
+                stack.append(key)
+                stack.append(value)
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(list(current))
+        else:
+            attributes = getattr(current, "__dict__", None)
+            if isinstance(attributes, dict):
+                stack.append(attributes)
+            for cls in type(current).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    value = getattr(current, slot, None)
+                    if value is not None:
+                        stack.append(value)
+    return size, objects
+
+
+def measure(structures: Dict[str, Any]) -> List[Tuple[str, int, int]]:
+    """(имя, байт, объектов) для каждой структуры, по убыванию размера. Общие объекты считаются у первой"""
+    seen: set = set()
+    result = [(name, *deep_sizeof(value, seen)) for name, value in structures.items()]
+    result.sort(key=lambda item: item[1], reverse=True)
+    return result
+
+
+def process_memory() -> Dict[str, int]:
+    """Текущий и пиковый RSS процесса, байт (то, что удалось узнать на этой платформе)"""
+    info = {}
+    if resource is not None:
+        #ru_maxrss в Linux - в килобайтах
+        info["max_rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    try:
+        with open("/proc/self/statm") as f:
+            info["rss"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    return info
+
+
+class AllocationTracker:
+    """Снимки tracemalloc: лучшие места выделения и рост с прошлого снимка"""
+
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _filter(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def snapshot(self, limit: int = 10) -> Dict[str, Any]:
+        """
+        Снимок: {"started": True, если отслеживание только что включено (данных еще нет),
+        "traced": текущий и пиковый объем, "top": [...], "diff": [...] (None - прошлого снимка нет)}
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACE_FRAMES)
+                self._previous = None
+                return {"started": True}
+
+            current = self._filter(tracemalloc.take_snapshot())
+            top = [(_location(stat.traceback), stat.size, stat.count)
+                   for stat in current.statistics("lineno")[:limit]]
+
+            diff = None
+            if self._previous is not None:
+                diff = [(_location(stat.traceback), stat.size_diff, stat.count_diff)
+                        for stat in current.compare_to(self._previous, "lineno")[:limit]
+                        if stat.size_diff]
+            self._previous = current
+
+            size, peak = tracemalloc.get_traced_memory()
+            return {"started": False, "traced": (size, peak), "top": top, "diff": diff}
+
+    def stop(self):
+        """Выключаем отслеживание (оно замедляет выделение памяти) и забываем снимок"""
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+
+
+def _location(traceback: tracemalloc.Traceback) -> str:
+    frame = traceback[0]
+    filename = frame.filename
+    #Пути внутри проекта и site-packages показываем короче
+    for root in (os.getcwd(), *sys.path):
+        if root and filename.startswith(root + os.sep):
+            filename = os.path.relpath(filename, root)
+            break
+    return f"{filename}:{frame.lineno}"
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+#Общий трекер процесса
+allocations = AllocationTracker()
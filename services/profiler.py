@@ -0,0 +1,146 @@
+"""
+Семплирующий профилировщик для /profile
+
+Отдельный поток каждые interval секунд снимает стеки всех остальных потоков процесса
+(sys._current_frames) и считает одинаковые стеки. Код бота при этом не инструментируется,
+поэтому накладные расходы ограничены частотой опроса и числом потоков, а память -
+числом разных стеков (MAX_STACKS) и глубиной (MAX_DEPTH).
+Результат - отчет по самым горячим функциям (собственное и общее время) и файл
+collapsed stacks ("поток;модуль:функция;... число") для flamegraph.pl / speedscope.
+Одновременно работает только один профиль
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+#Ограничения: длительность, частота опроса, число разных стеков и глубина стека
+MAX_SECONDS = 300
+DEFAULT_INTERVAL = 0.01
+MAX_STACKS = 20000
+MAX_DEPTH = 64
+
+#Сколько функций в отчете
+TOP_FUNCTIONS = 30
+
+_busy = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Профиль уже снимается"""
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}"
+
+
+class Profile:
+    """Собранные стеки (от внешнего кадра к внутреннему) и их количество"""
+
+    def __init__(self, seconds: float, interval: float):
+        self.seconds = seconds
+        self.interval = interval
+        self.samples = 0
+        self.dropped = 0
+        self.stacks: Counter = Counter()
+
+    def collapsed(self) -> str:
+        """Формат collapsed stacks: одна строка на стек"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = TOP_FUNCTIONS) -> List[Tuple[str, int, int]]:
+        """(функция, собственные отсчеты, общие отсчеты), по убыванию собственного времени"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            #Рекурсивная функция учитывается в стеке один раз
+            for name in set(stack[1:]):
+                total[name] += count
+        return [(name, count, total[name]) for name, count in own.most_common(limit)]
+
+    def report(self, limit: int = TOP_FUNCTIONS) -> str:
+        """Текстовый отчет по самым горячим функциям"""
+        lines = [
+            f"Sampling profile: {self.seconds:g}s, interval {self.interval * 1000:g} ms, "
+            f"{self.samples} stack samples, {len(self.stacks)} distinct stacks"
+            + (f", {self.dropped} samples over the stack limit" if self.dropped else ""),
+            "",
+            f"{'own':>8} {'own%':>6} {'total':>8} {'total%':>7}  function",
+        ]
+        samples = max(1, self.samples)
+        for name, own, total in self.top_functions(limit):
+            lines.append(f"{own:>8} {own * 100 / samples:>5.1f}% {total:>8} {total * 100 / samples:>6.1f}%  {name}")
+        return "\n".join(lines) + "\n"
+
+
+def _sample(profile: Profile, skip_thread: int, names: Dict[int, str]):
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id == skip_thread:
+            continue
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        stack.append(names.get(thread_id, f"thread-{thread_id}"))
+        key = tuple(reversed(stack))
+
+        profile.samples += 1
+        if key in profile.stacks or len(profile.stacks) < MAX_STACKS:
+            profile.stacks[key] += 1
+        else:
+            profile.dropped += 1
+
+
+def run_profile(seconds: float, interval: float = DEFAULT_INTERVAL) -> Profile:
+    """Снимаем профиль в текущем потоке (вызывать через asyncio.to_thread). ProfilerBusy - уже идет"""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        seconds = min(max(seconds, interval), MAX_SECONDS)
+        profile = Profile(seconds, interval)
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        names: Dict[int, str] = {}
+        ticks = 0
+
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if now >= next_sample:
+                #Имена потоков обновляем редко, они почти не меняются
+                if ticks % 100 == 0:
+                    names = {thread.ident: thread.name.replace(" ", "_") for thread in threading.enumerate()}
+                ticks += 1
+                _sample(profile, me, names)
+                next_sample += interval
+                #Если опрос не успевает, пропускаем отсчеты, а не догоняем их
+                if next_sample < now:
+                    next_sample = now + interval
+            time.sleep(max(0.0, min(next_sample, deadline) - time.monotonic()))
+        return profile
+    finally:
+        _busy.release()
+
+
+def is_running() -> bool:
+    return _busy.locked()
+
+
+def write_profile(profile: Profile, directory: str, name: Optional[str] = None) -> List[str]:
+    """Записываем отчет и collapsed stacks, возвращаем пути к файлам"""
+    name = name or f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    paths = []
+    for suffix, content in ((".txt", profile.report()), (".collapsed", profile.collapsed())):
+        path = os.path.join(directory, name + suffix)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        paths.append(path)
+    return paths
@@ -7,7 +7,7 @@ import time
 from typing import Optional, Dict, Any
 import aiohttp
 
-from config import Config
+from config import get_config
 
 logger = logging.getLogger(__name__)
 
@@ -16,12 +16,15 @@ class QuotesAPI:
     """Взаимодействие с сервисом ZenQuotes API"""
     
     def __init__(self):
-        self.config = Config()
-        self.base_url = self.config.ZENQUOTES_API_URL
+        self.base_url = get_config().ZENQUOTES_API_URL
         self.cache = {}
-        self.cache_duration = self.config.CACHE_DURATION
         self.timeout = aiohttp.ClientTimeout(total=10)
     
+    @property
+    def cache_duration(self) -> int:
+        """Время жизни кэша (читается из актуального снимка настроек)"""
+        return get_config().CACHE_DURATION
+    
     async def get_random_quote(self) -> Optional[Dict[str, Any]]:
         """
         Получает цитату с указанного сайта, кэширует и возвращает пользователю, если сработало
@@ -0,0 +1,174 @@
+"""
+Отправка напоминаний по задачам
+
+Планировщик спит до ближайшего напоминания из очереди базы (Database.reminders) и
+просыпается раньше, если появилось более раннее. Наступившие напоминания уходят в
+очередь отправки, которую разбирает отправитель с ограничением скорости
+(не больше REMINDER_SEND_RATE сообщений в секунду, с учетом retry_after от Telegram).
+Напоминание отмечается отправленным только после отправки (пачками, одной записью на диск);
+при временной ошибке оно возвращается в очередь и повторяется до MAX_ATTEMPTS раз
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from localization.messages import get_message, get_user_language
+from middleware.outbound import background_lane
+
+logger = logging.getLogger(__name__)
+
+#Дольше этого планировщик не спит (на случай перевода системных часов)
+MAX_SLEEP = 300.0
+
+#Повторы неотправленного напоминания: число попыток и задержка (умножается на номер попытки)
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 60.0
+
+#Сколько отправленных напоминаний отмечаем в базе одной записью
+MARK_BATCH = 50
+
+
+class ReminderService:
+    """Планировщик и отправитель напоминаний"""
+
+    def __init__(self, db, rate: float = 20.0):
+        self.db = db
+        self.interval = 1.0 / rate
+        self.outbox: asyncio.Queue = asyncio.Queue()
+
+        self._bot: Optional[Bot] = None
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+        #Задачи в очереди отправки, отправленные, но еще не отмеченные в базе, и число неудачных попыток
+        self._queued: Set[str] = set()
+        self._delivered: List[str] = []
+        self._attempts: Dict[str, int] = {}
+
+        #Счетчики для мониторинга
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def start(self, bot: Bot):
+        if self._tasks:
+            return
+        self._bot = bot
+        self.db.reminders.on_earlier = self._wakeup.set
+        self._tasks = [
+            asyncio.create_task(self._schedule_loop()),
+            asyncio.create_task(self._send_loop())
+        ]
+        logger.info(f"Reminder service started: {len(self.db.reminders)} reminders pending")
+
+    async def stop(self):
+        self.db.reminders.on_earlier = None
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self._flush_delivered()
+
+    async def _schedule_loop(self):
+        while True:
+            self._wakeup.clear()
+            for task in await self.db.pop_due_reminders(datetime.now()):
+                if task["id"] not in self._queued:
+                    self._queued.add(task["id"])
+                    self.outbox.put_nowait(task)
+
+            next_due = self.db.reminders.next_due()
+            timeout = MAX_SLEEP if next_due is None else min(MAX_SLEEP, max(0.0, next_due - time.time()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send_loop(self):
+        #Напоминания уступают ответам пользователям
+        with background_lane():
+            while True:
+                task = await self.outbox.get()
+                started = time.monotonic()
+                if not self.db.reminder_pending(task["id"]):
+                    #Задачу выполнили или удалили, пока напоминание ждало отправки
+                    self._queued.discard(task["id"])
+                elif await self._deliver(task):
+                    self._delivered.append(task["id"])
+                else:
+                    self._retry(task)
+                if len(self._delivered) >= MARK_BATCH or self.outbox.empty():
+                    await self._flush_delivered()
+                #Выдерживаем темп отправки
+                await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def _flush_delivered(self):
+        """Отмечаем отправленные напоминания в базе"""
+        if not self._delivered:
+            return
+        delivered, self._delivered = self._delivered, []
+        try:
+            await self.db.mark_reminded(delivered, datetime.now())
+        finally:
+            self._queued.difference_update(delivered)
+
+    def _retry(self, task: Dict[str, Any]):
+        """Возвращаем напоминание в очередь базы или сдаемся после MAX_ATTEMPTS попыток"""
+        task_id = task["id"]
+        attempts = self._attempts.get(task_id, 0) + 1
+        if attempts >= MAX_ATTEMPTS:
+            #Больше не пытаемся: отмечаем как обработанное, чтобы не повторять после перезапуска
+            self._attempts.pop(task_id, None)
+            self.failed += 1
+            logger.warning(f"Reminder for task {task_id} dropped after {attempts} attempts")
+            self._delivered.append(task_id)
+            return
+        self._attempts[task_id] = attempts
+        self._queued.discard(task_id)
+        self.retried += 1
+        self.db.retry_reminder(task_id, RETRY_DELAY * attempts)
+
+    async def _deliver(self, task: Dict[str, Any]) -> bool:
+        """Отправляем напоминание; False - временная ошибка, стоит повторить позже"""
+        user_id = task["user_id"]
+        lang = get_user_language(user_id)
+        text = get_message("task_reminder", lang).format(title=task["title"])
+        if task.get("due_at"):
+            text += "\n" + get_message("task_due", lang).format(
+                due=datetime.fromisoformat(task["due_at"]).strftime("%d.%m.%Y %H:%M"))
+
+        while True:
+            try:
+                await self._bot.send_message(user_id, text)
+                self.sent += 1
+                self._attempts.pop(task["id"], None)
+                return True
+            except TelegramRetryAfter as e:
+                logger.warning(f"Reminder sending throttled, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except TelegramForbiddenError:
+                #Повторять бессмысленно: напоминание считается обработанным
+                self.failed += 1
+                logger.info(f"User {user_id} blocked the bot, reminder for task {task['id']} dropped")
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to send reminder for task {task['id']}, will retry: {e}")
+                return False
+
+    def get_info(self) -> Dict[str, Any]:
+        """Состояние для мониторинга"""
+        return {
+            "pending": len(self.db.reminders),
+            "queued": self.outbox.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried
+        }
@@ -0,0 +1,134 @@
+"""
+Прием обновлений через вебхук (альтернатива long polling)
+
+aiohttp сервер проверяет секретный токен, сразу отвечает Telegram и кладет обновление
+в ограниченную очередь. Обработкой занимается фиксированное число воркеров, поэтому
+одновременно выполняется не больше WEBHOOK_WORKERS обработчиков. Если очередь заполнена,
+сервер отвечает 503 и Telegram повторит доставку позже (обратное давление).
+
+Локальная проверка без Telegram: оставить WEBHOOK_URL пустым и отправить сохраненное
+обновление запросом POST:
+    curl -X POST -H "Content-Type: application/json" \\
+         -H "X-Telegram-Bot-Api-Secret-Token: <WEBHOOK_SECRET>" \\
+         --data @update.json http://127.0.0.1:8080/webhook
+"""
+import asyncio
+import logging
+import secrets
+from typing import List, Optional
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Вебхук сервер с ограниченной очередью и пулом воркеров"""
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        path: str = "/webhook",
+        secret: Optional[str] = None,
+        workers: int = 16,
+        queue_size: int = 1000
+    ):
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret = secret
+        self.workers_count = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+        self._workers: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+
+        #Счетчики для мониторинга
+        self.received = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def build_app(self) -> web.Application:
+        """aiohttp приложение с маршрутом для обновлений"""
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Принимаем обновление: проверяем секрет, ставим в очередь и сразу отвечаем"""
+        if self.secret and not secrets.compare_digest(
+                request.headers.get(SECRET_HEADER, ""), self.secret):
+            logger.warning(f"Webhook request with invalid secret from {request.remote}")
+            return web.Response(status=401)
+
+        try:
+            payload = await request.json()
+            update = Update.model_validate(payload, context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Invalid webhook payload: {e}")
+            return web.Response(status=400)
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"Webhook queue is full, update {update.update_id} rejected")
+            return web.Response(status=503, headers={"Retry-After": "1"})
+
+        self.received += 1
+        return web.Response(status=200)
+
+    async def _worker(self):
+        """Передаем обновления из очереди диспетчеру"""
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error processing update {update.update_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def start(self, host: str, port: int):
+        """Запускаем воркеры и HTTP сервер"""
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers_count)]
+
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        logger.info(f"Webhook server listening on {host}:{port}{self.path} "
+                    f"({self.workers_count} workers, queue {self.queue.maxsize})")
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Останавливаем прием, дообрабатываем очередь и останавливаем воркеры"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook queue not drained, {self.queue.qsize()} updates dropped")
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def get_info(self) -> dict:
+        """Состояние очереди и счетчики"""
+        return {
+            "queue_size": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "workers": len(self._workers),
+            "received": self.received,
+            "rejected": self.rejected,
+            "failed": self.failed
+        }
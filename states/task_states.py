@@ -11,6 +11,8 @@ class TaskStates(StatesGroup):
     waiting_for_title = State()
     waiting_for_description = State()
     waiting_for_priority = State()
+    waiting_for_due_date = State()
+    waiting_for_reminder = State()
     
     #редактирование задач
     selecting_task_to_edit = State()
@@ -2,5 +2,11 @@
 Пакет по сохранению данных в базу данных в формате json
 """
 from .database import Database
+from .lru import LRUCache
+from .fsm_storage import DatabaseStorage
+from .archive import TaskArchive, ArchiveJob
+from .search_index import TaskSearchIndex
+from .timeseries import MetricsStore, metrics
+from .records import TaskRecord, UserRecord
 
-__all__ = ['Database']
+__all__ = ['Database', 'LRUCache', 'DatabaseStorage', 'TaskArchive', 'ArchiveJob', 'TaskSearchIndex', 'MetricsStore', 'metrics', 'TaskRecord', 'UserRecord']
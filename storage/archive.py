@@ -0,0 +1,85 @@
+"""
+Архив выполненных задач
+
+Старые выполненные задачи переносятся из рабочего набора в сжатый файл, который
+только дописывается: каждая порция - отдельный gzip блок с JSON строками (JSONL).
+Файл читается потоково и только по запросу (просмотр архива пользователем)
+"""
+import asyncio
+import gzip
+import json
+import logging
+from collections import deque
+from datetime import timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TaskArchive:
+    """Сжатый архив задач, который только дописывается"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def append(self, tasks: List[Dict[str, Any]]):
+        """Дописываем задачи в архив (блокирующая операция, вызывать через поток)"""
+        if not tasks:
+            return
+        lines = "".join(json.dumps(task, ensure_ascii=False) + "\n" for task in tasks)
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write(lines)
+
+    def iter_tasks(self) -> Iterator[Dict[str, Any]]:
+        """Потоково читаем все задачи архива"""
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except FileNotFoundError:
+            return
+        except (EOFError, OSError) as e:
+            #Последний блок мог дописываться в момент чтения
+            logger.warning(f"Archive {self.path} read stopped early: {e}")
+
+    def read_user_tasks(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Последние limit задач пользователя, новые первыми (блокирующая операция)"""
+        latest = deque(maxlen=limit)
+        for task in self.iter_tasks():
+            if task.get("user_id") == user_id:
+                latest.append(task)
+        return list(reversed(latest))
+
+
+class ArchiveJob:
+    """Фоновая задача, которая периодически переносит старые выполненные задачи в архив"""
+
+    def __init__(self, db, archive_after: timedelta, interval: float):
+        self.db = db
+        self.archive_after = archive_after
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Archive job started: tasks completed more than "
+                        f"{self.archive_after.days} days ago are archived")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.db.archive_completed(self.archive_after)
+            except Exception as e:
+                logger.error(f"Archive job failed: {e}")
+            await asyncio.sleep(self.interval)
@@ -1,15 +1,48 @@
 """
 JSON база данных
 """
+import asyncio
+import heapq
 import json
 import logging
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Iterable, Optional, Tuple
 from threading import Lock
 
+from .archive import TaskArchive
+from .search_index import TaskSearchIndex
+from .reminder_queue import ReminderQueue
+from .sorted_index import SortedIndex
+from .records import TaskRecord, UserRecord, priority_code, to_epoch
+
 logger = logging.getLogger(__name__)
 
+#Отсортированные индексы для постраничного просмотра: имя -> (таблица, ключ записи)
+BROWSE_INDEXES = {
+    "users_last_active": ("users", lambda user: (user.last_active_ts,)),
+    "users_task_count": ("users", lambda user: (user.task_count,)),
+    "users_created_at": ("users", lambda user: (user.created_ts,)),
+    "tasks_created_at": ("tasks", lambda task: (task.created_ts,)),
+    "tasks_priority": ("tasks", lambda task: (task.priority, task.created_ts)),
+}
+
+#Таблицы компактных записей (пишутся на диск потоково) и размер порции записи
+RECORD_TABLES = ("users", "tasks")
+SAVE_CHUNK = 1000
+
+#Индексы, ключ которых меняется почти на каждом обновлении: изменения применяются пачкой при чтении
+LAZY_INDEXES = {"users_last_active"}
+
+#Индексы с неизменяемым ключом, по которым таблица обходится курсором (iter_records)
+ITER_INDEXES = {"users": "users_created_at", "tasks": "tasks_created_at"}
+
+
+def archive_file_for(db_file: str) -> str:
+    """Файл архива рядом с базой: data/database.json -> data/database.archive.jsonl.gz"""
+    root, _ = os.path.splitext(db_file)
+    return f"{root}.archive.jsonl.gz"
+
 
 class Database:
     """JSON база данных для хранения данных по боту"""
@@ -27,6 +60,7 @@ class Database:
                         "users": {},
                         "tasks": {},
                         "banned_users": set(),
+                        "fsm_states": {},
                         "statistics": {
                             "total_requests": 0,
                             "total_tasks_created": 0,
@@ -34,6 +68,16 @@ class Database:
                         }
                     }
                     cls._instance.file_lock = Lock()
+                    cls._instance.archive = TaskArchive(archive_file_for(db_file))
+                    cls._instance.search_index = TaskSearchIndex(
+                        lambda: list(cls._instance.data["tasks"].values()))
+                    cls._instance.reminders = ReminderQueue()
+                    #Версии списков задач: user_id -> номер, растет при каждом изменении задач пользователя
+                    cls._instance.task_versions = {}
+                    cls._instance.browse_indexes = {
+                        name: SortedIndex(key_func, cls._instance._table_loader(table), lazy=name in LAZY_INDEXES)
+                        for name, (table, key_func) in BROWSE_INDEXES.items()
+                    }
         return cls._instance
     
     async def initialize(self):
@@ -50,51 +94,145 @@ class Database:
                 if isinstance(self.data.get("banned_users"), list):
                     self.data["banned_users"] = set(self.data["banned_users"])
                 
+                #Словари из JSON -> компактные записи
+                self.data["users"] = {key: UserRecord.from_dict(user)
+                                      for key, user in self.data["users"].items()}
+                self.data["tasks"] = {key: TaskRecord.from_dict(task, key)
+                                      for key, task in self.data["tasks"].items()}
+                
                 logger.info(f"Database loaded from {self.db_file}")
             else:
                 await self._save_data()
                 logger.info(f"New database created at {self.db_file}")
+            
+            #Расписание напоминаний восстанавливаем из задач
+            self.reminders.rebuild(
+                (task.id, task.remind_ts)
+                for task in self.data["tasks"].values()
+                if self._reminder_pending(task)
+            )
                 
         except Exception as e:
             logger.error(f"Error initializing database: {e}")
             raise
     
     async def _save_data(self):
-        """Сохраняем данные в JSON формате"""
+        """
+        Сохраняем данные в JSON формате. Таблицы записей пишутся потоково, порциями:
+        полная копия данных в виде словарей не собирается, а порция кодируется
+        быстрым (C) кодировщиком json.dumps
+        """
         try:
             with self.file_lock:
-                data_to_save = self.data.copy()
-                data_to_save["banned_users"] = list(self.data["banned_users"])
-                
                 with open(self.db_file, 'w', encoding='utf-8') as f:
-                    json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+                    f.write("{\n")
+                    for position, (name, value) in enumerate(self.data.items()):
+                        f.write(",\n" if position else "")
+                        f.write(f"{json.dumps(name)}: ")
+                        if name in RECORD_TABLES:
+                            self._write_records(f, value)
+                        elif name == "banned_users":
+                            f.write(json.dumps(list(value)))
+                        else:
+                            f.write(json.dumps(value, ensure_ascii=False))
+                    f.write("\n}\n")
                     
         except Exception as e:
             logger.error(f"Error saving database: {e}")
             raise
     
+    @staticmethod
+    def _write_records(f, records: Dict[str, Any]):
+        """Пишем таблицу записей порциями по SAVE_CHUNK (в памяти одновременно только одна порция)"""
+        f.write("{")
+        separator = "\n"
+        chunk = {}
+        for key, record in records.items():
+            chunk[key] = record.to_dict()
+            if len(chunk) >= SAVE_CHUNK:
+                f.write(separator + json.dumps(chunk, ensure_ascii=False)[1:-1])
+                separator = ",\n"
+                chunk = {}
+        if chunk:
+            f.write(separator + json.dumps(chunk, ensure_ascii=False)[1:-1])
+        f.write("\n}")
+    
     async def add_user(self, user_id: int, username: str = None):
         """Добавляем информацю о пользователе или обновляем"""
         user_key = str(user_id)
-        current_time = datetime.now().isoformat()
+        current_time = int(datetime.now().timestamp())
         
-        if user_key not in self.data["users"]:
-            self.data["users"][user_key] = {
-                "id": user_id,
-                "username": username,
-                "created_at": current_time,
-                "last_active": current_time,
-                "task_count": 0,
-                "language": "ru"
-            }
+        user = self.data["users"].get(user_key)
+        if user is None:
+            user = self.data["users"][user_key] = UserRecord(
+                id=user_id,
+                username=username,
+                created_ts=current_time,
+                last_active_ts=current_time
+            )
             logger.info(f"New user added: {user_id} ({username})")
         else:
-            self.data["users"][user_key]["last_active"] = current_time
+            user.last_active_ts = current_time
             if username:
-                self.data["users"][user_key]["username"] = username
+                user.username = username
+        self._index_record("users", user)
         
         await self._save_data()
     
+    def _table_loader(self, table: str):
+        """Загрузка всех записей таблицы для ленивой сборки индекса"""
+        return lambda: list(self.data[table].values())
+    
+    def _index_record(self, table: str, record: Dict[str, Any]):
+        """Обновляем позицию записи в отсортированных индексах таблицы"""
+        for name, (index_table, _) in BROWSE_INDEXES.items():
+            if index_table == table:
+                self.browse_indexes[name].update(record)
+    
+    def _unindex_record(self, table: str, record_id):
+        """Убираем запись из отсортированных индексов таблицы"""
+        for name, (index_table, _) in BROWSE_INDEXES.items():
+            if index_table == table:
+                self.browse_indexes[name].remove(record_id)
+    
+    async def browse(self, index: str, after: Optional[Tuple[tuple, Any]], limit: int) -> Dict[str, Any]:
+        """
+        Страница записей по отсортированному индексу (по убыванию) после курсора after.
+        Возвращаем {"entries": [(ключ, id, запись)], "total": число записей}
+        """
+        table_name = BROWSE_INDEXES[index][0]
+        table = self.data[table_name]
+        sorted_index = self.browse_indexes[index]
+        entries = []
+        for key, record_id in sorted_index.page_desc(after, limit):
+            #Пользователи хранятся по строковому id
+            record = table.get(str(record_id) if table_name == "users" else record_id)
+            if record is not None:
+                entries.append((key, record_id, record))
+        return {"entries": entries, "total": len(sorted_index)}
+    
+    async def iter_records(self, table: str, chunk_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Потоково отдаем записи таблицы (users или tasks) порциями по chunk_size.
+        Обход идет курсором по индексу с неизменяемым ключом (время создания), поэтому
+        копия таблицы или списка ключей не создается. Между порциями отпускаем цикл событий:
+        записи, удаленные за это время, пропускаются, добавленные попадают в конец обхода
+        """
+        records = self.data[table]
+        sorted_index = self.browse_indexes[ITER_INDEXES[table]]
+        after = None
+        while True:
+            page = sorted_index.page_asc(after, chunk_size)
+            if not page:
+                return
+            after = page[-1]
+            chunk = [record for record in (records.get(str(record_id) if table == "users" else record_id)
+                                           for _, record_id in page)
+                     if record is not None]
+            if chunk:
+                yield chunk
+            await asyncio.sleep(0)
+    
     async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получаем информацию по ID"""
         user_key = str(user_id)
@@ -103,7 +241,30 @@ class Database:
     async def get_all_users(self) -> List[Dict[str, Any]]:
         """Получаем всех пользователей"""
         return list(self.data["users"].values())
-    
+
+    def get_user_language(self, user_id: int) -> Optional[str]:
+        """Получаем сохраненный язык пользователя (синхронно, данные уже в памяти)"""
+        user = self.data["users"].get(str(user_id))
+        if user is None:
+            return None
+        return user.language
+
+    async def set_user_language(self, user_id: int, language: str):
+        """Сохраняем язык пользователя"""
+        user_key = str(user_id)
+        if user_key not in self.data["users"]:
+            await self.add_user(user_id)
+
+        self.data["users"][user_key]["language"] = language
+        await self._save_data()
+        logger.info(f"User {user_id} language saved: {language}")
+
+    def get_recent_user_languages(self, limit: int) -> List[tuple]:
+        """Языки недавно активных пользователей (для прогрева кэша при запуске)"""
+        users = heapq.nlargest(limit, self.data["users"].values(),
+                               key=lambda user: user.last_active_ts)
+        return [(user.id, user.language) for user in users]
+
     async def ban_user(self, user_id: int):
         """Блокировка"""
         self.data["banned_users"].add(user_id)
@@ -119,29 +280,44 @@ class Database:
     async def is_user_banned(self, user_id: int) -> bool:
         return user_id in self.data["banned_users"]
     
-    async def add_task(self, user_id: int, title: str, description: str = "", priority: str = "medium") -> str:
-        """Новая задача у пользователя"""
-        task_id = f"{user_id}_{int(datetime.now().timestamp())}"
-        current_time = datetime.now().isoformat()
+    async def add_task(self, user_id: int, title: str, description: str = "", priority: str = "medium",
+                       due_at: Optional[str] = None, remind_at: Optional[str] = None) -> str:
+        """Новая задача у пользователя (due_at и remind_at - необязательные даты в ISO формате)"""
+        current_time = int(datetime.now().timestamp())
+        task_id = f"{user_id}_{current_time}"
 
         if "tasks" not in self.data:
             self.data["tasks"] = {}
         
-        self.data["tasks"][task_id] = {
-            "id": task_id,
-            "user_id": user_id,
-            "title": title,
-            "description": description,
-            "priority": priority,
-            "completed": False,
-            "created_at": current_time,
-            "updated_at": current_time
-        }
+        #Несколько задач за одну секунду не должны перезаписывать друг друга
+        if task_id in self.data["tasks"]:
+            suffix = 1
+            while f"{task_id}_{suffix}" in self.data["tasks"]:
+                suffix += 1
+            task_id = f"{task_id}_{suffix}"
+        
+        #id пользователя берем из его записи, чтобы задачи не хранили свои копии числа
+        user = self.data["users"].get(str(user_id))
+        task = self.data["tasks"][task_id] = TaskRecord(
+            id=task_id,
+            user_id=user.id if user is not None else user_id,
+            title=title,
+            description=description,
+            priority=priority_code(priority),
+            created_ts=current_time,
+            updated_ts=current_time,
+            due_ts=to_epoch(due_at),
+            remind_ts=to_epoch(remind_at)
+        )
+        self.search_index.add(task)
+        self._schedule_reminder(task)
+        self._index_record("tasks", task)
+        self._bump_tasks_version(task.user_id)
         
         #Число задач пользователя
-        user_key = str(user_id)
-        if user_key in self.data["users"]:
-            self.data["users"][user_key]["task_count"] += 1
+        if user is not None:
+            user.task_count += 1
+            self._index_record("users", user)
         
         #Статистика
         self.data["statistics"]["total_tasks_created"] += 1
@@ -151,63 +327,213 @@ class Database:
         
         return task_id
     
+    def get_tasks_version(self, user_id: int) -> int:
+        """Версия списка задач пользователя (меняется при любом изменении его задач)"""
+        return self.task_versions.get(user_id, 0)
+    
+    def _bump_tasks_version(self, user_id: int):
+        self.task_versions[user_id] = self.task_versions.get(user_id, 0) + 1
+    
     async def get_user_tasks(self, user_id: int) -> List[Dict[str, Any]]:
         """Получаем все задачи по пользователю"""
         if "tasks" not in self.data:
             return []
         
+        #Обходим с конца, чтобы задачи, созданные в одну секунду, тоже шли от новых к старым
         user_tasks = []
-        for task in self.data["tasks"].values():
-            if task["user_id"] == user_id:
+        for task in reversed(self.data["tasks"].values()):
+            if task.user_id == user_id:
                 user_tasks.append(task)
 
-        user_tasks.sort(key=lambda x: x["created_at"], reverse=True)
+        user_tasks.sort(key=lambda task: task.created_ts, reverse=True)
         return user_tasks
     
+    async def search_tasks(self, user_id: int, query: str) -> List[Dict[str, Any]]:
+        """Поиск по задачам пользователя, самые подходящие первыми"""
+        tasks = self.data["tasks"]
+        return [tasks[task_id] for task_id, _ in self.search_index.search(user_id, query)
+                if task_id in tasks]
+    
     async def update_task_status(self, task_id: str, completed: bool):
         """Обновляем статус выполнения задачи"""
-        if task_id in self.data["tasks"]:
-            self.data["tasks"][task_id]["completed"] = completed
-            self.data["tasks"][task_id]["updated_at"] = datetime.now().isoformat()
+        task = self.data["tasks"].get(task_id)
+        if task is not None:
+            task.completed = completed
+            task.updated_ts = int(datetime.now().timestamp())
+            self._schedule_reminder(task)
+            self._bump_tasks_version(task.user_id)
             await self._save_data()
             logger.info(f"Task {task_id} status updated to {completed}")
     
     async def delete_task(self, task_id: str):
         """Удаление задачи"""
-        if task_id in self.data["tasks"]:
-            task = self.data["tasks"][task_id]
-            user_id = task["user_id"]
-            
-            del self.data["tasks"][task_id]
-            
-            #Обновляем число задач по пользователю
-            user_key = str(user_id)
-            if user_key in self.data["users"]:
-                self.data["users"][user_key]["task_count"] = max(0, 
-                    self.data["users"][user_key]["task_count"] - 1)
-            
+        if self._remove_task(task_id):
             await self._save_data()
             logger.info(f"Task {task_id} deleted")
     
+    def _remove_task(self, task_id: str) -> bool:
+        """Удаляем задачу из памяти без записи на диск"""
+        task = self.data["tasks"].pop(task_id, None)
+        if task is None:
+            return False
+        self.search_index.remove(task_id)
+        self.reminders.cancel(task_id)
+        self._unindex_record("tasks", task_id)
+        self._bump_tasks_version(task.user_id)
+        
+        #Обновляем число задач по пользователю
+        user = self.data["users"].get(str(task.user_id))
+        if user is not None:
+            user.task_count = max(0, user.task_count - 1)
+            self._index_record("users", user)
+        return True
+    
+    @staticmethod
+    def _reminder_pending(task: TaskRecord) -> bool:
+        """Напоминание по задаче задано и еще не отправлено"""
+        return task.remind_ts is not None and not task.completed and task.reminded_ts is None
+    
+    def _schedule_reminder(self, task: TaskRecord):
+        """Ставим или снимаем напоминание по текущему состоянию задачи"""
+        if self._reminder_pending(task):
+            self.reminders.schedule(task.id, task.remind_ts)
+        else:
+            self.reminders.cancel(task.id)
+    
+    async def pop_due_reminders(self, now: datetime) -> List[Dict[str, Any]]:
+        """
+        Забираем задачи, по которым пора напомнить. Отправленными они отмечаются только
+        после отправки (mark_reminded), поэтому после перезапуска неотправленные вернутся в очередь
+        """
+        due = []
+        for task_id in self.reminders.pop_due(now.timestamp()):
+            task = self.data["tasks"].get(task_id)
+            if task is not None and self._reminder_pending(task):
+                due.append(task)
+        return due
+    
+    def reminder_pending(self, task_id: str) -> bool:
+        """Напоминание по задаче все еще нужно отправить (задачу не удалили, не выполнили)"""
+        task = self.data["tasks"].get(task_id)
+        return task is not None and self._reminder_pending(task)
+    
+    def retry_reminder(self, task_id: str, delay: float):
+        """Возвращаем неотправленное напоминание в очередь через delay секунд"""
+        task = self.data["tasks"].get(task_id)
+        if task is not None and self._reminder_pending(task):
+            self.reminders.schedule(task.id, datetime.now().timestamp() + delay)
+    
+    async def mark_reminded(self, task_ids: Iterable[str], at: datetime):
+        """Отмечаем напоминания отправленными одной записью на диск"""
+        marked = 0
+        for task_id in task_ids:
+            task = self.data["tasks"].get(task_id)
+            if task is not None and task.reminded_ts is None:
+                task.reminded_ts = int(at.timestamp())
+                self.reminders.cancel(task.id)
+                marked += 1
+        if marked:
+            await self._save_data()
+    
+    async def complete_many(self, task_ids: Iterable[str]) -> int:
+        """Отмечаем несколько задач выполненными одной записью на диск"""
+        current_time = int(datetime.now().timestamp())
+        completed = 0
+        
+        for task_id in task_ids:
+            task = self.data["tasks"].get(task_id)
+            if task is not None and not task.completed:
+                task.completed = True
+                task.updated_ts = current_time
+                self.reminders.cancel(task_id)
+                self._bump_tasks_version(task.user_id)
+                completed += 1
+        
+        if completed:
+            await self._save_data()
+            logger.info(f"{completed} tasks marked as completed")
+        return completed
+    
+    async def delete_many(self, task_ids: Iterable[str]) -> int:
+        """Удаляем несколько задач одной записью на диск"""
+        deleted = sum(1 for task_id in task_ids if self._remove_task(task_id))
+        
+        if deleted:
+            await self._save_data()
+            logger.info(f"{deleted} tasks deleted")
+        return deleted
+    
+    async def delete_completed(self, user_id: int) -> int:
+        """Удаляем все выполненные задачи пользователя"""
+        task_ids = [task.id for task in self.data["tasks"].values()
+                    if task.user_id == user_id and task.completed]
+        return await self.delete_many(task_ids)
+    
+    async def ban_many(self, user_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """Блокируем нескольких пользователей, возвращаем записи найденных"""
+        banned = []
+        for user_id in dict.fromkeys(user_ids):
+            user = self.data["users"].get(str(user_id))
+            if user is not None:
+                self.data["banned_users"].add(user_id)
+                banned.append(user)
+        
+        if banned:
+            await self._save_data()
+            logger.info(f"Users {[user['id'] for user in banned]} have been banned")
+        return banned
+    
+    async def archive_completed(self, older_than: timedelta) -> int:
+        """Переносим выполненные задачи, закрытые раньше older_than назад, в архив"""
+        cutoff = int((datetime.now() - older_than).timestamp())
+        to_archive = [task for task in self.data["tasks"].values()
+                      if task.completed and task.updated_ts < cutoff]
+        if not to_archive:
+            return 0
+        
+        #Убираем задачи из рабочего набора до записи в архив: пока файл пишется в отдельном
+        #потоке, другие хэндлеры уже не могут изменить или удалить архивируемую копию
+        for task in to_archive:
+            self.data["tasks"].pop(task.id, None)
+            self.search_index.remove(task.id)
+            self._unindex_record("tasks", task.id)
+            self._bump_tasks_version(task.user_id)
+        
+        try:
+            await asyncio.to_thread(self.archive.append, [task.to_dict() for task in to_archive])
+        except Exception:
+            #Архив не записан - возвращаем задачи в рабочий набор
+            for task in to_archive:
+                self.data["tasks"][task.id] = task
+                self.search_index.add(task)
+                self._index_record("tasks", task)
+                self._bump_tasks_version(task.user_id)
+            raise
+        
+        statistics = self.data["statistics"]
+        statistics["archived_tasks"] = statistics.get("archived_tasks", 0) + len(to_archive)
+        
+        await self._save_data()
+        logger.info(f"Archived {len(to_archive)} completed tasks")
+        return len(to_archive)
+    
+    async def get_archived_tasks(self, user_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+        """Последние задачи пользователя из архива (чтение в отдельном потоке)"""
+        return await asyncio.to_thread(self.archive.read_user_tasks, user_id, limit)
+    
     async def get_statistics(self) -> Dict[str, Any]:
         """Статистика по боту"""
         total_users = len(self.data["users"])
-        total_tasks = len(self.data.get("tasks", {}))
+        #Архивные задачи выполнены и по-прежнему учитываются
+        archived_tasks = self.data["statistics"].get("archived_tasks", 0)
+        total_tasks = len(self.data.get("tasks", {})) + archived_tasks
 
         completed_tasks = sum(1 for task in self.data.get("tasks", {}).values() 
-                            if task.get("completed", False))
+                            if task.completed) + archived_tasks
 
-        #Число активных пользователей за последние сутки
-        yesterday = datetime.now() - timedelta(days=1)
-        active_users = 0
-        
-        for user in self.data["users"].values():
-            try:
-                last_active = datetime.fromisoformat(user.get("last_active", ""))
-                if last_active > yesterday:
-                    active_users += 1
-            except:
-                continue
+        #Число активных пользователей за последние сутки (даты уже в epoch, без разбора строк)
+        yesterday = int((datetime.now() - timedelta(days=1)).timestamp())
+        active_users = sum(1 for user in self.data["users"].values() if user.last_active_ts > yesterday)
         
         return {
             "total_users": total_users,
@@ -218,6 +544,27 @@ class Database:
             **self.data["statistics"]
         }
     
+    def get_fsm_record(self, key: str) -> Optional[Dict[str, Any]]:
+        """Получаем сохраненное FSM состояние по ключу"""
+        return self.data["fsm_states"].get(key)
+
+    def get_fsm_records(self) -> Dict[str, Dict[str, Any]]:
+        """Все сохраненные FSM состояния"""
+        return self.data["fsm_states"]
+
+    def stage_fsm_record(self, key: str, record: Optional[Dict[str, Any]]):
+        """Кладем FSM состояние в базу без записи на диск (None - удалить)"""
+        if record is None:
+            self.data["fsm_states"].pop(key, None)
+        else:
+            self.data["fsm_states"][key] = record
+
+    async def save_fsm_records(self, records: Dict[str, Optional[Dict[str, Any]]]):
+        """Сохраняем пачку FSM состояний одной записью на диск"""
+        for key, record in records.items():
+            self.stage_fsm_record(key, record)
+        await self._save_data()
+    
     async def update_statistics(self, stat_name: str, increment: int = 1):
         """Обновляем данные по статистике"""
         if stat_name in self.data["statistics"]:
@@ -0,0 +1,181 @@
+"""
+FSM хранилище поверх базы данных бота
+
+Активные состояния держатся в ограниченном LRU кэше в памяти, остальные лежат в базе.
+Брошенные сценарии (/addtask, /ban, /broadcast и т.д.) удаляются по TTL через колесо таймеров.
+Изменения копятся и сохраняются на диск пачкой, а не на каждый шаг сценария
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Set
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from .database import Database
+from .lru import LRUCache
+from .timer_wheel import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+
+class FSMRecord:
+    """Состояние и данные одного FSM ключа"""
+
+    __slots__ = ("state", "data", "touched")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None,
+                 touched: float = 0.0):
+        self.state = state
+        self.data = data if data is not None else {}
+        self.touched = touched
+
+    def is_empty(self) -> bool:
+        return self.state is None and not self.data
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"state": self.state, "data": self.data, "touched": self.touched}
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> "FSMRecord":
+        return cls(raw.get("state"), dict(raw.get("data") or {}), raw.get("touched", 0.0))
+
+
+class DatabaseStorage(BaseStorage):
+    """FSM хранилище с горячим кэшем, истечением по TTL и пакетным сохранением"""
+
+    def __init__(
+        self,
+        db: Database,
+        ttl: int = 3600,
+        hot_size: int = 10000,
+        flush_interval: float = 5.0,
+        sweep_tick: float = 60.0,
+        key_builder: Optional[KeyBuilder] = None,
+    ):
+        self.db = db
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+        self._hot = LRUCache(maxsize=hot_size, on_evict=self._on_evict)
+        self._dirty: Set[str] = set()
+        self._wheel = TimerWheel(tick=sweep_tick, horizon=ttl, now=time.time())
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Ставим сохраненные состояния на учет TTL и запускаем фоновую задачу"""
+        for key, raw in self.db.get_fsm_records().items():
+            self._wheel.schedule(key, raw.get("touched", 0.0) + self.ttl)
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._maintenance_loop())
+        logger.info(f"FSM storage started: {len(self._wheel)} saved states, ttl {self.ttl}s")
+
+    async def close(self):
+        """Останавливаем фоновую задачу и сохраняем все несохраненные изменения"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.sweep()
+                await self.flush()
+            except Exception as e:
+                logger.error(f"FSM storage maintenance failed: {e}")
+
+    def sweep(self) -> int:
+        """Удаляем состояния, к которым не обращались дольше TTL"""
+        expired = self._wheel.advance(time.time())
+        for key in expired:
+            self._hot.pop(key)
+            self.db.stage_fsm_record(key, None)
+            self._dirty.add(key)
+
+        if expired:
+            logger.info(f"FSM storage expired {len(expired)} abandoned states")
+        return len(expired)
+
+    async def flush(self):
+        """Сохраняем накопленные изменения одной записью на диск"""
+        if not self._dirty:
+            return
+
+        records = {}
+        for key in self._dirty:
+            record = self._hot.peek(key)
+            if record is None:
+                #Вытеснено или удалено - в базе уже актуальная версия
+                records[key] = self.db.get_fsm_record(key)
+            else:
+                records[key] = None if record.is_empty() else record.to_dict()
+        self._dirty.clear()
+
+        await self.db.save_fsm_records(records)
+        logger.debug(f"FSM storage flushed {len(records)} states")
+
+    def _on_evict(self, key: str, record: FSMRecord):
+        """Вытесненное из памяти состояние переносим в базу (на диск попадет при сохранении)"""
+        self.db.stage_fsm_record(key, None if record.is_empty() else record.to_dict())
+
+    def _get_record(self, key: str) -> Optional[FSMRecord]:
+        record = self._hot.get(key)
+        if record is None:
+            raw = self.db.get_fsm_record(key)
+            if raw is None:
+                return None
+            record = FSMRecord.from_dict(raw)
+            self._hot.set(key, record)
+        return record
+
+    def _touch(self, key: str, record: FSMRecord):
+        self._dirty.add(key)
+        if record.is_empty():
+            self._hot.pop(key)
+            self.db.stage_fsm_record(key, None)
+            self._wheel.cancel(key)
+            return
+
+        record.touched = time.time()
+        self._hot.set(key, record)
+        self._wheel.schedule(key, record.touched + self.ttl)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        record = self._get_record(storage_key) or FSMRecord()
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(storage_key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._get_record(self.key_builder.build(key))
+        return record.state if record is not None else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        storage_key = self.key_builder.build(key)
+        record = self._get_record(storage_key) or FSMRecord()
+        record.data = data.copy()
+        self._touch(storage_key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._get_record(self.key_builder.build(key))
+        return record.data.copy() if record is not None else {}
+
+    def memory_structures(self) -> Dict[str, Any]:
+        """Структуры в памяти для отчета /memstats"""
+        return {"fsm.hot": self._hot, "fsm.timers": self._wheel, "fsm.dirty": self._dirty}
+
+    def get_info(self) -> Dict[str, Any]:
+        """Информация о заполненности хранилища"""
+        return {
+            "hot": len(self._hot),
+            "tracked": len(self._wheel),
+            "pending_writes": len(self._dirty),
+        }
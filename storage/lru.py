@@ -0,0 +1,94 @@
+"""
+Ограниченный по размеру LRU кэш
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterator, Optional, Tuple
+
+
+class LRUCache:
+    """Словарь с ограниченным числом записей, при переполнении вытесняются давно не используемые"""
+
+    __slots__ = ("maxsize", "_data", "hits", "misses", "on_evict")
+
+    def __init__(self, maxsize: int = 1024, on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        #Вызывается для записей, вытесненных из-за переполнения
+        self.on_evict = on_evict
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Получаем значение и помечаем запись как недавно использованную"""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Получаем значение без изменения порядка вытеснения"""
+        return self._data.get(key, default)
+
+    def set(self, key: Hashable, value: Any):
+        """Добавляем или обновляем запись"""
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+        data[key] = value
+        if len(data) > self.maxsize:
+            self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        return self._data.pop(key, default)
+
+    def resize(self, maxsize: int):
+        """Меняем размер кэша, лишние записи вытесняются сразу"""
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        while len(self._data) > maxsize:
+            self._evict()
+
+    def _evict(self):
+        key, value = self._data.popitem(last=False)
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def clear(self):
+        self._data.clear()
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        return iter(self._data.items())
+
+    def stats(self) -> dict:
+        """Информация о заполненности и попаданиях"""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self._data[key]
+        self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.set(key, value)
+
+    def __delitem__(self, key: Hashable):
+        del self._data[key]
+
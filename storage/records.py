@@ -0,0 +1,186 @@
+"""
+Компактные записи задач и пользователей в памяти
+
+Вместо словаря с 9-10 ключами задача хранится в объекте со __slots__: приоритет -
+число (индекс в PRIORITIES), выполненность - бит в flags, даты - целые секунды epoch.
+Язык пользователя интернируется, id задачи - тот же объект строки, что и ключ в таблице.
+
+Для совместимости записи ведут себя как словари только для чтения и записи известных
+полей (task["title"], task.get("due_at"), {**task}): даты при этом отдаются и
+принимаются в ISO формате, приоритет - строкой. Код базы работает с полями напрямую.
+На диск (JSON) и в архив записи попадают через to_dict(), формат файлов не меняется
+"""
+import sys
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+PRIORITIES = ("low", "medium", "high")
+PRIORITY_CODES = {name: code for code, name in enumerate(PRIORITIES)}
+DEFAULT_PRIORITY = PRIORITY_CODES["medium"]
+
+#Биты флагов задачи
+FLAG_COMPLETED = 1
+
+
+def to_epoch(value: Optional[str]) -> Optional[int]:
+    """ISO дата -> секунды epoch (None остается None)"""
+    if not value:
+        return None
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def to_iso(timestamp: Optional[int]) -> Optional[str]:
+    """Секунды epoch -> ISO дата (None остается None)"""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+def priority_code(priority: Optional[str]) -> int:
+    return PRIORITY_CODES.get(priority, DEFAULT_PRIORITY)
+
+
+def _attr(name: str) -> Tuple[Callable, Callable]:
+    return (lambda record: getattr(record, name),
+            lambda record, value: setattr(record, name, value))
+
+
+def _time(name: str) -> Tuple[Callable, Callable]:
+    return (lambda record: to_iso(getattr(record, name)),
+            lambda record, value: setattr(record, name, to_epoch(value)))
+
+
+class _Record(Mapping):
+    """Доступ к полям записи как к ключам словаря (поля описаны в _FIELDS)"""
+
+    __slots__ = ()
+    _FIELDS: Dict[str, Tuple[Callable, Callable]] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            getter = self._FIELDS[name][0]
+        except KeyError:
+            raise KeyError(name) from None
+        return getter(self)
+
+    def __setitem__(self, name: str, value: Any):
+        try:
+            setter = self._FIELDS[name][1]
+        except KeyError:
+            raise KeyError(name) from None
+        setter(self, value)
+
+    def __iter__(self):
+        return iter(self._FIELDS)
+
+    def __len__(self) -> int:
+        return len(self._FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Запись в формате JSON файла"""
+        return {name: getter(self) for name, (getter, _) in self._FIELDS.items()}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()})"
+
+
+class TaskRecord(_Record):
+    """Задача пользователя"""
+
+    __slots__ = ("id", "user_id", "title", "description", "priority", "flags",
+                 "created_ts", "updated_ts", "due_ts", "remind_ts", "reminded_ts")
+
+    _FIELDS = {
+        "id": _attr("id"),
+        "user_id": _attr("user_id"),
+        "title": _attr("title"),
+        "description": _attr("description"),
+        "priority": (lambda task: PRIORITIES[task.priority],
+                     lambda task, value: setattr(task, "priority", priority_code(value))),
+        "completed": (lambda task: task.completed,
+                      lambda task, value: setattr(task, "completed", value)),
+        "due_at": _time("due_ts"),
+        "remind_at": _time("remind_ts"),
+        "reminded_at": _time("reminded_ts"),
+        "created_at": _time("created_ts"),
+        "updated_at": _time("updated_ts"),
+    }
+
+    def __init__(self, id: str, user_id: int, title: str, description: str = "",
+                 priority: int = DEFAULT_PRIORITY, flags: int = 0,
+                 created_ts: int = 0, updated_ts: int = 0, due_ts: Optional[int] = None,
+                 remind_ts: Optional[int] = None, reminded_ts: Optional[int] = None):
+        self.id = id
+        self.user_id = user_id
+        self.title = title
+        self.description = description
+        self.priority = priority
+        self.flags = flags
+        self.created_ts = created_ts
+        self.updated_ts = updated_ts
+        self.due_ts = due_ts
+        self.remind_ts = remind_ts
+        self.reminded_ts = reminded_ts
+
+    @property
+    def completed(self) -> bool:
+        return bool(self.flags & FLAG_COMPLETED)
+
+    @completed.setter
+    def completed(self, value: bool):
+        self.flags = self.flags | FLAG_COMPLETED if value else self.flags & ~FLAG_COMPLETED
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], task_id: Optional[str] = None) -> "TaskRecord":
+        """Задача из JSON (task_id - ключ таблицы, чтобы не хранить вторую копию строки)"""
+        return cls(
+            id=task_id if task_id is not None else data["id"],
+            user_id=data["user_id"],
+            title=data.get("title", ""),
+            description=data.get("description", ""),
+            priority=priority_code(data.get("priority")),
+            flags=FLAG_COMPLETED if data.get("completed") else 0,
+            created_ts=to_epoch(data.get("created_at")) or 0,
+            updated_ts=to_epoch(data.get("updated_at")) or 0,
+            due_ts=to_epoch(data.get("due_at")),
+            remind_ts=to_epoch(data.get("remind_at")),
+            reminded_ts=to_epoch(data.get("reminded_at")),
+        )
+
+
+class UserRecord(_Record):
+    """Пользователь бота"""
+
+    __slots__ = ("id", "username", "created_ts", "last_active_ts", "task_count", "language")
+
+    _FIELDS = {
+        "id": _attr("id"),
+        "username": _attr("username"),
+        "created_at": _time("created_ts"),
+        "last_active": _time("last_active_ts"),
+        "task_count": _attr("task_count"),
+        "language": (lambda user: user.language,
+                     lambda user, value: setattr(user, "language", sys.intern(value))),
+    }
+
+    def __init__(self, id: int, username: Optional[str] = None, created_ts: int = 0,
+                 last_active_ts: int = 0, task_count: int = 0, language: str = "ru"):
+        self.id = id
+        self.username = username
+        self.created_ts = created_ts
+        self.last_active_ts = last_active_ts
+        self.task_count = task_count
+        self.language = sys.intern(language)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UserRecord":
+        """Пользователь из JSON"""
+        return cls(
+            id=data["id"],
+            username=data.get("username"),
+            created_ts=to_epoch(data.get("created_at")) or 0,
+            last_active_ts=to_epoch(data.get("last_active")) or 0,
+            task_count=data.get("task_count", 0),
+            language=data.get("language") or "ru",
+        )
@@ -0,0 +1,77 @@
+"""
+Очередь напоминаний на куче (min-heap)
+
+Добавление - O(log n). Отмена и перенос - O(1): старая запись в куче становится
+устаревшей и отбрасывается, когда доходит до вершины. Если устаревших записей
+становится больше, чем актуальных, куча пересобирается за O(n).
+Полных проходов по расписанию нет: наружу отдаются только наступившие записи
+"""
+import heapq
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class ReminderQueue:
+    """Расписание напоминаний: ключ (id задачи) -> момент срабатывания (timestamp)"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, Hashable]] = []
+        self._due: Dict[Hashable, float] = {}
+        #Вызывается, когда самое раннее напоминание стало раньше (будим планировщик)
+        self.on_earlier: Optional[Callable[[], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._due
+
+    def rebuild(self, entries: Iterable[Tuple[Hashable, float]]):
+        """Собираем очередь заново (при запуске) за O(n)"""
+        self._due = dict(entries)
+        self._heap = [(due, key) for key, due in self._due.items()]
+        heapq.heapify(self._heap)
+        self._notify()
+
+    def schedule(self, key: Hashable, due: float):
+        """Ставим (или переносим) напоминание"""
+        earliest = self.next_due()
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, key))
+        self._compact()
+        if earliest is None or due < earliest:
+            self._notify()
+
+    def cancel(self, key: Hashable):
+        """Снимаем напоминание (запись в куче удалится лениво)"""
+        if self._due.pop(key, None) is not None:
+            self._compact()
+
+    def next_due(self) -> Optional[float]:
+        """Момент ближайшего напоминания"""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[Hashable]:
+        """Забираем все напоминания, срок которых наступил"""
+        fired = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return fired
+            _, key = heapq.heappop(self._heap)
+            del self._due[key]
+            fired.append(key)
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap and self._due.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(due, key) for key, due in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def _notify(self):
+        if self.on_earlier is not None:
+            self.on_earlier()
@@ -0,0 +1,154 @@
+"""
+Полнотекстовый поиск по задачам пользователя
+
+Для каждого пользователя хранится обратный индекс: слово -> {id задачи: вес}.
+Слова приводятся к нижнему регистру (casefold, ё -> е), работают и для русского,
+и для английского. Поиск по префиксу идет по отсортированному словарю пользователя
+через bisect. Индекс обновляется при добавлении и удалении задач, а целиком
+строится лениво - при первом обращении после запуска
+"""
+import re
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+#Вес слова из названия больше, чем из описания
+TITLE_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+#Полное совпадение слова ценнее совпадения по префиксу
+EXACT_BONUS = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбиваем текст на слова (нижний регистр, ё -> е)"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.casefold().replace("ё", "е"))
+
+
+class _UserIndex:
+    """Обратный индекс задач одного пользователя"""
+
+    __slots__ = ("postings", "vocabulary")
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        #Отсортированный список слов для поиска по префиксу
+        self.vocabulary: List[str] = []
+
+    def add(self, task_id: str, weights: Dict[str, int]):
+        for token, weight in weights.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                insort(self.vocabulary, token)
+            posting[task_id] = weight
+
+    def remove(self, task_id: str, tokens: Iterable[str]):
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(task_id, None)
+            if not posting:
+                del self.postings[token]
+                position = bisect_left(self.vocabulary, token)
+                if position < len(self.vocabulary) and self.vocabulary[position] == token:
+                    del self.vocabulary[position]
+
+    def match(self, query_token: str) -> Dict[str, int]:
+        """Задачи, в которых есть слово, начинающееся с query_token, и их вес"""
+        scores: Dict[str, int] = {}
+        position = bisect_left(self.vocabulary, query_token)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(query_token):
+            token = self.vocabulary[position]
+            bonus = EXACT_BONUS if token == query_token else 1
+            for task_id, weight in self.postings[token].items():
+                scores[task_id] = scores.get(task_id, 0) + weight * bonus
+            position += 1
+        return scores
+
+
+class TaskSearchIndex:
+    """Поисковый индекс по названиям и описаниям задач всех пользователей"""
+
+    def __init__(self, load_tasks: Callable[[], Iterable[Dict[str, Any]]]):
+        self._load_tasks = load_tasks
+        self._users: Dict[int, _UserIndex] = {}
+        self._task_tokens: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+        self._built = False
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        self._built = True
+        for task in self._load_tasks():
+            self.add(task)
+
+    @staticmethod
+    def _weights(task: Dict[str, Any]) -> Dict[str, int]:
+        weights: Dict[str, int] = {}
+        for token in tokenize(task.get("title", "")):
+            weights[token] = weights.get(token, 0) + TITLE_WEIGHT
+        for token in tokenize(task.get("description", "")):
+            weights[token] = weights.get(token, 0) + DESCRIPTION_WEIGHT
+        return weights
+
+    def add(self, task: Dict[str, Any]):
+        """Добавляем задачу в индекс (до первого поиска ничего не делаем - индекс построится целиком)"""
+        if not self._built:
+            return
+        task_id = task["id"]
+        if task_id in self._task_tokens:
+            self.remove(task_id)
+
+        weights = self._weights(task)
+        user_id = task["user_id"]
+        user_index = self._users.get(user_id)
+        if user_index is None:
+            user_index = self._users[user_id] = _UserIndex()
+        user_index.add(task_id, weights)
+        self._task_tokens[task_id] = (user_id, tuple(weights))
+
+    def remove(self, task_id: str):
+        """Убираем задачу из индекса"""
+        entry = self._task_tokens.pop(task_id, None)
+        if entry is None:
+            return
+        user_id, tokens = entry
+        user_index = self._users.get(user_id)
+        if user_index is None:
+            return
+        user_index.remove(task_id, tokens)
+        if not user_index.postings:
+            del self._users[user_id]
+
+    def search(self, user_id: int, query: str) -> List[Tuple[str, int]]:
+        """
+        Ищем задачи пользователя, в которых есть все слова запроса (по префиксу).
+        Возвращаем пары (id задачи, релевантность), лучшие первыми,
+        при равной релевантности - более новые (id начинается с user_id и времени создания)
+        """
+        self._ensure_built()
+        user_index = self._users.get(user_id)
+        query_tokens = set(tokenize(query))
+        if user_index is None or not query_tokens:
+            return []
+
+        scores: Dict[str, int] = {}
+        matched: Set[str] = set()
+        for i, query_token in enumerate(sorted(query_tokens, key=len, reverse=True)):
+            token_scores = user_index.match(query_token)
+            if i == 0:
+                matched = set(token_scores)
+            else:
+                matched &= token_scores.keys()
+            if not matched:
+                return []
+            for task_id in matched:
+                scores[task_id] = scores.get(task_id, 0) + token_scores[task_id]
+
+        return sorted(((task_id, scores[task_id]) for task_id in matched),
+                      key=lambda item: (item[1], item[0]), reverse=True)
@@ -0,0 +1,109 @@
+"""
+Отсортированный индекс записей для постраничного просмотра
+
+Хранит отсортированный список пар (ключ, id). Пары различны (id уникальны), поэтому
+позицию любой пары можно найти через bisect. Страница после курсора (пара последней
+показанной записи) - это bisect и срез, O(log n + размер страницы),
+независимо от того, насколько далеко пролистан список (keyset пагинация).
+Как и поисковый индекс, строится лениво при первом обращении.
+Для часто меняющихся ключей (время активности пользователя меняется на каждом
+сообщении) индекс создается с lazy=True: изменения копятся и применяются пачкой
+при следующем чтении, а не перестановкой O(n) на каждую запись
+"""
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class SortedIndex:
+    """Индекс id записей, упорядоченный по ключу key_func(запись)"""
+
+    def __init__(self, key_func: Callable[[Dict[str, Any]], tuple],
+                 load: Callable[[], Iterable[Dict[str, Any]]], lazy: bool = False):
+        self.key_func = key_func
+        self._load = load
+        self._entries: List[Tuple[tuple, Hashable]] = []
+        self._keys: Dict[Hashable, tuple] = {}
+        self._built = False
+        self.lazy = lazy
+        #Записи, позиция которых еще не обновлена (только для lazy)
+        self._pending: Dict[Hashable, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        self._ensure_built()
+        return len(self._entries)
+
+    def _ensure_built(self):
+        if self._built:
+            self._apply_pending()
+            return
+        self._built = True
+        for record in self._load():
+            self._keys[record["id"]] = self.key_func(record)
+        self._entries = sorted((key, record_id) for record_id, key in self._keys.items())
+
+    def _apply_pending(self):
+        """Применяем накопленные изменения: по одной, если их мало, иначе одним слиянием за O(n)"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        changed = {}
+        for record_id, record in pending.items():
+            key = self.key_func(record)
+            if self._keys.get(record_id) != key:
+                changed[record_id] = key
+        if len(changed) * 8 < len(self._entries):
+            for record in (pending[record_id] for record_id in changed):
+                self._update_now(record)
+            return
+        self._keys.update(changed)
+        kept = [entry for entry in self._entries if entry[1] not in changed]
+        self._entries = list(merge(kept, sorted((key, record_id) for record_id, key in changed.items())))
+
+    def update(self, record: Dict[str, Any]):
+        """Добавляем запись или обновляем ее позицию (до первого обращения ничего не делаем)"""
+        if not self._built:
+            return
+        if self.lazy:
+            self._pending[record["id"]] = record
+            return
+        self._update_now(record)
+
+    def _update_now(self, record: Dict[str, Any]):
+        key = self.key_func(record)
+        record_id = record["id"]
+        old_key = self._keys.get(record_id)
+        if old_key == key:
+            return
+        if old_key is not None:
+            self._discard(old_key, record_id)
+        self._keys[record_id] = key
+        insort(self._entries, (key, record_id))
+
+    def remove(self, record_id: Hashable):
+        """Убираем запись из индекса"""
+        self._pending.pop(record_id, None)
+        old_key = self._keys.pop(record_id, None)
+        if old_key is not None:
+            self._discard(old_key, record_id)
+
+    def _discard(self, key: tuple, record_id: Hashable):
+        position = bisect_left(self._entries, (key, record_id))
+        if position < len(self._entries) and self._entries[position] == (key, record_id):
+            del self._entries[position]
+
+    def page_asc(self, after: Optional[Tuple[tuple, Hashable]], limit: int) -> List[Tuple[tuple, Hashable]]:
+        """Страница по возрастанию: limit пар (ключ, id), которые больше курсора after"""
+        self._ensure_built()
+        start = 0 if after is None else bisect_right(self._entries, after)
+        return self._entries[start:start + limit]
+
+    def page_desc(self, after: Optional[Tuple[tuple, Hashable]], limit: int) -> List[Tuple[tuple, Hashable]]:
+        """
+        Страница по убыванию: limit пар (ключ, id), которые меньше курсора after
+        (after=None - первая страница)
+        """
+        self._ensure_built()
+        end = len(self._entries) if after is None else bisect_left(self._entries, after)
+        start = max(0, end - limit)
+        return self._entries[start:end][::-1]
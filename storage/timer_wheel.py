@@ -0,0 +1,70 @@
+"""
+Колесо таймеров для дешевого истечения записей по TTL
+"""
+import math
+from typing import Dict, Hashable, List, Set
+
+
+class TimerWheel:
+    """
+    Простое колесо таймеров: время делится на тики, каждый тик - ячейка с ключами,
+    срок которых истекает в этот тик. Продление срока - O(1), старая запись в ячейке
+    становится устаревшей и отбрасывается лениво при проходе по ячейке.
+    Проход затрагивает только ключи из наступивших тиков, без полного перебора
+    """
+
+    def __init__(self, tick: float, horizon: float, now: float):
+        if tick <= 0:
+            raise ValueError("tick must be positive")
+        self.tick = tick
+        self.slots_count = max(1, math.ceil(horizon / tick)) + 1
+        self._slots: List[Set[Hashable]] = [set() for _ in range(self.slots_count)]
+        self._deadlines: Dict[Hashable, int] = {}
+        self._current_tick = self._to_tick(now)
+
+    def _to_tick(self, moment: float) -> int:
+        return int(moment // self.tick)
+
+    def schedule(self, key: Hashable, deadline: float):
+        """Ставим (или переносим) срок истечения ключа"""
+        deadline_tick = max(self._to_tick(deadline), self._current_tick + 1)
+        self._deadlines[key] = deadline_tick
+        self._slots[deadline_tick % self.slots_count].add(key)
+
+    def cancel(self, key: Hashable):
+        """Снимаем ключ с учета (запись в ячейке удалится при проходе)"""
+        self._deadlines.pop(key, None)
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Продвигаем колесо до текущего момента и возвращаем истекшие ключи"""
+        expired = []
+        target_tick = self._to_tick(now)
+        #Если пропущено больше полного оборота, достаточно пройти каждую ячейку один раз
+        start_tick = max(self._current_tick + 1, target_tick - self.slots_count + 1)
+
+        for tick in range(start_tick, target_tick + 1):
+            slot = self._slots[tick % self.slots_count]
+            if not slot:
+                continue
+            keys = list(slot)
+            slot.clear()
+
+            for key in keys:
+                deadline_tick = self._deadlines.get(key)
+                if deadline_tick is None:
+                    continue
+                if deadline_tick <= target_tick:
+                    del self._deadlines[key]
+                    expired.append(key)
+                else:
+                    #Срок продлен - переносим в нужную ячейку
+                    self._slots[deadline_tick % self.slots_count].add(key)
+
+        self._current_tick = max(self._current_tick, target_tick)
+        return expired
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
@@ -0,0 +1,163 @@
+"""
+Ограниченное хранилище временных рядов для подробной статистики
+
+Каждый ряд - кольцевой буфер фиксированного размера из корзин (минута, час, день).
+Корзина хранит число запросов, ошибок, суммарное и максимальное время обработки
+и счетчики команд (не больше COMMANDS_PER_BUCKET разных команд, остальные - в "other").
+Запись события - O(1): корзина выбирается по времени, устаревшая корзина обнуляется
+при повторном использовании. Память не растет со временем и числом разных команд
+"""
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+#Сколько разных команд учитывается в одной корзине
+COMMANDS_PER_BUCKET = 20
+OTHER_COMMAND = "other"
+
+_COMMAND_RE = re.compile(r"^[a-z0-9_]{1,32}$")
+
+#Ряды: имя -> (длина корзины в секундах, число корзин)
+SERIES = {
+    "minute": (60, 60),
+    "hour": (3600, 24),
+    "day": (86400, 30),
+}
+
+
+def normalize_command(text: str) -> str:
+    """/Start@my_bot args -> start; все, что не похоже на команду, -> other"""
+    command = text.split(maxsplit=1)[0].lstrip("/").split("@", 1)[0].lower()
+    return command if _COMMAND_RE.match(command) else OTHER_COMMAND
+
+
+class _Bucket:
+    """Счетчики за один интервал"""
+
+    __slots__ = ("epoch", "requests", "errors", "latency_sum", "latency_max", "commands")
+
+    def __init__(self):
+        self.reset(-1)
+
+    def reset(self, epoch: int):
+        self.epoch = epoch
+        self.requests = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.commands: Dict[str, int] = {}
+
+
+class TimeSeries:
+    """Кольцевой буфер корзин одинаковой длины"""
+
+    __slots__ = ("resolution", "size", "_buckets")
+
+    def __init__(self, resolution: int, size: int):
+        self.resolution = resolution
+        self.size = size
+        self._buckets = [_Bucket() for _ in range(size)]
+
+    def _bucket(self, now: float) -> _Bucket:
+        epoch = int(now // self.resolution)
+        bucket = self._buckets[epoch % self.size]
+        if bucket.epoch != epoch:
+            bucket.reset(epoch)
+        return bucket
+
+    def record_request(self, now: float, latency: float, error: bool):
+        bucket = self._bucket(now)
+        bucket.requests += 1
+        bucket.latency_sum += latency
+        if latency > bucket.latency_max:
+            bucket.latency_max = latency
+        if error:
+            bucket.errors += 1
+
+    def record_command(self, now: float, command: str):
+        commands = self._bucket(now).commands
+        if command not in commands and len(commands) >= COMMANDS_PER_BUCKET:
+            command = OTHER_COMMAND
+        commands[command] = commands.get(command, 0) + 1
+
+    def summary(self, now: float) -> Dict[str, Any]:
+        """Итоги по всему окну и число запросов по корзинам (от старых к новым)"""
+        current = int(now // self.resolution)
+        result = {"requests": 0, "errors": 0, "latency_sum": 0.0, "latency_max": 0.0,
+                  "commands": {}, "series": [0] * self.size}
+        commands = result["commands"]
+
+        for bucket in self._buckets:
+            age = current - bucket.epoch
+            if not 0 <= age < self.size:
+                continue
+            result["requests"] += bucket.requests
+            result["errors"] += bucket.errors
+            result["latency_sum"] += bucket.latency_sum
+            result["latency_max"] = max(result["latency_max"], bucket.latency_max)
+            result["series"][self.size - 1 - age] = bucket.requests
+            for command, count in bucket.commands.items():
+                commands[command] = commands.get(command, 0) + count
+        return result
+
+
+class MetricsStore:
+    """Ряды по минутам, часам и дням и текущие показатели компонентов (очередь обновлений и т.д.)"""
+
+    def __init__(self):
+        self.series = {name: TimeSeries(resolution, size) for name, (resolution, size) in SERIES.items()}
+        self.gauges: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def register_gauge(self, name: str, source: Callable[[], Dict[str, Any]]):
+        """Источник текущих показателей, которые добавляются в итоги"""
+        self.gauges[name] = source
+
+    def record_request(self, latency: float, error: bool = False, now: Optional[float] = None):
+        """Обработан запрос (latency в секундах)"""
+        now = time.time() if now is None else now
+        for series in self.series.values():
+            series.record_request(now, latency, error)
+
+    def record_command(self, command: str, now: Optional[float] = None):
+        """Использована команда (имя без "/")"""
+        now = time.time() if now is None else now
+        for series in self.series.values():
+            series.record_command(now, command)
+
+    def summary(self, window: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """Итоги окна minute/hour/day"""
+        result = self.series[window].summary(time.time() if now is None else now)
+        result["gauges"] = {name: source() for name, source in self.gauges.items()}
+        return result
+
+
+def merge_summaries(summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Складываем итоги нескольких процессов (режим воркеров)"""
+    merged = {"requests": 0, "errors": 0, "latency_sum": 0.0, "latency_max": 0.0,
+              "commands": {}, "series": [], "gauges": {}}
+    for summary in summaries:
+        merged["requests"] += summary["requests"]
+        merged["errors"] += summary["errors"]
+        merged["latency_sum"] += summary["latency_sum"]
+        merged["latency_max"] = max(merged["latency_max"], summary["latency_max"])
+        for command, count in summary["commands"].items():
+            merged["commands"][command] = merged["commands"].get(command, 0) + count
+        if not merged["series"]:
+            merged["series"] = list(summary["series"])
+        else:
+            merged["series"] = [a + b for a, b in zip(merged["series"], summary["series"])]
+        #Показатели складываем, максимумы берем наибольшие, средние усредняем
+        for name, values in summary.get("gauges", {}).items():
+            gauge = merged["gauges"].setdefault(name, {})
+            for key, value in values.items():
+                if key.startswith("max"):
+                    gauge[key] = max(gauge.get(key, value), value)
+                elif key.startswith("avg"):
+                    gauge[key] = gauge.get(key, 0) + value / len(summaries)
+                else:
+                    gauge[key] = gauge.get(key, 0) + value
+    return merged
+
+
+#Общее хранилище метрик процесса
+metrics = MetricsStore()
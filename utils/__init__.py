@@ -6,16 +6,25 @@ from .keyboards import (
     get_tasks_keyboard,
     get_language_keyboard,
     get_admin_keyboard,
+    get_detailed_stats_keyboard,
+    get_browse_keyboard,
     get_task_actions_keyboard,
-    get_task_confirm_keyboard
-
+    get_task_confirm_keyboard,
+    get_search_pagination_keyboard,
+    prebuild_keyboards
 )
+from .edits import edit_message
 
 __all__ = [
     'get_main_keyboard',
     'get_tasks_keyboard', 
     'get_language_keyboard',
     'get_admin_keyboard',
+    'get_detailed_stats_keyboard',
+    'get_browse_keyboard',
     'get_task_actions_keyboard',
-    'get_task_confirm_keyboard'
+    'get_task_confirm_keyboard',
+    'get_search_pagination_keyboard',
+    'prebuild_keyboards',
+    'edit_message'
 ]
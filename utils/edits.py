@@ -0,0 +1,84 @@
+"""
+Редактирование сообщений без лишних запросов к Bot API
+
+Для каждого (чат, сообщение) в ограниченном LRU кэше хранятся хэши последнего
+отправленного текста и клавиатуры. Перед редактированием новое содержимое сравнивается
+с ними (если записи нет - с содержимым самого сообщения из callback): одинаковое
+редактирование пропускается, при изменении только клавиатуры вызывается edit_reply_markup.
+Чтобы кэш не устаревал, все редактирования сообщений идут через edit_message
+"""
+import logging
+from typing import Any, Dict, Optional, Tuple
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from storage.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+#Сколько сообщений помним
+EDIT_CACHE_SIZE = 10000
+
+#(chat_id, message_id) -> (хэш текста, хэш клавиатуры)
+_rendered = LRUCache(maxsize=EDIT_CACHE_SIZE)
+
+#Счетчики для мониторинга
+_stats = {"edited": 0, "markup_only": 0, "skipped": 0}
+
+
+def _text_hash(text: Optional[str]) -> int:
+    #Telegram обрезает пробелы по краям текста, так же сравниваем и мы
+    return hash((text or "").strip())
+
+
+def _markup_hash(markup: Optional[InlineKeyboardMarkup]) -> int:
+    #Пустая клавиатура в Telegram - то же самое, что ее отсутствие
+    if markup is None or not any(markup.inline_keyboard):
+        return hash(None)
+    return hash(markup.model_dump_json(exclude_none=True))
+
+
+def _current(message: Message) -> Tuple[int, int]:
+    """Что сейчас показано в сообщении: из кэша или из самого объекта сообщения"""
+    key = (message.chat.id, message.message_id)
+    rendered = _rendered.get(key)
+    if rendered is None:
+        rendered = (_text_hash(message.text), _markup_hash(message.reply_markup))
+    return rendered
+
+
+async def edit_message(message: Message, text: str,
+                       reply_markup: Optional[InlineKeyboardMarkup] = None) -> bool:
+    """
+    Показываем в сообщении text и reply_markup (None - без клавиатуры), как edit_text.
+    Возвращаем False, если сообщение уже так выглядело и запрос не понадобился
+    """
+    key = (message.chat.id, message.message_id)
+    text_hash, markup_hash = _text_hash(text), _markup_hash(reply_markup)
+    current_text, current_markup = _current(message)
+
+    try:
+        if current_text == text_hash:
+            if current_markup == markup_hash:
+                _stats["skipped"] += 1
+                return False
+            await message.edit_reply_markup(reply_markup=reply_markup)
+            _stats["markup_only"] += 1
+        else:
+            await message.edit_text(text, reply_markup=reply_markup)
+            _stats["edited"] += 1
+    except TelegramBadRequest as e:
+        #Сообщение изменили в обход кэша, но содержимое уже нужное
+        if "message is not modified" not in str(e):
+            raise
+        _stats["skipped"] += 1
+        _rendered.set(key, (text_hash, markup_hash))
+        return False
+
+    _rendered.set(key, (text_hash, markup_hash))
+    return True
+
+
+def get_edit_stats() -> Dict[str, Any]:
+    """Состояние для мониторинга"""
+    return {**_stats, "cached_messages": len(_rendered)}
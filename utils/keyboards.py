@@ -1,7 +1,11 @@
 """
 Инлайн и реплай клавиатуры для бота
+
+Статические клавиатуры строятся один раз на (язык, вариант) и дальше отдаются из кэша.
+Кэш сбрасывается при изменении каталога сообщений. Закэшированные клавиатуры общие
+для всех вызовов, поэтому их нельзя изменять на месте
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Hashable, Tuple
 from aiogram.types import (
     ReplyKeyboardMarkup, 
     KeyboardButton, 
@@ -9,14 +13,55 @@ from aiogram.types import (
     InlineKeyboardButton
 )
 
-from localization.messages import get_message
-from config import Config
+from localization.messages import MESSAGES, get_message, get_catalog_version
+
+
+#Кэш готовых клавиатур: (вид, язык, флаги) -> разметка
+_keyboard_cache: Dict[Tuple[Hashable, ...], Any] = {}
+_cache_version = None
+
+
+def _normalize_language(language: str) -> str:
+    """Неизвестные языки отображаются на русский, как и в get_message"""
+    return language if language in MESSAGES else "ru"
+
+
+def _cached(key: Tuple[Hashable, ...], builder: Callable[..., Any], *args) -> Any:
+    """Отдаем клавиатуру из кэша или строим ее, если каталог сообщений изменился"""
+    global _cache_version
+
+    version = get_catalog_version()
+    if version != _cache_version:
+        _keyboard_cache.clear()
+        _cache_version = version
+
+    markup = _keyboard_cache.get(key)
+    if markup is None:
+        markup = builder(*args)
+        _keyboard_cache[key] = markup
+    return markup
+
+
+def prebuild_keyboards():
+    """Заранее строим статические клавиатуры для всех языков (вызывается при запуске)"""
+    get_language_keyboard()
+    for language in MESSAGES:
+        get_main_keyboard(language)
+        get_admin_keyboard(language)
+        get_detailed_stats_keyboard(language)
+        get_tasks_keyboard(language, False)
+        get_tasks_keyboard(language, True)
+        for action in ("delete", "complete", None):
+            _get_confirm_labels(action, language)
 
 
 def get_main_keyboard(language: str = "ru") -> ReplyKeyboardMarkup:
     """Клавиатура меню"""
-    config = Config()
-    
+    language = _normalize_language(language)
+    return _cached(("main", language), _build_main_keyboard, language)
+
+
+def _build_main_keyboard(language: str) -> ReplyKeyboardMarkup:
     keyboard = [
         [
             KeyboardButton(text=get_message("btn_my_tasks", language)),
@@ -37,6 +82,10 @@ def get_main_keyboard(language: str = "ru") -> ReplyKeyboardMarkup:
 
 def get_language_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора языка"""
+    return _cached(("language",), _build_language_keyboard)
+
+
+def _build_language_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [
             InlineKeyboardButton(text="🇷🇺 Русский", callback_data="lang_ru"),
@@ -49,6 +98,12 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
 
 def get_tasks_keyboard(language: str = "ru", has_tasks: bool = False) -> InlineKeyboardMarkup:
     """Клавиатура для создания задач"""
+    language = _normalize_language(language)
+    has_tasks = bool(has_tasks)
+    return _cached(("tasks", language, has_tasks), _build_tasks_keyboard, language, has_tasks)
+
+
+def _build_tasks_keyboard(language: str, has_tasks: bool) -> InlineKeyboardMarkup:
     keyboard = []
 
     keyboard.append([
@@ -66,6 +121,13 @@ def get_tasks_keyboard(language: str = "ru", has_tasks: bool = False) -> InlineK
             )
         ])
     
+    keyboard.append([
+        InlineKeyboardButton(
+            text=get_message("btn_archive", language),
+            callback_data="view_archive"
+        )
+    ])
+    
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
@@ -97,6 +159,21 @@ def get_task_actions_keyboard(tasks: List[Dict[str, Any]], language: str = "ru")
         
         keyboard.append(row)
 
+    #Массовые действия: одна запись в базу вместо записи на каждую задачу
+    bulk_row = []
+    if any(not task["completed"] for task in tasks):
+        bulk_row.append(InlineKeyboardButton(
+            text=get_message("btn_complete_all", language),
+            callback_data="task_completeall"
+        ))
+    if any(task["completed"] for task in tasks):
+        bulk_row.append(InlineKeyboardButton(
+            text=get_message("btn_clear_completed", language),
+            callback_data="task_clearcompleted"
+        ))
+    if bulk_row:
+        keyboard.append(bulk_row)
+
     keyboard.append([
         InlineKeyboardButton(
             text=get_message("btn_back", language),
@@ -107,8 +184,23 @@ def get_task_actions_keyboard(tasks: List[Dict[str, Any]], language: str = "ru")
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+def get_search_pagination_keyboard(page: int, pages: int) -> InlineKeyboardMarkup:
+    """Переключение страниц результатов поиска (запрос хранится в данных FSM)"""
+    row = []
+    if page > 1:
+        row.append(InlineKeyboardButton(text="◀️", callback_data=f"search_page_{page - 1}"))
+    if page < pages:
+        row.append(InlineKeyboardButton(text="▶️", callback_data=f"search_page_{page + 1}"))
+    return InlineKeyboardMarkup(inline_keyboard=[row] if row else [])
+
+
 def get_admin_keyboard(language: str = "ru") -> InlineKeyboardMarkup:
     """Клавиатура для админских функций"""
+    language = _normalize_language(language)
+    return _cached(("admin", language), _build_admin_keyboard)
+
+
+def _build_admin_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [
             InlineKeyboardButton(
@@ -145,8 +237,66 @@ def get_admin_keyboard(language: str = "ru") -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_task_confirm_keyboard(action: str, task_id: str, language: str = "ru") -> InlineKeyboardMarkup:
-    """Кнопки клавиатуры для подтверждения действий"""
+def get_browse_keyboard(sort_options: List[Tuple[str, str]], next_callback: str = None,
+                        language: str = "ru") -> InlineKeyboardMarkup:
+    """
+    Постраничный просмотр для админа: sort_options - пары (код браузера, ключ подписи сортировки),
+    next_callback - callback_data следующей страницы (None - страница последняя)
+    """
+    keyboard = [
+        [
+            InlineKeyboardButton(
+                text=get_message(label_key, language),
+                callback_data=f"browse_{code}"
+            )
+            for code, label_key in sort_options
+        ]
+    ]
+    if next_callback:
+        keyboard.append([
+            InlineKeyboardButton(
+                text=get_message("btn_next_page", language),
+                callback_data=next_callback
+            )
+        ])
+    
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def get_detailed_stats_keyboard(language: str = "ru") -> InlineKeyboardMarkup:
+    """Выбор окна подробной статистики"""
+    language = _normalize_language(language)
+    return _cached(("detailed_stats", language), _build_detailed_stats_keyboard, language)
+
+
+def _build_detailed_stats_keyboard(language: str) -> InlineKeyboardMarkup:
+    keyboard = [
+        [
+            InlineKeyboardButton(
+                text=get_message(f"stats_window_{window}", language),
+                callback_data=f"stats_window_{window}"
+            )
+            for window in ("minute", "hour", "day")
+        ],
+        [
+            InlineKeyboardButton(
+                text=get_message("btn_close", language),
+                callback_data="stats_close"
+            )
+        ]
+    ]
+    
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def _get_confirm_labels(action: str, language: str) -> Tuple[str, str]:
+    """Тексты кнопок подтверждения (кэшируются, т.к. зависят только от действия и языка)"""
+    action = action if action in ("delete", "complete") else None
+    language = _normalize_language(language)
+    return _cached(("confirm_labels", action, language), _build_confirm_labels, action, language)
+
+
+def _build_confirm_labels(action: str, language: str) -> Tuple[str, str]:
     if action == "delete":
         confirm_text = "🗑️ Confirm Delete" if language == "en" else "🗑️ Подтвердить удаление"
         cancel_text = "❌ Cancel" if language == "en" else "❌ Отмена"
@@ -157,6 +307,14 @@ def get_task_confirm_keyboard(action: str, task_id: str, language: str = "ru") -
         confirm_text = "✅ Confirm" if language == "en" else "✅ Подтвердить"
         cancel_text = "❌ Cancel" if language == "en" else "❌ Отмена"
     
+    return confirm_text, cancel_text
+
+
+def get_task_confirm_keyboard(action: str, task_id: str, language: str = "ru") -> InlineKeyboardMarkup:
+    """Кнопки клавиатуры для подтверждения действий"""
+    #callback_data зависит от задачи, поэтому кэшируются только тексты кнопок
+    confirm_text, cancel_text = _get_confirm_labels(action, language)
+    
     keyboard = [
         [
             InlineKeyboardButton(